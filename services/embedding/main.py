@@ -0,0 +1,59 @@
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from typing import List
+import asyncio
+import os
+
+from sentence_transformers import SentenceTransformer
+from src.core.batcher import MicroBatcher
+
+EMBEDDING_MODEL_ID = os.environ.get("EMBEDDING_MODEL_ID", "sentence-transformers/all-MiniLM-L6-v2")
+# Texts per model call, and how long the first request of a batch may wait for company
+EMBED_MAX_BATCH = int(os.environ.get("EMBED_MAX_BATCH", "128"))
+EMBED_MAX_WAIT_MS = float(os.environ.get("EMBED_MAX_WAIT_MS", "5"))
+EMBED_MAX_REQUEST_TEXTS = int(os.environ.get("EMBED_MAX_REQUEST_TEXTS", "1024"))
+
+app = FastAPI()
+
+print(f"Loading embedding model: {EMBEDDING_MODEL_ID}")
+model = SentenceTransformer(EMBEDDING_MODEL_ID, device="cpu")
+batcher = MicroBatcher(
+    lambda texts: model.encode(texts, batch_size=EMBED_MAX_BATCH, convert_to_numpy=True),
+    max_batch=EMBED_MAX_BATCH,
+    max_wait_ms=EMBED_MAX_WAIT_MS,
+)
+
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+
+
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "model": EMBEDDING_MODEL_ID,
+        "dim": model.get_sentence_embedding_dimension(),
+    }
+
+
+@app.get("/stats")
+def stats():
+    return batcher.summary()
+
+
+@app.post("/embed")
+async def embed(req: EmbedRequest):
+    if len(req.texts) > EMBED_MAX_REQUEST_TEXTS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {EMBED_MAX_REQUEST_TEXTS} texts per request"
+        )
+    if not req.texts:
+        return {"model": EMBEDDING_MODEL_ID, "embeddings": []}
+
+    try:
+        vectors = await asyncio.wrap_future(batcher.submit(req.texts))
+    except Exception as e:
+        print(f"Embedding Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"model": EMBEDDING_MODEL_ID, "embeddings": vectors.tolist()}
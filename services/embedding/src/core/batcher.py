@@ -0,0 +1,104 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+
+class _Request:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Collects concurrent embed requests into one model call.
+
+    A single worker thread takes the first waiting request, then keeps
+    pulling requests until max_batch texts are queued or max_wait_ms has
+    passed since that first request, runs one encode over all of them and
+    hands each caller its own rows. Requests larger than max_batch are
+    encoded on their own.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch: int = 128, max_wait_ms: float = 5.0):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "texts": 0, "queue_wait_ms": 0.0, "encode_ms": 0.0}
+        threading.Thread(target=self._run, name="embed-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        request = _Request(texts)
+        self._queue.put(request)
+        return request.future
+
+    def _collect(self) -> List[_Request]:
+        first = self._queue.get()
+        batch, size = [first], len(first.texts)
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            # A caller that gave up (client gone, timeout) cancelled its future: skip it.
+            # Once running, a future can no longer be cancelled under us.
+            batch = [r for r in self._collect() if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._process(batch)
+            except Exception as e:
+                # Never let one batch take down the only worker thread
+                print(f"⚠️ Embedding batch failed: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _process(self, batch: List[_Request]):
+        started = time.perf_counter()
+        texts = [t for request in batch for t in request.texts]
+        vectors = np.asarray(self.encode(texts), dtype=np.float32)
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset : offset + len(request.texts)])
+            offset += len(request.texts)
+
+        with self._stats_lock:
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["queue_wait_ms"] += sum((started - r.enqueued) * 1000 for r in batch)
+            self.stats["encode_ms"] += (time.perf_counter() - started) * 1000
+
+    def summary(self) -> dict:
+        with self._stats_lock:
+            s = dict(self.stats)
+        return {
+            "requests": s["requests"],
+            "batches": s["batches"],
+            "texts": s["texts"],
+            "avg_batch_texts": round(s["texts"] / s["batches"], 2) if s["batches"] else 0.0,
+            "avg_requests_per_batch": round(s["requests"] / s["batches"], 2) if s["batches"] else 0.0,
+            "avg_queue_wait_ms": round(s["queue_wait_ms"] / s["requests"], 2) if s["requests"] else 0.0,
+            "avg_encode_ms": round(s["encode_ms"] / s["batches"], 2) if s["batches"] else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_ms,
+        }
@@ -15,14 +15,22 @@ def check_backend_health():
         return False
 
 
-def get_sessions():
+def get_sessions(since=None):
+    """Every session (newest first), following the X-Next-Cursor pages; since=<id>: only newer ones."""
+    sessions, params = [], {"since": since} if since is not None else {}
     try:
-        resp = requests.get(f"{API_URL}/sessions")
-        if resp.status_code == 200:
-            return resp.json()
+        while True:
+            resp = requests.get(f"{API_URL}/sessions", params=params, timeout=10)
+            if resp.status_code != 200:
+                break
+            sessions.extend(resp.json())
+            cursor = resp.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            params["before"] = cursor
     except Exception as e:
         st.error(f"Failed to connect to RAG API: {e}")
-    return []
+    return sessions
 
 
 def create_session(filenames):
@@ -74,11 +82,17 @@ def query_system(session_id, question):
         return {"error": str(e)}
 
 
-def get_history(session_id):
+def get_history(session_id, before=None):
+    """
+    One page of a session's history, oldest first: (items, cursor). The
+    latest page without before=; cursor is the before= for the page of
+    earlier queries, None once there are none.
+    """
     try:
-        resp = requests.get(f"{API_URL}/sessions/{session_id}/history")
+        params = {"before": before} if before is not None else {}
+        resp = requests.get(f"{API_URL}/sessions/{session_id}/history", params=params, timeout=10)
         if resp.status_code == 200:
-            return resp.json()
+            return resp.json(), resp.headers.get("X-Next-Cursor")
     except:
         pass
-    return []
\ No newline at end of file
+    return [], None
\ No newline at end of file
@@ -7,6 +7,7 @@ import json
 
 # Import the UI utility functions from the same app directory
 from .ui_utils import get_all_chart_images, extract_page_number, get_charts_for_page
+from src.api_client import get_history
 
 # Configuration
 RAG_API_URL = os.environ.get("RAG_API_URL", "http://rag_core:8000")
@@ -100,7 +101,19 @@ def _display_interaction_details(results: list):
 
             with st.container(border=True):
                 st.write(source_info)
-                st.markdown(result["text"])
+                # History sources are previews; fetch the full text on request
+                full_path = result.get("full_path")
+                if result.get("truncated") and full_path:
+                    if st.button("Show full source", key=full_path):
+                        try:
+                            resp = requests.get(f"{RAG_API_URL}{full_path}", timeout=10)
+                            st.markdown(resp.json()["text"])
+                        except Exception as e:
+                            st.error(f"Could not load source: {e}")
+                    else:
+                        st.markdown(result["text"] + "…")
+                else:
+                    st.markdown(result["text"])
 
 
 def display_main_content():
@@ -147,6 +160,12 @@ def display_main_content():
 
 def display_chat_history():
     """Loads and displays the full Q&A history for the active session."""
+    cursor = st.session_state.get("history_cursor")
+    if cursor and st.button("⬆️ Load earlier messages"):
+        earlier, st.session_state.history_cursor = get_history(st.session_state.session_id, before=cursor)
+        st.session_state.chat_history = earlier + st.session_state.get("chat_history", [])
+        st.rerun()
+
     history = st.session_state.get("chat_history", [])
 
     for interaction in history:
@@ -185,38 +204,72 @@ def display_qa_interface():
             st.markdown(question)
 
         with st.chat_message("assistant", avatar=bot_svg):
-            with st.spinner("🤔 Finding answers..."):
-                try:
-                    payload = {"session_id": session_id, "question": question}
-                    response = requests.post(
-                        f"{RAG_API_URL}/query", json=payload, timeout=120
-                    )
+            try:
+                payload = {"session_id": session_id, "question": question}
+                stream = _stream_query(payload)
 
-                    if response.status_code != 200:
-                        st.error(f"API Error: {response.text}")
-                        return
+                # Sources arrive before any tokens, so the spinner only
+                # covers retrieval; the answer then renders as it streams.
+                with st.spinner("🤔 Finding answers..."):
+                    event, data = next(stream, ("error", {"error": "Empty response."}))
 
-                    data = response.json()
-                    if "error" in data:
-                        st.error(f"Backend Error: {data['error']}")
-                        return
+                if event == "error":
+                    st.error(f"Backend Error: {data['error']}")
+                    return
 
-                    answer = data.get("response", "No response.")
-                    results = data.get("results", [])
+                results = data if event == "sources" else data.get("results", [])
+                final = {}
 
-                    st.markdown(answer)
+                def tokens():
+                    for event, data in stream:
+                        if event == "token":
+                            yield data
+                        elif event == "done":
+                            final.update(data)
+                        elif event == "error":
+                            final["error"] = data.get("error")
 
-                    if "chat_history" not in st.session_state:
-                        st.session_state.chat_history = []
+                answer = st.write_stream(tokens())
 
-                    st.session_state.chat_history.append(
-                        {"question": question, "response": answer, "sources": results}
-                    )
-                    _display_interaction_details(results)
+                if "error" in final:
+                    st.error(f"Backend Error: {final['error']}")
+                    return
+
+                answer = final.get("response", answer) or "No response."
+                results = final.get("results", results)
+
+                if "chat_history" not in st.session_state:
+                    st.session_state.chat_history = []
+
+                st.session_state.chat_history.append(
+                    {"question": question, "response": answer, "sources": results}
+                )
+                _display_interaction_details(results)
+
+            except Exception as e:
+                st.error(f"An unexpected error occurred: {str(e)}")
+                traceback.print_exc()
+
+
+def _stream_query(payload):
+    """
+    Calls the SSE endpoint and yields (event, data) tuples as they arrive.
+    """
+    response = requests.post(
+        f"{RAG_API_URL}/query/stream", json=payload, stream=True, timeout=120
+    )
+    if response.status_code != 200:
+        yield "error", {"error": response.text}
+        return
 
-                except Exception as e:
-                    st.error(f"An unexpected error occurred: {str(e)}")
-                    traceback.print_exc()
+    event = "message"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):].strip())
 
 
 def display_chart_browser():
@@ -3,8 +3,12 @@ import os
 import time
 import requests
 import json
+import uuid
+import threading
 from pathlib import Path
 
+from src.event_listener import get_event_listener, stage_fraction
+
 # Environment Variables
 RAG_API_URL = os.environ.get("RAG_API_URL", "http://rag_core:8000")
 SHARED_UPLOAD_DIR = "/app/data/uploads"
@@ -16,14 +20,10 @@ def display_sidebar():
         st.markdown("<br>", unsafe_allow_html=True)
 
         # In microservice mode, the backend handles API keys,
-        # but we check if the backend is reachable.
-        if "backend_reachable" not in st.session_state:
-            try:
-                requests.get(f"{RAG_API_URL}/docs", timeout=2)
-                st.session_state.backend_reachable = True
-            except:
-                st.error("❌ Cannot connect to RAG Backend. Is Docker running?")
-                st.stop()
+        # but we check if the backend is reachable (its event stream is connected).
+        if not get_event_listener().connected.wait(timeout=3):
+            st.error("❌ Cannot connect to RAG Backend. Is Docker running?")
+            st.stop()
 
         display_session_loader()
 
@@ -46,14 +46,8 @@ def display_session_loader():
     st.markdown("# 🧠 Smart RAG Document Analyzer")
     st.markdown("### 🗂️ Load Session")
 
-    # Fetch sessions from API
-    sessions = []
-    try:
-        response = requests.get(f"{RAG_API_URL}/sessions")
-        if response.status_code == 200:
-            sessions = response.json()
-    except Exception as e:
-        st.error(f"Error fetching sessions: {e}")
+    # Kept current by the backend's event stream, no request per rerun
+    sessions = get_event_listener().sessions()
 
     # Create options for the selectbox
     # API returns: [{"id": 1, "name": "file.pdf", "date": "...", "docs": 1}]
@@ -76,6 +70,7 @@ def display_session_loader():
             # Reset session state
             st.session_state.session_id = None
             st.session_state.chat_history = []
+            st.session_state.history_cursor = None
             st.rerun()
 
 
@@ -83,13 +78,15 @@ def load_session(session_id: int):
     """Handles the logic of loading a past session."""
     with st.spinner(f"Loading session {session_id}..."):
         try:
-            # Fetch history to verify session exists and populate chat
+            # Fetch the latest history page to verify session exists and populate chat
             response = requests.get(f"{RAG_API_URL}/sessions/{session_id}/history")
 
             if response.status_code == 200:
                 history = response.json()
                 st.session_state.session_id = session_id
                 st.session_state.chat_history = history
+                # Earlier queries are loaded on demand (see display_chat_history)
+                st.session_state.history_cursor = response.headers.get("X-Next-Cursor")
                 st.success(f"Successfully loaded session ID {session_id}")
                 time.sleep(0.5)
                 st.rerun()
@@ -240,6 +237,7 @@ def process_documents(uploaded_files):
 
         session_id = session_resp.json()["session_id"]
         st.session_state.session_id = session_id  # Set immediately
+        st.session_state.history_cursor = None
 
         # 2. Process each file
         total_files = len(uploaded_files)
@@ -262,15 +260,37 @@ def process_documents(uploaded_files):
                     "session_id": session_id,
                     "filename": file.name,
                     "vision_model": st.session_state.selected_vision_model,
+                    "job_id": uuid.uuid4().hex,
                 }
 
-                # This call waits for the backend to finish processing
-                process_resp = requests.post(
-                    f"{RAG_API_URL}/process",
-                    json=payload,
-                    timeout=600,  # 10 minute timeout per file
-                )
-
+                # The call blocks until the backend is done; stage progress arrives on the event stream
+                outcome = {}
+
+                def run():
+                    try:
+                        outcome["resp"] = requests.post(
+                            f"{RAG_API_URL}/process",
+                            json=payload,
+                            timeout=600,  # 10 minute timeout per file
+                        )
+                    except Exception as e:
+                        outcome["error"] = e
+
+                worker = threading.Thread(target=run, daemon=True)
+                worker.start()
+                while worker.is_alive():
+                    event = get_event_listener().job(payload["job_id"])
+                    if event and event["type"] == "ingestion_progress":
+                        counter = f" {event['done']}/{event['total']}" if event.get("total") else ""
+                        progress_bar.progress(
+                            (idx + stage_fraction(event)) / total_files,
+                            text=f"{file.name}: {event['stage']}{counter}",
+                        )
+                    worker.join(timeout=0.25)
+
+                if "error" in outcome:
+                    raise outcome["error"]
+                process_resp = outcome["resp"]
                 if process_resp.status_code != 200:
                     st.error(f"Error processing {file.name}: {process_resp.text}")
 
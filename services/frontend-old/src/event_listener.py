@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import threading
+
+import requests
+import streamlit as st
+
+API_URL = os.environ.get("RAG_API_URL", "http://rag_core:8000")
+MAX_TRACKED_JOBS = 200
+
+# Share of one file's processing time each stage starts at / ends at (rough)
+STAGE_SPAN = {
+    "parsing": (0.0, 0.15),
+    "vision": (0.15, 0.6),
+    "chunking": (0.6, 0.65),
+    "embedding": (0.65, 0.9),
+    "indexing": (0.9, 0.95),
+    "saving": (0.95, 1.0),
+}
+
+
+def stage_fraction(event):
+    """Fraction (0-1) of one document's ingestion an ingestion_progress event stands for."""
+    start, end = STAGE_SPAN.get(event.get("stage"), (0.0, 0.0))
+    part = event["done"] / event["total"] if event.get("total") else 0.0
+    return start + (end - start) * part
+
+
+class EventListener:
+    """
+    Follows the rag_core /events stream (Server-Sent Events) in a background
+    thread and keeps what the sidebar needs: the session list (fetched once
+    per connection, then updated from session/document events) and the
+    latest event of each ingestion job. Reruns read this state instead of
+    calling the API.
+    """
+
+    def __init__(self, api_url=API_URL):
+        self.api_url = api_url
+        self.connected = threading.Event()
+        self._lock = threading.Lock()
+        self._sessions = None
+        self._jobs = {}
+        self._last_event_id = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions or [])
+
+    def job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _refresh_sessions(self):
+        # /sessions is paged: follow X-Next-Cursor so no session is left out
+        sessions, params = [], {}
+        while True:
+            resp = requests.get(f"{self.api_url}/sessions", params=params, timeout=10)
+            resp.raise_for_status()
+            sessions.extend(resp.json())
+            cursor = resp.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            params["before"] = cursor
+        with self._lock:
+            self._sessions = sessions
+
+    def _upsert_session(self, session):
+        if not session:
+            return
+        with self._lock:
+            if self._sessions is None:
+                return
+            rest = [s for s in self._sessions if s["id"] != session["id"]]
+            self._sessions = sorted(rest + [session], key=lambda s: s["id"], reverse=True)
+
+    def _handle(self, event, data):
+        if event == "ready":
+            if self._sessions is None:
+                self._refresh_sessions()
+            self.connected.set()
+        elif event == "resync":
+            self._refresh_sessions()
+        elif event in ("session_created", "document_removed"):
+            self._upsert_session(data.get("session"))
+        elif event in ("ingestion_progress", "document_ready", "ingestion_failed"):
+            with self._lock:
+                self._jobs[data["job_id"]] = {**data, "type": event}
+                while len(self._jobs) > MAX_TRACKED_JOBS:
+                    self._jobs.pop(next(iter(self._jobs)))
+            if event == "document_ready":
+                self._upsert_session(data.get("session"))
+
+    def _run(self):
+        while True:
+            headers = {"Last-Event-ID": str(self._last_event_id)} if self._last_event_id else {}
+            try:
+                with requests.get(f"{self.api_url}/events", headers=headers, stream=True, timeout=(5, 60)) as resp:
+                    resp.raise_for_status()
+                    event, data, event_id = "message", [], None
+                    for line in resp.iter_lines(decode_unicode=True):
+                        if line:
+                            field, _, value = line.partition(":")
+                            value = value[1:] if value.startswith(" ") else value
+                            if field == "event":
+                                event = value
+                            elif field == "data":
+                                data.append(value)
+                            elif field == "id":
+                                event_id = value
+                            continue
+                        # Blank line: end of one frame
+                        if data:
+                            self._handle(event, json.loads("\n".join(data)))
+                        if event_id is not None and event_id.isdigit():
+                            self._last_event_id = int(event_id)
+                        event, data, event_id = "message", [], None
+            except Exception as e:
+                print(f"⚠️ Event stream disconnected: {e}")
+            self.connected.clear()
+            time.sleep(3)
+
+
+@st.cache_resource
+def get_event_listener():
+    """One listener per Streamlit server process, shared by all browser sessions."""
+    return EventListener()
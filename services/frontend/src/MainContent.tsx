@@ -1,11 +1,12 @@
-import React, { useState, useEffect, useRef } from 'react';
-import { useQuery, useMutation } from '@tanstack/react-query';
+import React, { useState, useEffect, useMemo, useRef } from 'react';
+import { useInfiniteQuery, useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import ReactMarkdown from 'react-markdown';
 import { Send, FileText, Loader2 } from 'lucide-react';
 import { Link } from 'react-router-dom'; // <--- Add this import
 
-import { fetchSessionDocuments, sendQuery, getSessionHistory } from './lib/api';
-import { ChatMessage } from './types';
+import { fetchSessionDocuments, sendQuery } from './lib/api';
+import { fetchPage } from './lib/paging';
+import { ChatMessage, HistoryItem } from './types';
 import { SourceViewer } from './components/SourceViewer';
 // REMOVED: import { ChartBrowser } ...
 
@@ -37,10 +38,12 @@ const WelcomeScreen = () => (
     </div>
 );
 export const MainContent = ({ sessionId }: { sessionId: string | null }) => {
+    const queryClient = useQueryClient();
     const [chatHistory, setChatHistory] = useState<ChatMessage[]>([]);
     const [input, setInput] = useState("");
     const scrollRef = useRef<HTMLDivElement>(null);
     const bottomRef = useRef<HTMLDivElement>(null);
+    const loadingEarlier = useRef(false);
 
     const { data: documents = [] } = useQuery({
         queryKey: ['documents', sessionId],
@@ -48,11 +51,18 @@ export const MainContent = ({ sessionId }: { sessionId: string | null }) => {
         enabled: !!sessionId,
     });
 
-    const { data: serverHistory } = useQuery({
+    // pages[0] is the latest page of the history; "Load earlier" appends older ones
+    const historyQuery = useInfiniteQuery({
         queryKey: ['history', sessionId],
-        queryFn: () => getSessionHistory(sessionId!),
+        queryFn: ({ pageParam }) => fetchPage<HistoryItem>(`/sessions/${sessionId}/history`, { before: pageParam }),
+        initialPageParam: undefined as number | undefined,
+        getNextPageParam: (last) => last.nextCursor ?? undefined,
         enabled: !!sessionId,
     });
+    const serverHistory = useMemo(
+        () => historyQuery.data && [...historyQuery.data.pages].reverse().flatMap((page) => page.items),
+        [historyQuery.data]
+    );
 
     useEffect(() => {
         if (serverHistory && Array.isArray(serverHistory)) {
@@ -76,6 +86,8 @@ export const MainContent = ({ sessionId }: { sessionId: string | null }) => {
                 ...prev,
                 { role: 'assistant', content: data.response, sources: data.results }
             ]);
+            // Keep the cached pages current, so loading earlier pages doesn't drop this answer
+            queryClient.invalidateQueries({ queryKey: ['history', sessionId] });
         },
         onError: (error) => {
             setChatHistory(prev => [
@@ -86,6 +98,11 @@ export const MainContent = ({ sessionId }: { sessionId: string | null }) => {
     });
 
     useEffect(() => {
+        // Older messages were added on top: stay where the user is reading
+        if (loadingEarlier.current) {
+            loadingEarlier.current = false;
+            return;
+        }
         setTimeout(() => {
             bottomRef.current?.scrollIntoView({ behavior: 'smooth' });
         }, 100);
@@ -132,6 +149,21 @@ export const MainContent = ({ sessionId }: { sessionId: string | null }) => {
             <div className="flex-1 overflow-hidden relative bg-muted/20">
                 <ScrollArea className="h-full px-4 md:px-20 py-4" ref={scrollRef}>
                     <div className="space-y-8 pb-4 max-w-4xl mx-auto min-h-[500px]">
+                        {historyQuery.hasNextPage && (
+                            <div className="flex justify-center">
+                                <Button
+                                    variant="link"
+                                    size="sm"
+                                    onClick={() => {
+                                        loadingEarlier.current = true;
+                                        historyQuery.fetchNextPage();
+                                    }}
+                                    disabled={historyQuery.isFetchingNextPage}
+                                >
+                                    {historyQuery.isFetchingNextPage ? 'Loading…' : 'Load earlier messages'}
+                                </Button>
+                            </div>
+                        )}
                         {chatHistory.map((msg, idx) => (
                             <div key={idx} className={`flex gap-4 ${msg.role === 'user' ? 'justify-end' : 'justify-start'}`}>
 
@@ -56,7 +56,11 @@ export const ChartBrowser: React.FC<ChartBrowserProps> = ({ sessionId }) => {
                 {currentChart.url ? (
                     <a href={currentChart.url} target="_blank" rel="noopener noreferrer">
                         <img
-                            src={currentChart.url}
+                            // Web-sized thumbnail when available; the link keeps the full-resolution crop
+                            src={currentChart.thumbnail_url ?? currentChart.url}
+                            srcSet={currentChart.srcset ?? undefined}
+                            sizes="(max-width: 768px) 100vw, 400px"
+                            loading="lazy"
                             alt="Chart"
                             // Removed bg-white, added p-1
                             className="w-full h-full object-contain"
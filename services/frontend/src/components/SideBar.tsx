@@ -1,9 +1,11 @@
-import React, { useState } from 'react';
-import { useQuery, useQueryClient } from '@tanstack/react-query';
+import React, { useCallback, useRef, useState } from 'react';
+import { useInfiniteQuery, useQueryClient } from '@tanstack/react-query';
 import { Loader2, Upload, LayoutGrid, FileText } from 'lucide-react';
 
-import { getSessions, checkBackendHealth, uploadAndProcessDocument, createSession } from '../lib/api';
+import { uploadAndProcessDocument, createSession } from '../lib/api';
+import { fetchPage } from '../lib/paging';
 import { VisionModel } from '../types';
+import { IngestionEvent, SessionItem, stageFraction, useServerEvents } from '../hooks/useServerEvents';
 import { cn } from '@/lib/utils';
 import { ChartBrowser } from './ChartBrowser';
 
@@ -34,17 +36,31 @@ export const Sidebar: React.FC<SidebarProps> = ({ currentSessionId, onSessionCha
     const [progress, setProgress] = useState(0);
     const [statusMessage, setStatusMessage] = useState("");
 
-    const { data: isBackendOnline } = useQuery({
-        queryKey: ['health'],
-        queryFn: checkBackendHealth,
-        refetchInterval: 10000,
-    });
+    // The upload in progress: which session/file, and the file's place in the batch
+    const currentUpload = useRef<{ sessionId: number; filename: string; index: number; count: number } | null>(null);
+
+    const onIngestion = useCallback((event: IngestionEvent) => {
+        const upload = currentUpload.current;
+        if (event.type !== 'ingestion_progress' || !upload) return;
+        if (event.session_id !== upload.sessionId || event.filename !== upload.filename) return;
+        setProgress(Math.max(5, ((upload.index + stageFraction(event)) / upload.count) * 100));
+        const counter = event.total ? ` ${event.done}/${event.total}` : '';
+        setStatusMessage(`${upload.filename}: ${event.stage}${counter}...`);
+    }, []);
+
+    // Pushed events keep the session list current; no health or session polling
+    const { connected: isBackendOnline } = useServerEvents(onIngestion);
 
-    const { data: sessions = [] } = useQuery({
+    // Newest first, one page at a time; older pages load on demand
+    const sessionsQuery = useInfiniteQuery({
         queryKey: ['sessions'],
-        queryFn: getSessions,
-        enabled: !!isBackendOnline,
+        queryFn: ({ pageParam }) => fetchPage<SessionItem>('/sessions', { before: pageParam }),
+        initialPageParam: undefined as number | undefined,
+        getNextPageParam: (last) => last.nextCursor ?? undefined,
+        enabled: isBackendOnline,
+        staleTime: Infinity,
     });
+    const sessions = sessionsQuery.data?.pages.flatMap((page) => page.items) ?? [];
 
     const handleFileUpload = async (event: React.ChangeEvent<HTMLInputElement>) => {
         if (!event.target.files || event.target.files.length === 0) return;
@@ -60,15 +76,15 @@ export const Sidebar: React.FC<SidebarProps> = ({ currentSessionId, onSessionCha
 
             for (let i = 0; i < files.length; i++) {
                 const file = files[i];
-                const percent = ((i) / files.length) * 100;
-                setProgress(Math.max(10, percent));
-                setStatusMessage(`Processing ${file.name}...`);
+                currentUpload.current = { sessionId: Number(newSessionId), filename: file.name, index: i, count: files.length };
+                setProgress(Math.max(5, (i / files.length) * 100));
+                setStatusMessage(`Uploading ${file.name}...`);
                 await uploadAndProcessDocument(newSessionId, file, selectedModel);
             }
 
+            currentUpload.current = null;
             setProgress(100);
             setStatusMessage("Done!");
-            queryClient.invalidateQueries({ queryKey: ['sessions'] });
             queryClient.invalidateQueries({ queryKey: ['documents', newSessionId] });
             queryClient.invalidateQueries({ queryKey: ['charts', newSessionId] });
 
@@ -81,6 +97,7 @@ export const Sidebar: React.FC<SidebarProps> = ({ currentSessionId, onSessionCha
 
         } catch (error) {
             console.error(error);
+            currentUpload.current = null;
             setStatusMessage("Error during processing.");
             setIsProcessing(false);
         }
@@ -135,6 +152,15 @@ export const Sidebar: React.FC<SidebarProps> = ({ currentSessionId, onSessionCha
                                         ))}
                                     </SelectContent>
                                 </Select>
+                                {sessionsQuery.hasNextPage && (
+                                    <button
+                                        className="text-xs text-blue-500 hover:underline"
+                                        onClick={() => sessionsQuery.fetchNextPage()}
+                                        disabled={sessionsQuery.isFetchingNextPage}
+                                    >
+                                        {sessionsQuery.isFetchingNextPage ? 'Loading…' : 'Load older sessions'}
+                                    </button>
+                                )}
                             </div>
 
                             <Separator />
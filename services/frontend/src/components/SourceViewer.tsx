@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useState } from 'react';
 import ReactMarkdown from 'react-markdown';
 import { SearchResult, SessionDocument } from '../types';
 import { Accordion, AccordionContent, AccordionItem, AccordionTrigger } from '@/components/ui/accordion';
@@ -9,6 +9,41 @@ interface SourceViewerProps {
     documents: SessionDocument[];
 }
 
+// Full text of a truncated history source, fetched when the user asks for it
+const SourceText: React.FC<{ src: SearchResult }> = ({ src }) => {
+    const [fullText, setFullText] = useState<string | null>(null);
+    const [loading, setLoading] = useState(false);
+
+    const loadFull = async () => {
+        if (!src.full_url) return;
+        setLoading(true);
+        try {
+            const resp = await fetch(src.full_url);
+            if (resp.ok) setFullText((await resp.json()).text);
+        } finally {
+            setLoading(false);
+        }
+    };
+
+    return (
+        <>
+            <ReactMarkdown
+                components={{
+                    p: ({ node, ...props }) => <p className="mb-1 last:mb-0" {...props} />,
+                    strong: ({ node, ...props }) => <span className="font-semibold text-foreground" {...props} />,
+                }}
+            >
+                {fullText ?? (src.truncated ? `${src.text}…` : src.text)}
+            </ReactMarkdown>
+            {src.truncated && fullText === null && (
+                <button className="mt-1 text-blue-500 hover:underline" onClick={loadFull} disabled={loading}>
+                    {loading ? 'Loading…' : 'Show full source'}
+                </button>
+            )}
+        </>
+    );
+};
+
 export const SourceViewer: React.FC<SourceViewerProps> = ({ sources }) => {
     if (!sources || sources.length === 0) return null;
 
@@ -35,14 +70,7 @@ export const SourceViewer: React.FC<SourceViewerProps> = ({ sources }) => {
                                         </div>
                                         <div className="text-muted-foreground text-xs leading-relaxed">
                                             {/* Safe Markdown usage */}
-                                            <ReactMarkdown
-                                                components={{
-                                                    p: ({ node, ...props }) => <p className="mb-1 last:mb-0" {...props} />,
-                                                    strong: ({ node, ...props }) => <span className="font-semibold text-foreground" {...props} />,
-                                                }}
-                                            >
-                                                {src.text}
-                                            </ReactMarkdown>
+                                            <SourceText src={src} />
                                         </div>
                                     </Card>
                                 );
@@ -0,0 +1,129 @@
+import { useEffect, useRef, useState } from 'react';
+import { InfiniteData, QueryClient, useQueryClient } from '@tanstack/react-query';
+
+import { fetchPage, Page } from '../lib/paging';
+
+const EVENTS_URL = 'http://localhost:8000/events';
+
+export interface SessionItem {
+    id: number;
+    name: string;
+    date: string;
+    docs: number;
+}
+
+export interface IngestionEvent {
+    type: 'ingestion_progress' | 'document_ready' | 'ingestion_failed';
+    job_id: string;
+    session_id: number;
+    filename: string;
+    stage?: 'parsing' | 'vision' | 'chunking' | 'embedding' | 'indexing' | 'saving';
+    done?: number | null;
+    total?: number | null;
+    error?: string;
+}
+
+// Share of one file's processing time each stage starts at / ends at (rough)
+const STAGE_SPAN: Record<string, [number, number]> = {
+    parsing: [0, 0.15],
+    vision: [0.15, 0.6],
+    chunking: [0.6, 0.65],
+    embedding: [0.65, 0.9],
+    indexing: [0.9, 0.95],
+    saving: [0.95, 1],
+};
+
+/** Fraction (0-1) of one document's ingestion an ingestion_progress event stands for. */
+export const stageFraction = (event: IngestionEvent): number => {
+    const [start, end] = STAGE_SPAN[event.stage ?? ''] ?? [0, 0];
+    const part = event.total ? (event.done ?? 0) / event.total : 0;
+    return start + (end - start) * part;
+};
+
+type SessionPages = InfiniteData<Page<SessionItem>, number | undefined>;
+
+/** Puts a session into the cached ['sessions'] pages: replaced where it is, or on top if it is new. */
+const upsertSession = (queryClient: QueryClient, session: SessionItem | null) => {
+    if (!session) return;
+    queryClient.setQueryData<SessionPages>(['sessions'], (old) => {
+        if (!old || old.pages.length === 0) return old;
+        let found = false;
+        const pages = old.pages.map((page) => ({
+            ...page,
+            items: page.items.map((s) => {
+                if (s.id !== session.id) return s;
+                found = true;
+                return session;
+            }),
+        }));
+        // Sessions older than the loaded pages show up when those pages are loaded
+        if (!found && session.id > (pages[0].items[0]?.id ?? 0)) {
+            pages[0] = { ...pages[0], items: [session, ...pages[0].items] };
+        }
+        return { ...old, pages };
+    });
+};
+
+/** After missed events: fetches the sessions created since the newest cached one (since= cursor). */
+const refreshNewSessions = async (queryClient: QueryClient) => {
+    const newest = queryClient.getQueryData<SessionPages>(['sessions'])?.pages[0]?.items[0]?.id;
+    if (newest === undefined) {
+        await queryClient.invalidateQueries({ queryKey: ['sessions'] });
+        return;
+    }
+    const fresh: SessionItem[] = [];
+    let before: number | undefined;
+    do {
+        const page = await fetchPage<SessionItem>('/sessions', { since: newest, before });
+        fresh.push(...page.items);
+        before = page.nextCursor ?? undefined;
+    } while (before !== undefined);
+    // Oldest first, so each one lands on top of the previous
+    fresh.reverse().forEach((session) => upsertSession(queryClient, session));
+};
+
+/**
+ * Subscribes to the rag_core /events stream (Server-Sent Events). Session and
+ * document events update the cached ['sessions'] pages and invalidate the
+ * session's documents/charts; ingestion events go to onIngestion. Returns
+ * whether the stream is connected, which doubles as the backend health check.
+ */
+export const useServerEvents = (onIngestion?: (event: IngestionEvent) => void) => {
+    const queryClient = useQueryClient();
+    const [connected, setConnected] = useState(false);
+    const onIngestionRef = useRef(onIngestion);
+    onIngestionRef.current = onIngestion;
+
+    useEffect(() => {
+        // EventSource reconnects by itself and resends Last-Event-ID
+        const source = new EventSource(EVENTS_URL);
+
+        const onSessionEvent = (e: MessageEvent) => {
+            const data = JSON.parse(e.data);
+            upsertSession(queryClient, data.session);
+            queryClient.invalidateQueries({ queryKey: ['documents', String(data.session_id)] });
+            queryClient.invalidateQueries({ queryKey: ['charts', String(data.session_id)] });
+        };
+
+        const onJobEvent = (type: IngestionEvent['type']) => (e: MessageEvent) => {
+            const data = JSON.parse(e.data);
+            if (type === 'document_ready') onSessionEvent(e);
+            onIngestionRef.current?.({ ...data, type });
+        };
+
+        source.addEventListener('ready', () => setConnected(true));
+        source.addEventListener('resync', () => {
+            refreshNewSessions(queryClient).catch(console.error);
+        });
+        source.addEventListener('session_created', onSessionEvent);
+        source.addEventListener('document_removed', onSessionEvent);
+        source.addEventListener('document_ready', onJobEvent('document_ready'));
+        source.addEventListener('ingestion_progress', onJobEvent('ingestion_progress'));
+        source.addEventListener('ingestion_failed', onJobEvent('ingestion_failed'));
+        source.onerror = () => setConnected(false);
+
+        return () => source.close();
+    }, [queryClient]);
+
+    return { connected };
+};
@@ -0,0 +1,20 @@
+const API_BASE = 'http://localhost:8000';
+
+export interface Page<T> {
+    items: T[];
+    // X-Next-Cursor of the response: the cursor for the next page, null on the last one
+    nextCursor: number | null;
+}
+
+/** GETs one page of a paged list endpoint (/sessions, /sessions/{id}/history). */
+export const fetchPage = async <T,>(path: string, params: Record<string, number | undefined> = {}): Promise<Page<T>> => {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== undefined) query.set(key, String(value));
+    });
+    const qs = query.toString();
+    const resp = await fetch(`${API_BASE}${path}${qs ? `?${qs}` : ''}`);
+    if (!resp.ok) throw new Error(`GET ${path} failed: ${resp.status}`);
+    const cursor = resp.headers.get('X-Next-Cursor');
+    return { items: await resp.json(), nextCursor: cursor ? Number(cursor) : null };
+};
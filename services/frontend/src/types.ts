@@ -12,6 +12,19 @@ export interface SearchResult {
     source: string;
     page?: number;
     score?: number;
+    // History sources are previews; the full text is fetched from full_url
+    truncated?: boolean;
+    full_url?: string;
+    chars?: number;
+}
+
+// One row of /sessions/{id}/history
+export interface HistoryItem {
+    id: number;
+    question: string;
+    response: string;
+    sources: SearchResult[];
+    timestamp: string;
 }
 
 export interface ChatMessage {
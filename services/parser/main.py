@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from typing import Dict, Optional
 import os
 from src.core.document_parser import DocumentParser
 
@@ -9,6 +10,8 @@ app = FastAPI()
 class ParseRequest(BaseModel):
     file_path: str
     output_dir: str
+    # Previous revision's page manifest ({page_key: {"hash", "images"}}) for re-ingestion
+    previous_pages: Optional[Dict[str, Dict]] = None
 
 
 @app.post("/parse")
@@ -21,12 +24,22 @@ def parse_document(req: ParseRequest):
     os.makedirs(req.output_dir, exist_ok=True)
 
     # Initialize parser (Vision is None because this service only detects/crops)
-    parser = DocumentParser(vision_model=None, output_dir=req.output_dir)
+    parser = DocumentParser(
+        vision_model=None, output_dir=req.output_dir, previous_pages=req.previous_pages
+    )
 
     try:
         # Helper to get both text and images
         markdown_text, image_paths = parser.parse_and_get_images(req.file_path)
-        return {"text": markdown_text, "images": image_paths}
+        unchanged = sum(p["unchanged"] for p in parser.pages)
+        if req.previous_pages:
+            print(f"✓ {unchanged}/{len(parser.pages)} pages unchanged since the previous revision")
+        return {
+            "text": markdown_text,
+            "images": image_paths,
+            "pages": parser.pages,
+            "charts": parser.charts,
+        }
     except Exception as e:
         print(f"Error parsing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
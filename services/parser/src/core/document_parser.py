@@ -1,6 +1,8 @@
 import os
 import re
 import io
+import shutil
+import hashlib
 import fitz  # PyMuPDF
 from PIL import Image
 from docx import Document
@@ -11,12 +13,119 @@ import tempfile
 
 # Import Chart Detector
 from src.utils.chart_detection import PubLayNetDetector
+from src.utils.thumbnails import make_thumbnails
 
 
 class DocumentParser:
-    def __init__(self, vision_model, output_dir: str):
+    def __init__(self, vision_model, output_dir: str, previous_pages: Optional[Dict[str, Dict]] = None):
+        """
+        Args:
+            previous_pages: Page manifest of the previous revision,
+                {page_key: {"hash", "images", "charts"}}. Pages whose hash matches
+                a previous page (wherever it was: inserting or removing a page
+                shifts the rest) skip chart detection and get that page's crops
+                copied over, renamed to their new page.
+        """
         self.output_dir = output_dir
         self.layout_detector = PubLayNetDetector(confidence_threshold=0.5, padding=60)
+        self.previous_pages = previous_pages or {}
+        # hash -> (previous page key, manifest entry); the first page wins if two are identical
+        self._previous_by_hash: Dict[str, Tuple[str, Dict]] = {}
+        for key, entry in self.previous_pages.items():
+            if entry.get("hash"):
+                self._previous_by_hash.setdefault(entry["hash"], (key, entry))
+        # One entry per page/slide: {"key", "hash", "images", "charts", "unchanged", "previous_key"}
+        self.pages: List[Dict] = []
+        # One entry per saved crop: {"filename", "path", "page", "bbox", "class", "score",
+        # "width", "height", "sha256", "variants"}
+        self.charts: List[Dict] = []
+
+    @staticmethod
+    def _page_hash(text: str, *blobs: bytes) -> str:
+        """Hash of a page's text and rendered content."""
+        h = hashlib.sha256(text.encode("utf-8"))
+        for blob in blobs:
+            h.update(blob)
+        return h.hexdigest()
+
+    def _previous_page(self, key: str, page_hash: str) -> Optional[Tuple[str, Dict]]:
+        """(key, manifest entry) of the previous revision's page with this hash, same key first."""
+        same = self.previous_pages.get(key)
+        if same and same.get("hash") == page_hash:
+            return key, same
+        return self._previous_by_hash.get(page_hash)
+
+    @staticmethod
+    def _renamed(filename: str, old_key: str, key: str) -> str:
+        """A crop's file name on its new page ("page3_visual_1.png" -> "page4_visual_1.png")."""
+        if old_key != key and filename.startswith(old_key + "_"):
+            return key + filename[len(old_key):]
+        return filename
+
+    def _add_chart(self, path: str, page: Optional[int], bbox=None, cls=None, score=None, size=None, img=None):
+        if size is None:
+            with Image.open(path) as opened:
+                size = opened.size
+
+        # Web-sized WebP/AVIF variants for the chart browser; the PNG stays for vision
+        try:
+            sha256, variants = make_thumbnails(path, img)
+        except Exception as e:
+            print(f"Thumbnail generation failed for {path}: {e}")
+            sha256, variants = None, []
+
+        self.charts.append(
+            {
+                "filename": os.path.basename(path),
+                "path": path,
+                "page": page,
+                "bbox": list(bbox) if bbox else None,
+                "class": cls,
+                "score": score,
+                "width": size[0],
+                "height": size[1],
+                "sha256": sha256,
+                "variants": variants,
+            }
+        )
+
+    def _reuse_visuals(self, key: str, page_hash: str, output_dir: str, page: int) -> Optional[List[str]]:
+        """Copies an unchanged page's crops from the previous revision, or returns None."""
+        previous = self._previous_page(key, page_hash)
+        if not previous:
+            return None
+        old_key, entry = previous
+        old_paths = entry.get("images", [])
+        if not all(os.path.exists(p) for p in old_paths):
+            return None
+        old_charts = {c["filename"]: c for c in entry.get("charts", [])}
+        new_paths = []
+        for old_path in old_paths:
+            new_path = os.path.join(output_dir, self._renamed(os.path.basename(old_path), old_key, key))
+            if os.path.abspath(old_path) != os.path.abspath(new_path):
+                shutil.copy2(old_path, new_path)
+            new_paths.append(new_path)
+
+            meta = old_charts.get(os.path.basename(old_path))
+            if meta:
+                self._add_chart(new_path, page, meta["bbox"], meta["class"], meta["score"], (meta["width"], meta["height"]))
+            else:
+                self._add_chart(new_path, page)
+        return new_paths
+
+    def _record_page(self, key: str, page_hash: str, images: List[str]):
+        previous = self._previous_page(key, page_hash)
+        self.pages.append(
+            {
+                "key": key,
+                "hash": page_hash,
+                "images": images,
+                "charts": [c for c in self.charts if c["path"] in images],
+                "unchanged": previous is not None,
+                # Key the page had in the previous revision (differs when pages moved)
+                "previous_key": previous[0] if previous else None,
+            }
+        )
 
     def parse_and_get_images(self, file_path: str) -> Tuple[str, List[str]]:
         """
@@ -46,15 +155,22 @@ class DocumentParser:
         doc = fitz.open(path)
         full_text = []
         for i, page in enumerate(doc):
+            key = f"page{i+1}"
+            page_text = page.get_text()
+
             # Text
-            full_text.append(f"## Page {i+1}\n{page.get_text()}")
+            full_text.append(f"## Page {i+1}\n{page_text}")
 
             # Image for detection
             pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
+            page_hash = self._page_hash(page_text, pix.samples)
 
-            # Detect & Crop
-            crops = self._process_visuals(img, f"page{i+1}", output_dir)
+            # Detect & Crop (unchanged pages reuse the previous revision's crops)
+            crops = self._reuse_visuals(key, page_hash, output_dir, i + 1)
+            if crops is None:
+                img = Image.open(io.BytesIO(pix.tobytes("png")))
+                crops = self._process_visuals(img, key, output_dir, i + 1)
+            self._record_page(key, page_hash, crops)
             img_list.extend(crops)
 
             # Add placeholders
@@ -70,21 +186,27 @@ class DocumentParser:
         for para in doc.paragraphs:
             full_text.append(para.text)
 
+        # DOCX has no reliable page boundaries: the whole file is one "page"
+        blobs = []
+
         # Extract images from relationships
         for rel in doc.part.rels.values():
             if "image" in rel.target_ref:
                 try:
                     img_data = rel.target_part.blob
+                    blobs.append(img_data)
                     img = Image.open(io.BytesIO(img_data))
                     if img.width > 150 and img.height > 150:
                         fname = f"docx_img_{len(img_list)}.png"
                         save_path = os.path.join(output_dir, fname)
                         img.save(save_path)
                         img_list.append(save_path)
+                        self._add_chart(save_path, None, cls="Embedded", size=img.size, img=img)
                         full_text.append(f"\n[CHART_PLACEHOLDER:{fname}]\n")
                 except Exception as e:
                     print(f"Error extracting DOCX image: {e}")
 
+        self._record_page("document", self._page_hash("\n".join(full_text), *blobs), list(img_list))
         return "\n\n".join(full_text)
 
     def _extract_from_pptx(self, path, output_dir, img_list):
@@ -97,19 +219,25 @@ class DocumentParser:
         print(f"  Converted {len(slide_images)} slides to images.")
 
         for i, slide in enumerate(prs.slides):
+            key = f"slide{i+1}"
             full_text.append(f"## Slide {i+1}")
 
             # Text Extraction
+            slide_text = []
             for shape in slide.shapes:
                 if hasattr(shape, "text") and shape.text.strip():
-                    full_text.append(shape.text)
+                    slide_text.append(shape.text)
+            full_text.extend(slide_text)
 
             # Visual Processing
             if i < len(slide_images):
+                page_hash = self._page_hash("\n".join(slide_text), slide_images[i].tobytes())
+
                 # Detect & Crop charts from the rendered slide
-                crops = self._process_visuals(
-                    slide_images[i], f"slide{i+1}", output_dir
-                )
+                crops = self._reuse_visuals(key, page_hash, output_dir, i + 1)
+                if crops is None:
+                    crops = self._process_visuals(slide_images[i], key, output_dir, i + 1)
+                self._record_page(key, page_hash, crops)
                 img_list.extend(crops)
 
                 for crop_path in crops:
@@ -166,13 +294,15 @@ class DocumentParser:
 
         return images
 
-    def _process_visuals(self, page_image, prefix, output_dir) -> List[str]:
-        bboxes = self.layout_detector.detect(page_image)
+    def _process_visuals(self, page_image, prefix, output_dir, page=None) -> List[str]:
+        regions = self.layout_detector.detect_regions(page_image)
         saved_paths = []
-        for i, (x1, y1, x2, y2) in enumerate(bboxes):
+        for i, region in enumerate(regions):
+            x1, y1, x2, y2 = region["bbox"]
             crop = page_image.crop((x1, y1, x2, y2))
             fname = f"{prefix}_visual_{i+1}.png"
             path = os.path.join(output_dir, fname)
             crop.save(path)
             saved_paths.append(path)
+            self._add_chart(path, page, region["bbox"], region["class"], region["score"], crop.size, crop)
         return saved_paths
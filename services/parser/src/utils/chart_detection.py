@@ -41,6 +41,16 @@ class ChartDetector:
         """
         return []
 
+    def detect_regions(self, page_image: Image.Image) -> List[Dict[str, Any]]:
+        """
+        Like detect(), with detection metadata.
+        Returns: List of {"bbox": (x1, y1, x2, y2), "class": str, "score": float | None}
+        """
+        return [
+            {"bbox": bbox, "class": "Figure", "score": None}
+            for bbox in self.detect(page_image)
+        ]
+
     def offload_model(self):
         """Free up resources."""
         pass
@@ -141,6 +151,14 @@ class PubLayNetDetector(ChartDetector):
         Runs detection on a PIL Image.
         Returns list of bboxes: (x1, y1, x2, y2)
         """
+        return [region["bbox"] for region in self.detect_regions(page_image)]
+
+    def detect_regions(self, page_image: Image.Image) -> List[Dict[str, Any]]:
+        """
+        Runs detection on a PIL Image.
+        Returns list of {"bbox": (x1, y1, x2, y2), "class", "score"}; regions
+        from the CV fallback have class "Figure" and score None.
+        """
         # Ensure model is loaded
         if not self._is_loaded and _DETECTRON2_AVAILABLE:
             self.load_model()
@@ -176,7 +194,9 @@ class PubLayNetDetector(ChartDetector):
                         x2 = min(img_w, x2 + self.padding)
                         y2 = min(img_h, y2 + self.padding)
 
-                        detections.append((x1, y1, x2, y2))
+                        detections.append(
+                            {"bbox": (x1, y1, x2, y2), "class": cls_name, "score": float(score)}
+                        )
 
                 # If ML found something, return it. If not, try fallback?
                 # Usually if ML runs but finds nothing, there is nothing.
@@ -189,7 +209,10 @@ class PubLayNetDetector(ChartDetector):
 
         # 2. Fallback CV Heuristics
         print("Using CV fallback for chart detection...")
-        return self._detect_cv_fallback(img_np)
+        return [
+            {"bbox": bbox, "class": "Figure", "score": None}
+            for bbox in self._detect_cv_fallback(img_np)
+        ]
 
     def _detect_cv_fallback(self, img: np.ndarray) -> List[Tuple[int, int, int, int]]:
         """Heuristic detection using Canny edges and contours."""
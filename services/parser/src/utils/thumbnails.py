@@ -0,0 +1,70 @@
+"""
+src/utils/thumbnails.py
+
+Web-sized variants of chart crops. The full-resolution PNG stays next to
+them for the vision service; the chart browser loads these instead.
+"""
+
+import os
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+# Max widths (px) to render; crops narrower than a size get one variant at native width
+THUMBNAIL_SIZES = [int(s) for s in os.environ.get("THUMBNAIL_SIZES", "320,960").split(",") if s.strip()]
+# Encoded in this order; formats this Pillow build can't write are skipped
+THUMBNAIL_FORMATS = [f.strip().lower() for f in os.environ.get("THUMBNAIL_FORMATS", "avif,webp").split(",") if f.strip()]
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", "80"))
+
+
+def supported_formats() -> List[str]:
+    Image.init()
+    return [f for f in THUMBNAIL_FORMATS if f.upper() in Image.SAVE]
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def make_thumbnails(crop_path: str, img: Optional[Image.Image] = None) -> Tuple[str, List[Dict]]:
+    """
+    Writes <crop dir>/thumbs/<stem>.<width>.<hash12>.<fmt> for each size and
+    format (skipping files that already exist).
+    Returns: (sha256 of the original crop, [{"path", "width", "height", "format", "bytes"}])
+    """
+    sha256 = file_sha256(crop_path)
+    if img is None:
+        with Image.open(crop_path) as opened:
+            img = opened.copy()
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+    thumb_dir = os.path.join(os.path.dirname(crop_path), "thumbs")
+    os.makedirs(thumb_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(crop_path))[0]
+
+    variants = []
+    widths = sorted({min(size, img.width) for size in THUMBNAIL_SIZES})
+    for width in widths:
+        resized = img if width == img.width else img.resize(
+            (width, max(1, round(img.height * width / img.width))), Image.LANCZOS
+        )
+        for fmt in supported_formats():
+            path = os.path.join(thumb_dir, f"{stem}.{width}.{sha256[:12]}.{fmt}")
+            if not os.path.exists(path):
+                resized.save(path, format=fmt.upper(), quality=THUMBNAIL_QUALITY)
+            variants.append(
+                {
+                    "path": path,
+                    "width": resized.width,
+                    "height": resized.height,
+                    "format": fmt,
+                    "bytes": os.path.getsize(path),
+                }
+            )
+    return sha256, variants
@@ -1,21 +1,43 @@
 import os
 import shutil
+import time
 import uuid
 import traceback
-from typing import List, Optional
+from typing import List, Literal, Optional
+import re
 import glob
 import json
-from fastapi import FastAPI, BackgroundTasks, HTTPException, UploadFile, File
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Query, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 # Import your custom modules
-from src.core.rag_pipeline import SmartRAG
+from src.core.rag_pipeline import SmartRAG, client as llm_gateway
+from src.core.pipeline_cache import PipelineCache
+from src.core.answer_cache import AnswerCache, document_set_key
+from src.core.embedding_cache import get_embedding_cache
+from src.core.event_bus import EventBus
+from src.core.persistence import delete_rag_state
+from src.core.source_refs import SourceHydrator, compact_sources
+from src.core.upload_store import UploadError, UploadStore, file_sha256
 from src.utils.db_utils import DatabaseManager
+from src.utils.metrics import metrics
 
 # --- Configuration ---
 DATA_DIR = "/app/data"
+MAX_BATCH_QUESTIONS = int(os.environ.get("MAX_BATCH_QUESTIONS", "100"))
+# Default / max page sizes for /sessions and /sessions/{id}/history
+SESSIONS_PAGE_SIZE = int(os.environ.get("SESSIONS_PAGE_SIZE", "50"))
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "200"))
+# History sources carry this many characters; the rest is fetched on expand
+SOURCE_PREVIEW_CHARS = int(os.environ.get("SOURCE_PREVIEW_CHARS", "300"))
+# /events: keep-alive comment interval, and min gap between progress events of one stage
+EVENTS_HEARTBEAT_S = float(os.environ.get("EVENTS_HEARTBEAT_S", "15"))
+PROGRESS_EVENT_INTERVAL_S = float(os.environ.get("PROGRESS_EVENT_INTERVAL_S", "0.5"))
 UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
 CHARTS_DIR = os.path.join(DATA_DIR, "charts")
 
@@ -27,6 +49,11 @@ os.makedirs(CHARTS_DIR, exist_ok=True)
 # --- App Initialization ---
 app = FastAPI(title="Smart RAG API", version="2.0")
 db = DatabaseManager(db_path=os.path.join(DATA_DIR, "history.db"))
+pipeline_cache = PipelineCache()
+answer_cache = AnswerCache(db)
+upload_store = UploadStore(UPLOAD_DIR)
+source_hydrator = SourceHydrator(db)
+events = EventBus()
 
 # --- Middleware (CORS) ---
 # Allows the React frontend (running on port 5173) to talk to this backend
@@ -36,6 +63,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # --- Static Files ---
@@ -45,6 +73,13 @@ app.mount("/static", StaticFiles(directory=DATA_DIR), name="static")
 
 
 # --- Pydantic Models ---
+class UploadStart(BaseModel):
+    filename: str
+    size: int
+    # Optional client-side sha256, verified on completion
+    sha256: Optional[str] = None
+
+
 class SessionCreate(BaseModel):
     filenames: List[str]
 
@@ -53,77 +88,189 @@ class ProcessRequest(BaseModel):
     session_id: int
     filename: str
     vision_model: str
+    # None -> VECTOR_INDEX_TYPE env var ("auto": chosen by vector count)
+    index_type: Optional[
+        Literal["auto", "flat", "sq8", "hnsw", "ivf_flat", "ivf_sq8", "ivf_pq"]
+    ] = None
+    # Tags this run's /events progress events; None -> generated
+    job_id: Optional[str] = None
+
+
+class ReplaceRequest(BaseModel):
+    filename: str
+    # None -> the vision model the old version was processed with
+    vision_model: Optional[str] = None
+    index_type: Optional[
+        Literal["auto", "flat", "sq8", "hnsw", "ivf_flat", "ivf_sq8", "ivf_pq"]
+    ] = None
+    # Diff page hashes against the old version and only reprocess changed pages
+    reingest: bool = True
+    job_id: Optional[str] = None
 
 
 class QueryRequest(BaseModel):
     session_id: int
     question: str
+    # None -> server default (RETRIEVAL_MODE env var, "hybrid" unless overridden)
+    retrieval_mode: Optional[Literal["dense", "sparse", "hybrid"]] = None
+    # None -> RERANK_ENABLED env var
+    rerank: Optional[bool] = None
+    # False skips the semantic answer cache (forces a fresh answer)
+    use_cache: bool = True
+
+
+class BatchQueryRequest(BaseModel):
+    session_id: int
+    questions: List[str]
+    retrieval_mode: Optional[Literal["dense", "sparse", "hybrid"]] = None
+    rerank: Optional[bool] = None
+    use_cache: bool = True
+    # None -> BATCH_LLM_CONCURRENCY env var
+    max_concurrency: Optional[int] = None
 
 
 # --- Endpoints ---
 
 
-@app.get("/sessions/{session_id}/charts")
-def get_session_charts(session_id: int):
-    """
-    Scans for charts AND matches them with descriptions from the DB.
-    """
-    docs = db.get_session_documents(session_id)
-    charts = []
+def _chart_rows(charts, descriptions):
+    """Parser crop metadata -> charts table rows (paths relative to DATA_DIR, as served under /static)."""
+    rows = []
+    for c in charts:
+        filename = c["filename"]
+        variants = [
+            {**{k: v for k, v in variant.items() if k != "path"}, "rel_path": os.path.relpath(variant["path"], DATA_DIR)}
+            for variant in c.get("variants") or []
+        ]
+        rows.append(
+            {
+                **c,
+                "variants": variants,
+                "rel_path": os.path.relpath(c["path"], DATA_DIR),
+                "description": descriptions.get(filename)
+                or descriptions.get(os.path.splitext(filename)[0]),
+            }
+        )
+    return rows
 
-    base_url = "http://localhost:8000/static"
 
-    for doc in docs:
+def _backfill_charts(session_id):
+    """Indexes crops of documents processed before the charts table existed (once per document)."""
+    for doc in db.get_unindexed_chart_documents(session_id):
+        try:
+            descriptions = json.loads(doc.get("chart_descriptions_json") or "{}")
+        except ValueError:
+            descriptions = {}
+
+        charts = []
         chart_dir = doc.get("chart_dir")
+        if chart_dir and os.path.exists(chart_dir):
+            for f in glob.glob(os.path.join(chart_dir, "**", "*.png"), recursive=True):
+                page_match = re.search(r"(?:page|slide)(\d+)", os.path.basename(f))
+                charts.append(
+                    {
+                        "filename": os.path.basename(f),
+                        "path": f,
+                        "page": int(page_match.group(1)) if page_match else 0,
+                    }
+                )
+        db.add_charts(doc["id"], session_id, _chart_rows(charts, descriptions))
 
-        # 1. Parse descriptions safely
-        # They might be stored as a JSON string or a dict depending on DB state
-        descriptions = doc.get("chart_descriptions", {})
-        if isinstance(descriptions, str):
-            try:
-                descriptions = json.loads(descriptions)
-            except:
-                descriptions = {}
 
-        # 2. Find files
-        if chart_dir and os.path.exists(chart_dir):
-            search_path = os.path.join(chart_dir, "**", "*.png")
-            files = glob.glob(search_path, recursive=True)
-
-            for f in files:
-                try:
-                    filename = os.path.basename(f)
-                    rel_path = os.path.relpath(f, "/app/data")
-                    url = f"{base_url}/{rel_path}"
-
-                    # Extract page number
-                    import re
-
-                    page_match = re.search(r"page(\d+)", filename)
-                    page_num = int(page_match.group(1)) if page_match else 0
-
-                    # 3. Lookup Description
-                    # We try exact match, then match without extension
-                    desc = descriptions.get(filename)
-                    if not desc:
-                        desc = descriptions.get(
-                            os.path.splitext(filename)[0], "No description available."
-                        )
-
-                    charts.append(
-                        {
-                            "url": url,
-                            "filename": filename,
-                            "doc_name": doc.get("original_filename", "Unknown"),
-                            "page": page_num,
-                            "description": desc,  # <--- Added this field
-                        }
-                    )
-                except ValueError:
-                    continue
+IMAGE_MEDIA_TYPES = {"webp": "image/webp", "avif": "image/avif", "png": "image/png"}
+# Content-hash URLs never change meaning, so clients may keep them forever
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+
+def _chart_image_urls(row):
+    """Thumbnail URLs for a chart row (None for charts indexed before thumbnails existed)."""
+    variants = json.loads(row.get("variants_json") or "[]")
+    if not row.get("content_hash") or not variants:
+        return {"thumbnail_url": None, "srcset": None, "images": []}
+
+    base = f"http://localhost:8000/images/charts/{row['id']}/{row['content_hash']}"
+    images = [
+        {"url": f"{base}?w={v['width']}&fmt={v['format']}", "width": v["width"], "format": v["format"], "bytes": v["bytes"]}
+        for v in variants
+    ]
+    # srcset in the most widely supported format present
+    fmt = "webp" if any(i["format"] == "webp" for i in images) else images[0]["format"]
+    same_fmt = sorted((i for i in images if i["format"] == fmt), key=lambda i: i["width"])
+    return {
+        "thumbnail_url": same_fmt[0]["url"],
+        "srcset": ", ".join(f"{i['url']} {i['width']}w" for i in same_fmt),
+        "images": images,
+    }
+
+
+@app.get("/images/charts/{chart_id}/{content_hash}")
+def get_chart_image(chart_id: int, content_hash: str, request: Request, w: Optional[int] = None, fmt: Optional[str] = None):
+    """
+    A chart crop at the smallest stored width >= w (largest if none is).
+    fmt picks webp/avif; without it the best format the Accept header allows
+    is used. fmt=png (or no thumbnails) returns the original crop.
+    """
+    chart = db.get_chart(chart_id)
+    if not chart or chart.get("content_hash") != content_hash:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    variants = json.loads(chart.get("variants_json") or "[]")
+    headers = {"Cache-Control": IMMUTABLE_CACHE}
+    if fmt is None:
+        accept = request.headers.get("accept", "")
+        available = {v["format"] for v in variants}
+        fmt = next((f for f in ("avif", "webp") if f in available and f"image/{f}" in accept), "png")
+        headers["Vary"] = "Accept"
+    headers["ETag"] = f'"{content_hash}-{w}-{fmt}"'
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    candidates = sorted((v for v in variants if v["format"] == fmt), key=lambda v: v["width"])
+    if candidates:
+        fits = [v for v in candidates if w is None or v["width"] >= w]
+        rel_path = (fits[0] if fits and w is not None else candidates[-1])["rel_path"]
+    else:
+        rel_path, fmt = chart["rel_path"], "png"
+
+    path = os.path.realpath(os.path.join(DATA_DIR, rel_path))
+    if not path.startswith(os.path.realpath(DATA_DIR) + os.sep) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, media_type=IMAGE_MEDIA_TYPES.get(fmt, "image/png"), headers=headers)
+
+
+@app.get("/sessions/{session_id}/charts")
+def get_session_charts(session_id: int, request: Request):
+    """
+    The session's chart crops with their descriptions and detection
+    metadata, from the charts table. Sends an ETag; an unchanged session
+    answers If-None-Match with 304.
+    """
+    _backfill_charts(session_id)
+
+    count, max_id = db.get_charts_version(session_id)
+    etag = f'W/"charts-{session_id}-{count}-{max_id}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
 
-    charts.sort(key=lambda x: (x["doc_name"], x["page"]))
-    return charts
+    base_url = "http://localhost:8000/static"
+    charts = [
+        {
+            "url": f"{base_url}/{row['rel_path']}",  # Full-resolution original
+            **_chart_image_urls(row),
+            "filename": row["filename"],
+            "doc_id": row["doc_id"],
+            "doc_name": row["doc_name"] or "Unknown",
+            "page": row["page"] or 0,
+            "description": row["description"] or "No description available.",
+            "bbox": json.loads(row["bbox_json"]) if row["bbox_json"] else None,
+            "class": row["class"],
+            "score": row["score"],
+            "width": row["width"],
+            "height": row["height"],
+        }
+        for row in db.get_session_charts(session_id)
+    ]
+    return JSONResponse(charts, headers=headers)
 
 
 @app.get("/")
@@ -131,46 +278,181 @@ def health_check():
     return {"status": "online", "service": "rag_core"}
 
 
+@app.get("/metrics")
+def get_metrics():
+    """Rolling latency metrics (e.g. time-to-first-token) for this process."""
+    return {
+        **metrics.summary(),
+        "pipeline_cache": pipeline_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "llm_gateway": llm_gateway.stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "events": events.stats(),
+    }
+
+
+def _record_upload(result):
+    db.add_upload(result["sha256"], result["original_filename"], result["filename"], result["size"])
+    return {"info": "File saved successfully", **result}
+
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     """
-    Receives a file from the React frontend and saves it to the shared volume.
+    Receives a file from the React frontend and streams it to the shared
+    volume, stored by content hash. Pass the returned "filename" to /process.
     """
     try:
-        file_location = os.path.join(UPLOAD_DIR, file.filename)
-
-        # Save file to disk
-        with open(file_location, "wb+") as file_object:
-            shutil.copyfileobj(file.file, file_object)
-
-        return {"info": "File saved successfully", "path": file_location}
+        result = await upload_store.save_stream(file.filename, file.read)
+        return await run_in_threadpool(_record_upload, result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
 
+# --- Resumable uploads: POST /uploads -> PUT chunks at offset -> POST complete ---
+
+
+def _upload_error(e: UploadError):
+    detail = {"error": str(e)}
+    if e.offset is not None:
+        detail["offset"] = e.offset  # Resume from here
+    return HTTPException(status_code=409, detail=detail)
+
+
+@app.post("/uploads")
+def start_upload(req: UploadStart):
+    return upload_store.start(req.filename, req.size, req.sha256)
+
+
+@app.get("/uploads/{upload_id}")
+def get_upload(upload_id: str):
+    """Bytes received so far; a client resumes by PUTting from this offset."""
+    try:
+        return upload_store.status(upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown upload")
+    except UploadError as e:
+        raise _upload_error(e)
+
+
+@app.put("/uploads/{upload_id}")
+async def append_upload(upload_id: str, offset: int, request: Request):
+    """Appends the raw request body at ?offset= (must equal the bytes received so far)."""
+    try:
+        return await upload_store.append(upload_id, offset, request.stream())
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown upload")
+    except UploadError as e:
+        raise _upload_error(e)
+
+
+@app.post("/uploads/{upload_id}/complete")
+def complete_upload(upload_id: str):
+    try:
+        return _record_upload(upload_store.complete(upload_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown upload")
+    except UploadError as e:
+        raise _upload_error(e)
+
+
 @app.get("/sessions")
-def get_sessions():
-    """Returns list of past sessions."""
+def get_sessions(
+    response: Response,
+    limit: int = Query(SESSIONS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[int] = None,
+    since: Optional[int] = None,
+):
+    """
+    Returns past sessions, newest first, one page at a time.
+    before=<id>: the page after the X-Next-Cursor header of the previous one.
+    since=<id>: only sessions created after that id (poll for new ones).
+    """
     try:
-        results = db.get_all_sessions()
-        # Map tuple to dict for JSON response
-        return [{"id": s[0], "name": s[1], "date": s[2], "docs": s[3]} for s in results]
+        results = db.get_sessions_page(limit + 1, before, since)
     except Exception as e:
         print(f"DB Error: {e}")
         return []
+    if len(results) > limit:
+        results = results[:limit]
+        response.headers["X-Next-Cursor"] = str(results[-1][0])
+    return [_session_item(s) for s in results]
+
+
+def _session_item(row):
+    """DB session row -> the /sessions list item (also sent with session events)."""
+    return {"id": row[0], "name": row[1], "date": row[2], "docs": row[3]} if row else None
 
 
 @app.post("/sessions")
 def create_session(req: SessionCreate):
     """Creates a new session entry in the DB."""
     session_id = db.create_session(req.filenames)
+    events.publish("session_created", {"session_id": session_id, "session": _session_item(db.get_session_summary(session_id))})
     return {"session_id": session_id}
 
 
+def _record_query(session_id, question, response, results):
+    """History keeps chunk references per source (see compact_sources); the text is read back from the chunk store."""
+    docs = {doc["id"]: doc for doc in db.get_session_documents(session_id)}
+    db.add_query_record(session_id, question, response, compact_sources(results, docs))
+
+
+def _source_ref(session_id, query_id, index, source):
+    """A history source as a reference: metadata + a text preview; the full text is at full_url."""
+    text = source.get("text") or ""
+    full_path = f"/sessions/{session_id}/history/{query_id}/sources/{index}"
+    return {
+        **{k: v for k, v in source.items() if k != "text"},
+        "index": index,
+        "text": text[:SOURCE_PREVIEW_CHARS],
+        "chars": len(text),
+        "truncated": len(text) > SOURCE_PREVIEW_CHARS,
+        "full_path": full_path,
+        "full_url": f"http://localhost:8000{full_path}",
+    }
+
+
 @app.get("/sessions/{session_id}/history")
-def get_history(session_id: int):
-    """Returns chat history for a specific session."""
-    return db.get_queries_for_session(session_id)
+def get_history(
+    session_id: int,
+    response: Response,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[int] = None,
+    since: Optional[int] = None,
+):
+    """
+    Returns chat history for a specific session, oldest first, with sources
+    as references (see _source_ref).
+    Default / before=<id>: the latest page (before that query id); when
+    older queries remain, X-Next-Cursor is the before= for the next page.
+    since=<id>: queries after that id; X-Next-Cursor is the next since=.
+    """
+    items = db.get_queries_page(session_id, limit + 1, before, since)
+    if len(items) > limit:
+        if since is None:
+            items = items[1:]  # Oldest first: the extra row is the oldest
+            response.headers["X-Next-Cursor"] = str(items[0]["id"])
+        else:
+            items = items[:limit]
+            response.headers["X-Next-Cursor"] = str(items[-1]["id"])
+
+    for item in items:
+        item["sources"] = [
+            _source_ref(session_id, item["id"], i, src)
+            for i, src in enumerate(source_hydrator.hydrate(item["sources"]))
+        ]
+    return items
+
+
+@app.get("/sessions/{session_id}/history/{query_id}/sources/{index}")
+def get_history_source(session_id: int, query_id: int, index: int):
+    """Full text and metadata of one source of a past answer."""
+    query = db.get_query(session_id, query_id)
+    if not query or not 0 <= index < len(query["sources"]):
+        raise HTTPException(status_code=404, detail="Source not found")
+    source = source_hydrator.hydrate([query["sources"][index]])[0]
+    return {**source, "index": index}
 
 
 @app.get("/sessions/{session_id}/documents")
@@ -185,55 +467,276 @@ def process_document(req: ProcessRequest):
     Triggers the RAG pipeline: Parser -> Vision -> Embedding.
     NOTE: This is a long-running synchronous process.
     """
-    file_path = os.path.join(UPLOAD_DIR, req.filename)
+    return _index_document(req.session_id, req.filename, req.vision_model, req.index_type, job_id=req.job_id)
+
 
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail=f"File not found at {file_path}")
+def _progress_publisher(job):
+    """progress callback for SmartRAG.index_document -> throttled ingestion_progress events."""
+    last = {}
+
+    def report(stage, done=None, total=None):
+        now = time.monotonic()
+        if done not in (None, 0, total) and now - last.get(stage, 0.0) < PROGRESS_EVENT_INTERVAL_S:
+            return
+        last[stage] = now
+        events.publish("ingestion_progress", {**job, "stage": stage, "done": done, "total": total})
+
+    return report
+
+
+def _index_document(session_id, filename, vision_model, index_type=None, previous=None, job_id=None):
+    """
+    Indexes one uploaded file into a session; returns the /process response.
+    previous: the old revision's page manifest and chart descriptions
+    (see _previous_revision), to only reprocess changed pages.
+    Progress goes out on /events as ingestion_progress, then document_ready
+    or ingestion_failed, all tagged with job_id.
+    """
+    job = {"job_id": job_id or uuid.uuid4().hex, "session_id": session_id, "filename": os.path.basename(filename)}
+    try:
+        result = _ingest(session_id, filename, vision_model, index_type, previous, _progress_publisher(job))
+    except Exception as e:
+        events.publish("ingestion_failed", {**job, "error": str(getattr(e, "detail", e))})
+        raise
+    events.publish(
+        "document_ready",
+        {**job, **result, "session": _session_item(db.get_session_summary(session_id))},
+    )
+    return {**result, "job_id": job["job_id"]}
+
+
+def _ingest(session_id, filename, vision_model, index_type, previous, progress):
+    """The indexing itself (or linking an identical, already processed upload)."""
+    file_path = _resolve_upload(filename)
+    filename = os.path.basename(file_path)
+
+    # Same bytes already processed with this vision model: share its state.
+    # Content-addressed uploads carry their hash in the path; only legacy flat files are hashed
+    content_hash = upload_store.content_hash(file_path) or file_sha256(file_path)
+    if index_type is None:
+        existing = db.find_processed_document(content_hash, vision_model)
+        if existing and os.path.exists(existing["faiss_index_path"]):
+            return _link_document(session_id, filename, existing)
 
     # Generate a unique directory for charts
     # We use uuid to prevent collisions if same filename uploaded twice
-    unique_folder = f"{uuid.uuid4()}_{req.filename}"
+    unique_folder = f"{uuid.uuid4()}_{filename}"
     output_dir = os.path.join(CHARTS_DIR, unique_folder)
     os.makedirs(output_dir, exist_ok=True)
 
-    print(f"🚀 Starting processing for {req.filename} using {req.vision_model}")
+    print(f"🚀 Starting processing for {filename} using {vision_model}")
 
     try:
         # 1. Initialize Pipeline
-        rag = SmartRAG(output_dir=output_dir, vision_model_name=req.vision_model)
+        rag = SmartRAG(
+            output_dir=output_dir,
+            vision_model_name=vision_model,
+            index_type=index_type,
+        )
 
         # 2. Index (Calls Parser Microservice -> Vision Microservice -> Local Embeds)
-        rag.index_document(file_path)
+        rag.index_document(file_path, previous=previous, progress=progress)
+        progress("saving")
 
         # 3. Add initial record to DB
         doc_id = db.add_document_record(
-            filename=req.filename,
-            vision_model=req.vision_model,
+            filename=filename,
+            vision_model=vision_model,
             chart_dir=output_dir,
             faiss_path="",  # Placeholder, updated below
             chunks_path="",  # Placeholder, updated below
             chart_descriptions=rag.chart_descriptions,
-            session_id=req.session_id,
+            session_id=session_id,
+            page_manifest=rag.page_manifest,
+            content_hash=content_hash,
         )
 
-        # 4. Save FAISS Index and Chunks to disk
-        rag.save_state(doc_id)
+        db.add_charts(doc_id, session_id, _chart_rows(rag.charts, rag.chart_descriptions))
+
+        # 4. Save FAISS Index and Chunk store to disk
+        faiss_path, chunks_path = rag.save_state(doc_id)
 
         # 5. Update DB with the specific paths where FAISS/Chunks were saved
-        # Note: SmartRAG.save_state usually saves to data/faiss_indexes/...
-        # We need to ensure these paths match what your SmartRAG class actually does.
-        faiss_path = f"/app/data/faiss_indexes/index_{doc_id}.faiss"
-        chunks_path = f"/app/data/chunks/chunks_{doc_id}.pkl"
+        db.update_document_paths(
+            doc_id, os.path.abspath(faiss_path), os.path.abspath(chunks_path)
+        )
 
-        db.update_document_paths(doc_id, faiss_path, chunks_path)
+        # 6. Cached answers for this session no longer cover all its documents
+        answer_cache.invalidate(session_id)
 
-        return {"status": "success", "doc_id": doc_id}
+        return {"status": "success", "doc_id": doc_id, **rag.index_stats}
 
     except Exception as e:
         traceback.print_exc()
+        shutil.rmtree(output_dir, ignore_errors=True)
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
 
+def _resolve_upload(filename):
+    """
+    Path of an uploaded file: "<sha256>/<name>" as returned by /upload, a
+    file written straight into UPLOAD_DIR, or the latest upload of that name.
+    """
+    upload_root = os.path.realpath(UPLOAD_DIR)
+    for candidate in (filename, db.get_latest_upload(os.path.basename(filename))):
+        if not candidate:
+            continue
+        path = os.path.realpath(os.path.join(UPLOAD_DIR, candidate))
+        if path.startswith(upload_root + os.sep) and os.path.isfile(path):
+            return path
+    raise HTTPException(status_code=404, detail=f"File not found: {filename}")
+
+
+def _link_document(session_id, filename, existing):
+    """Adds an already-processed document to a session without recomputing anything."""
+    print(f"✓ {filename} was already processed (doc {existing['id']}), linking its index")
+    doc_id = db.add_document_record(
+        filename=filename,
+        vision_model=existing["vision_model_used"],
+        chart_dir=existing["chart_dir"],
+        faiss_path=existing["faiss_index_path"],
+        chunks_path=existing["chunks_path"],
+        chart_descriptions=existing["chart_descriptions_json"],
+        session_id=session_id,
+        page_manifest=json.loads(existing.get("page_manifest_json") or "{}"),
+        content_hash=existing["content_hash"],
+    )
+    db.copy_charts(existing["id"], doc_id, session_id)
+    answer_cache.invalidate(session_id)
+    return {"status": "success", "doc_id": doc_id, "linked_from": existing["id"]}
+
+
+def _remove_document(doc):
+    """
+    Drops a document and everything derived from it: the pipeline cache
+    entry, its FAISS/BM25/chunk-store files, its chart crops and the DB row.
+    Other documents keep their own indexes, so nothing else is rebuilt.
+    Files shared with linked duplicates are kept until the last one goes,
+    and the chunk store as long as query history has sources in it.
+    """
+    pipeline_cache.evict(doc["id"])
+    db.delete_document(doc["id"])
+    chart_dir = doc.get("chart_dir")
+    index_refs, chart_refs = db.count_documents_sharing(doc.get("faiss_index_path"), chart_dir)
+
+    if not index_refs:
+        keep_chunks = bool(doc.get("chunks_path")) and db.chunk_store_referenced(doc["chunks_path"])
+        delete_rag_state(doc["id"], doc.get("faiss_index_path"), doc.get("chunks_path"), keep_chunks=keep_chunks)
+
+    # Only ever delete inside CHARTS_DIR
+    charts_root = os.path.realpath(CHARTS_DIR)
+    if not chart_refs and chart_dir and os.path.realpath(chart_dir).startswith(charts_root + os.sep):
+        shutil.rmtree(chart_dir, ignore_errors=True)
+
+    answer_cache.invalidate(doc["session_id"])
+    events.publish(
+        "document_removed",
+        {
+            "session_id": doc["session_id"],
+            "doc_id": doc["id"],
+            "filename": doc.get("original_filename"),
+            "session": _session_item(db.get_session_summary(doc["session_id"])),
+        },
+    )
+
+
+def _previous_revision(doc, vision_model):
+    """Page manifest + chart descriptions of a stored document, for re-ingestion."""
+    try:
+        pages = json.loads(doc.get("page_manifest_json") or "{}")
+        descriptions = json.loads(doc.get("chart_descriptions_json") or "{}")
+    except ValueError:
+        return None
+    # Descriptions from another vision model are not reused, only the crops
+    if doc.get("vision_model_used") != vision_model:
+        descriptions = {}
+    return {
+        "pages": pages,
+        "chart_descriptions": descriptions,
+        "faiss_path": doc.get("faiss_index_path"),
+        "chunks_path": doc.get("chunks_path"),
+    }
+
+
+def _session_document(session_id, doc_id):
+    doc = db.get_document(doc_id)
+    if not doc or doc["session_id"] != session_id:
+        raise HTTPException(status_code=404, detail=f"Document {doc_id} not found in session {session_id}")
+    return doc
+
+
+@app.delete("/sessions/{session_id}/documents/{doc_id}")
+def remove_document(session_id: int, doc_id: int):
+    """Removes one document from a session (index, chunks, charts, cached answers)."""
+    doc = _session_document(session_id, doc_id)
+    _remove_document(doc)
+    return {"status": "deleted", "doc_id": doc_id}
+
+
+@app.post("/sessions/{session_id}/documents/{doc_id}/replace")
+def replace_document(session_id: int, doc_id: int, req: ReplaceRequest):
+    """
+    Indexes a new version of a document, then removes the old one.
+    The old version keeps answering queries until the new one is ready.
+    With reingest, pages unchanged since the old version (matched by
+    content, so moved pages count) skip chart detection and vision, and
+    reuse the old version's chunks and FAISS vectors.
+    """
+    old = _session_document(session_id, doc_id)
+    vision_model = req.vision_model or old["vision_model_used"]
+    previous = _previous_revision(old, vision_model) if req.reingest else None
+    result = _index_document(session_id, req.filename, vision_model, req.index_type, previous, req.job_id)
+    _remove_document(old)
+    return {**result, "replaced_doc_id": doc_id}
+
+
+def _load_session_pipelines(docs):
+    """Re-hydrates one SmartRAG pipeline per processed document."""
+    pipelines = []
+
+    for doc in docs:
+        # Check if files exist before loading
+        if os.path.exists(doc["faiss_index_path"]) and os.path.exists(
+            doc["chunks_path"]
+        ):
+            pipelines.append(pipeline_cache.get(doc))
+        else:
+            print(
+                f"⚠️ Warning: Index files missing for doc {doc.get('original_filename')}"
+            )
+
+    return pipelines
+
+
+def _answer_cache_key(req, docs):
+    return document_set_key(docs, {"mode": req.retrieval_mode, "rerank": req.rerank})
+
+
+def _cached_answer(req, docs):
+    """Looks the question up in the answer cache; records a hit in the history."""
+    if not req.use_cache:
+        return None
+    try:
+        cached = answer_cache.lookup(req.session_id, _answer_cache_key(req, docs), req.question)
+    except Exception as e:
+        print(f"⚠️ Answer cache lookup failed: {e}")
+        return None
+    if cached:
+        _record_query(req.session_id, req.question, cached["response"], cached["results"])
+    return cached
+
+
+def _cache_answer(req, docs, result):
+    if result.get("partial"):
+        return  # Some documents missed the search deadline; don't reuse this answer
+    try:
+        answer_cache.store(
+            req.session_id, _answer_cache_key(req, docs), req.question, result["response"], result["results"]
+        )
+    except Exception as e:
+        print(f"⚠️ Answer cache store failed: {e}")
+
+
 @app.post("/query")
 def query(req: QueryRequest):
     """
@@ -244,25 +747,14 @@ def query(req: QueryRequest):
     if not docs:
         return {"response": "No documents found in this session.", "results": []}
 
-    pipelines = []
-
-    # 2. Re-hydrate RAG pipelines for each document
-    # (In a production app, we would cache these in memory to avoid reloading FAISS every time)
     try:
-        for doc in docs:
-            # We don't need to load the vision model again for querying, just the vector store
-            p = SmartRAG(output_dir=doc["chart_dir"], load_vision=False)
+        # 2. Serve repeated / near-duplicate questions from the answer cache
+        cached = _cached_answer(req, docs)
+        if cached:
+            return cached
 
-            # Check if files exist before loading
-            if os.path.exists(doc["faiss_index_path"]) and os.path.exists(
-                doc["chunks_path"]
-            ):
-                p.load_state(doc["faiss_index_path"], doc["chunks_path"])
-                pipelines.append(p)
-            else:
-                print(
-                    f"⚠️ Warning: Index files missing for doc {doc.get('original_filename')}"
-                )
+        # 3. Re-hydrate RAG pipelines for each document
+        pipelines = _load_session_pipelines(docs)
 
         if not pipelines:
             return {
@@ -270,14 +762,17 @@ def query(req: QueryRequest):
                 "results": [],
             }
 
-        # 3. Execute Query
+        # 4. Execute Query
         # Use the first pipeline instance to drive the multi-doc logic
-        result = pipelines[0].query_multiple(req.question, pipelines)
+        result = pipelines[0].query_multiple(
+            req.question, pipelines, mode=req.retrieval_mode, rerank=req.rerank
+        )
 
         if "error" not in result:
-            db.add_query_record(
+            _record_query(
                 req.session_id, req.question, result["response"], result["results"]
             )
+            _cache_answer(req, docs, result)
 
         return result
 
@@ -288,3 +783,196 @@ def query(req: QueryRequest):
             "results": [],
             "error": str(e),
         }
+
+
+def _sse(event, data, event_id=None):
+    """Formats one Server-Sent Events frame."""
+    frame = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return f"id: {event_id}\n{frame}" if event_id is not None else frame
+
+
+@app.get("/events")
+async def event_stream(request: Request, session_id: Optional[int] = None, last_event_id: Optional[int] = None):
+    """
+    Server-push stream (Server-Sent Events) replacing client polling:
+    session_created, ingestion_progress, document_ready, ingestion_failed
+    and document_removed. session_id=<id> limits it to one session.
+    A reconnecting client (Last-Event-ID header, or ?last_event_id=) gets
+    the events it missed; `resync` means some were lost, refetch state.
+    `ready` is sent on every connect.
+    """
+    header = request.headers.get("last-event-id", "")
+    if header.isdigit():
+        last_event_id = int(header)
+    sub, missed, complete = events.subscribe(session_id, last_event_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            yield _sse("ready", {"last_event_id": events.stats()["last_event_id"]})
+            if not complete:
+                yield _sse("resync", {})
+            for event_id, event, data in missed:
+                yield _sse(event, data, event_id)
+            while not await request.is_disconnected():
+                item = await sub.get(EVENTS_HEARTBEAT_S)
+                if item is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    event_id, event, data = item
+                    yield _sse(event, data, event_id)
+        finally:
+            events.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/query/stream")
+def query_stream(req: QueryRequest):
+    """
+    Streaming variant of /query (Server-Sent Events).
+    Emits `sources` first, then one `token` event per LLM delta, then `done`.
+    A cache hit emits the same events, with the whole answer in one `token`.
+    The final answer is persisted to the queries table once the stream ends.
+    """
+    started = time.perf_counter()
+    docs = db.get_session_documents(req.session_id)
+
+    def event_stream():
+        if not docs:
+            yield _sse("sources", [])
+            yield _sse("done", {"response": "No documents found in this session.", "results": []})
+            return
+
+        try:
+            cached = _cached_answer(req, docs)
+            if cached:
+                # Same event sequence as a live answer, with the text in one token
+                yield _sse("sources", cached["results"])
+                yield _sse("token", cached["response"])
+                yield _sse("done", cached)
+                return
+
+            pipelines = _load_session_pipelines(docs)
+            if not pipelines:
+                yield _sse("sources", [])
+                yield _sse("done", {"response": "Error: Document indexes could not be loaded.", "results": []})
+                return
+
+            first_token = True
+            for event, payload in pipelines[0].stream_query_multiple(
+                req.question, pipelines, mode=req.retrieval_mode, rerank=req.rerank
+            ):
+                if event == "token" and first_token:
+                    first_token = False
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                    metrics.observe("query_ttft_ms", ttft_ms)
+                    print(f"⏱️ Time to first token: {ttft_ms:.0f} ms")
+
+                if event == "done":
+                    _record_query(
+                        req.session_id, req.question, payload["response"], payload["results"]
+                    )
+                    _cache_answer(req, docs, payload)
+                    metrics.observe("query_stream_total_ms", (time.perf_counter() - started) * 1000)
+
+                yield _sse(event, payload)
+
+        except Exception as e:
+            traceback.print_exc()
+            yield _sse("error", {"error": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/query/batch")
+def query_batch(req: BatchQueryRequest):
+    """
+    Answers a checklist of questions against one session (Server-Sent Events).
+    All questions are embedded and searched together, LLM calls run with
+    bounded concurrency, and one `result` event is sent per question as soon
+    as it is answered (in completion order, tagged with its `index`), then
+    `done`. Every answer is written to the queries table like /query.
+    """
+    questions = [q for q in req.questions if q.strip()]
+    if not questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch",
+        )
+
+    started = time.perf_counter()
+    docs = db.get_session_documents(req.session_id)
+
+    def event_stream():
+        def result_event(i, result):
+            return _sse("result", {"index": i, "question": questions[i], **result})
+
+        if not docs:
+            for i in range(len(questions)):
+                yield result_event(i, {"response": "No documents found in this session.", "results": []})
+            yield _sse("done", {"count": len(questions), "answered": 0})
+            return
+
+        try:
+            # Cache hits are answered straight away; the rest go through the pipeline
+            todo = []
+            for i, question in enumerate(questions):
+                single = QueryRequest(
+                    session_id=req.session_id,
+                    question=question,
+                    retrieval_mode=req.retrieval_mode,
+                    rerank=req.rerank,
+                    use_cache=req.use_cache,
+                )
+                cached = _cached_answer(single, docs)
+                if cached:
+                    yield result_event(i, cached)
+                else:
+                    todo.append((i, single))
+
+            answered = len(questions) - len(todo)
+            pipelines = _load_session_pipelines(docs) if todo else []
+            if todo and not pipelines:
+                for i, _ in todo:
+                    yield result_event(i, {"response": "Error: Document indexes could not be loaded.", "results": []})
+                todo = []
+
+            if todo:
+                for j, result in pipelines[0].query_batch(
+                    [single.question for _, single in todo],
+                    pipelines,
+                    mode=req.retrieval_mode,
+                    rerank=req.rerank,
+                    max_concurrency=req.max_concurrency,
+                ):
+                    i, single = todo[j]
+                    if "error" not in result:
+                        _record_query(req.session_id, single.question, result["response"], result["results"])
+                        _cache_answer(single, docs, result)
+                        answered += 1
+                    yield result_event(i, result)
+
+            total_ms = (time.perf_counter() - started) * 1000
+            metrics.observe("query_batch_total_ms", total_ms)
+            yield _sse("done", {"count": len(questions), "answered": answered, "total_ms": round(total_ms, 1)})
+
+        except Exception as e:
+            traceback.print_exc()
+            yield _sse("error", {"error": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,147 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "True") == "True"
+# Minimum cosine similarity between question embeddings to reuse an answer
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_S = float(os.environ.get("ANSWER_CACHE_TTL_S", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_QUOTED = re.compile(r'"([^"]+)"|“([^”]+)”|(?<!\w)\'([^\']+)\'(?!\w)')
+
+
+def literal_terms(question: str):
+    """
+    Numbers (years, amounts, ids) and quoted terms of a question. Embeddings
+    barely separate "revenue in 2022" from "revenue in 2023", so a cached
+    answer is only reused when these match exactly.
+    """
+    numbers = tuple(n.replace(",", "") for n in _NUMBER.findall(question))
+    quoted = tuple(sorted(next(g for g in m if g).strip().lower() for m in _QUOTED.findall(question)))
+    return numbers, quoted
+
+
+def document_set_key(docs: List[Dict], options: Optional[Dict] = None) -> str:
+    """
+    Identifies what an answer was generated from: the session's document
+    rows (id + index paths, so re-processing changes the key) and any query
+    options that change the answer (retrieval mode, reranking).
+    """
+    parts = sorted(f"{d['id']}:{d.get('faiss_index_path')}:{d.get('chunks_path')}" for d in docs)
+    if options:
+        parts.extend(f"{k}={options[k]}" for k in sorted(options))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers, persisted in the history database.
+
+    Entries are scoped to a session and its document set; a new question is
+    served from cache when its MiniLM embedding is within
+    ANSWER_CACHE_THRESHOLD cosine similarity of a cached question with the
+    same numbers and quoted terms (see literal_terms). Adding a
+    document changes the document-set key, and the session's entries are
+    also dropped outright (invalidate). Entries expire after
+    ANSWER_CACHE_TTL_S and the table is capped at ANSWER_CACHE_MAX_ENTRIES
+    (least recently used go first).
+    """
+
+    def __init__(
+        self,
+        db,
+        embed=None,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl_s: float = ANSWER_CACHE_TTL_S,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        enabled: bool = ANSWER_CACHE_ENABLED,
+    ):
+        self.db = db
+        self._embed = embed
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def embed(self, question: str) -> np.ndarray:
+        if self._embed is None:
+            from src.core.embedding_client import get_embedder
+
+            self._embed = lambda q: get_embedder().encode([q])[0]
+        vector = np.asarray(self._embed(question.strip()), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, session_id: int, cache_key: str, question: str) -> Optional[Dict]:
+        """
+        Returns {"response", "results", "cached": True, "similarity",
+        "cached_question"} for the closest cached question above the
+        threshold, else None.
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        terms = literal_terms(question)
+        entries = [
+            e
+            for e in self.db.get_cached_answers(session_id, cache_key, now - self.ttl_s)
+            if literal_terms(e["question"]) == terms
+        ]
+        best, best_sim = None, -1.0
+        if entries:
+            query = self.embed(question)
+            matrix = np.stack([np.frombuffer(e["embedding"], dtype=np.float32) for e in entries])
+            sims = matrix @ query
+            i = int(np.argmax(sims))
+            best, best_sim = entries[i], float(sims[i])
+
+        with self._lock:
+            if best is None or best_sim < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        self.db.touch_cached_answer(best["id"], now)
+        return {
+            "response": best["response"],
+            "results": best["sources"],
+            "cached": True,
+            "similarity": round(best_sim, 4),
+            "cached_question": best["question"],
+        }
+
+    def store(self, session_id: int, cache_key: str, question: str, response: str, sources: List[Dict]):
+        if not self.enabled:
+            return
+        now = time.time()
+        embedding = self.embed(question).tobytes()
+        self.db.add_cached_answer(session_id, cache_key, question, embedding, response, sources, now)
+        self.db.prune_cached_answers(now - self.ttl_s, self.max_entries)
+
+    def invalidate(self, session_id: int):
+        """Drops every cached answer of a session (e.g. a document was added)."""
+        self.db.delete_cached_answers(session_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "enabled": self.enabled,
+            "entries": self.db.count_cached_answers(),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "threshold": self.threshold,
+            "ttl_s": self.ttl_s,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,479 @@
+import os
+import json
+import time
+import queue
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+
+from src.core.llm_client import MockResponse
+
+# "sanctuary", "groq" or "stub"; defaults to the old TEST switch
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER") or (
+    "groq" if os.environ.get("TEST") == "True" else "sanctuary"
+)
+# Second provider to hedge slow requests to (and fail over to); unset disables hedging
+LLM_HEDGE_PROVIDER = os.environ.get("LLM_HEDGE_PROVIDER")
+# Hedge once the primary is slower than this percentile of its recent latencies
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Whole-request deadline, retries included
+LLM_DEADLINE_S = float(os.environ.get("LLM_DEADLINE_S", "60"))
+LLM_CONNECT_TIMEOUT_S = float(os.environ.get("LLM_CONNECT_TIMEOUT_S", "5"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_S = float(os.environ.get("LLM_BACKOFF_BASE_S", "0.5"))
+LLM_BACKOFF_MAX_S = float(os.environ.get("LLM_BACKOFF_MAX_S", "8"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+# Client-side token bucket per provider; 0 disables
+LLM_RATE_LIMIT_RPS = float(os.environ.get("LLM_RATE_LIMIT_RPS", "0"))
+LLM_RATE_LIMIT_BURST = int(os.environ.get("LLM_RATE_LIMIT_BURST", "5"))
+
+# OpenAI-compatible chat endpoints. "model" overrides the requested model
+PROVIDERS = {
+    "sanctuary": {
+        "base_url": os.environ.get("SANCTUARY_BASE_URL", "https://api-sanctuary.i2cv.io"),
+        "api_key_env": "SANCTUARY_API_KEY",
+        "model": "bedrock-claude-3-5-sonnet-v1",
+    },
+    "groq": {
+        "base_url": "https://api.groq.com/openai",
+        "api_key_env": "GROQ_API_KEY",
+        "model": None,
+    },
+    "stub": {
+        "base_url": os.environ.get("STUB_LLM_URL", "http://localhost:8009"),
+        "api_key_env": None,
+        "model": None,
+    },
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+class LatencyTracker:
+    """Rolling window of latencies (ms) for hedging decisions."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, ms: float):
+        self.samples.append(ms)
+
+    def percentile(self, p: float, min_samples: int = 1) -> Optional[float]:
+        if len(self.samples) < max(min_samples, 1):
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_error(response: httpx.Response, body: str) -> LLMError:
+    return LLMError(
+        f"{response.status_code} from {response.request.url}: {body[:300]}",
+        status=response.status_code,
+        retryable=response.status_code in RETRY_STATUS,
+        retry_after=_retry_after(response),
+    )
+
+
+class OpenAICompatibleProvider:
+    """
+    Async client for one OpenAI-style /v1/chat/completions endpoint.
+
+    One pooled httpx.AsyncClient per provider (keep-alive connections are
+    reused across requests). Every request has a deadline that covers all
+    attempts; 429/5xx and transport errors are retried with exponential
+    backoff and jitter (Retry-After is honoured), and an optional token
+    bucket keeps us under the provider's rate limit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        api_key: Optional[str] = None,
+        model_override: Optional[str] = None,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        max_retries: int = LLM_MAX_RETRIES,
+        deadline_s: float = LLM_DEADLINE_S,
+        rate_limit_rps: float = LLM_RATE_LIMIT_RPS,
+        rate_limit_burst: int = LLM_RATE_LIMIT_BURST,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model_override = model_override
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.deadline_s = deadline_s
+        self.bucket = TokenBucket(rate_limit_rps, rate_limit_burst) if rate_limit_rps > 0 else None
+        self.latency = LatencyTracker()  # full completion
+        self.ttft = LatencyTracker()  # first streamed delta
+        self.counters = {"requests": 0, "retries": 0, "errors": 0}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the loop that uses it
+        if self._client is None:
+            headers = {"Content-Type": "application/json"}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=httpx.Timeout(self.deadline_s, connect=LLM_CONNECT_TIMEOUT_S),
+            )
+        return self._client
+
+    def _payload(self, model, messages, temperature, max_tokens, stream):
+        return {
+            "model": self.model_override or model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream,
+        }
+
+    def _timeout(self, deadline: float) -> httpx.Timeout:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMError(f"{self.name}: deadline exceeded")
+        return httpx.Timeout(remaining, connect=min(LLM_CONNECT_TIMEOUT_S, remaining))
+
+    async def _before_attempt(self, deadline: float):
+        if self.bucket is not None:
+            remaining = deadline - time.monotonic()
+            try:
+                await asyncio.wait_for(self.bucket.acquire(), max(remaining, 0))
+            except asyncio.TimeoutError:
+                raise LLMError(f"{self.name}: deadline exceeded waiting for rate limit")
+        self.counters["requests"] += 1
+
+    async def _backoff(self, error: LLMError, attempt: int, deadline: float):
+        """Sleeps before the next attempt, or re-raises if we shouldn't retry."""
+        self.counters["errors"] += 1
+        if not error.retryable or attempt >= self.max_retries:
+            raise error
+        delay = error.retry_after
+        if delay is None:
+            delay = min(LLM_BACKOFF_MAX_S, LLM_BACKOFF_BASE_S * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if time.monotonic() + delay >= deadline:
+            raise error
+        self.counters["retries"] += 1
+        await asyncio.sleep(delay)
+
+    @staticmethod
+    def _transport_error(e: Exception) -> LLMError:
+        # A timeout means the deadline is spent; other transport errors are worth a retry
+        return LLMError(f"{type(e).__name__}: {e}", retryable=not isinstance(e, httpx.TimeoutException))
+
+    async def complete(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        deadline = time.monotonic() + self.deadline_s
+        payload = self._payload(model, messages, temperature, max_tokens, stream=False)
+        attempt = 0
+        while True:
+            await self._before_attempt(deadline)
+            start = time.perf_counter()
+            try:
+                response = await self._http().post(
+                    "/v1/chat/completions", json=payload, timeout=self._timeout(deadline)
+                )
+                if response.status_code != 200:
+                    raise _status_error(response, response.text)
+                try:
+                    content = response.json()["choices"][0]["message"]["content"]
+                except (ValueError, KeyError, IndexError):
+                    raise LLMError(f"{self.name}: unexpected response {response.text[:300]}")
+                self.latency.record((time.perf_counter() - start) * 1000)
+                return content
+            except httpx.HTTPError as e:
+                error = self._transport_error(e)
+            except LLMError as e:
+                error = e
+            await self._backoff(error, attempt, deadline)
+            attempt += 1
+
+    async def stream(
+        self, model: str, messages: List[Dict], temperature: float, max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Yields text deltas. Failures before the first delta are retried; later ones raise."""
+        deadline = time.monotonic() + self.deadline_s
+        payload = self._payload(model, messages, temperature, max_tokens, stream=True)
+        attempt = 0
+        while True:
+            await self._before_attempt(deadline)
+            start = time.perf_counter()
+            started = False
+            try:
+                async with self._http().stream(
+                    "POST", "/v1/chat/completions", json=payload, timeout=self._timeout(deadline)
+                ) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode("utf-8", "replace")
+                        raise _status_error(response, body)
+
+                    # Some deployments ignore "stream" and answer with a single JSON body
+                    if "text/event-stream" not in response.headers.get("Content-Type", ""):
+                        data = json.loads(await response.aread())
+                        try:
+                            content = data["choices"][0]["message"]["content"]
+                        except (KeyError, IndexError):
+                            raise LLMError(f"{self.name}: unexpected response {str(data)[:300]}")
+                        self.ttft.record((time.perf_counter() - start) * 1000)
+                        started = True
+                        yield content
+                        return
+
+                    async for line in response.aiter_lines():
+                        if time.monotonic() > deadline:
+                            raise LLMError(f"{self.name}: deadline exceeded mid-stream")
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                        except (ValueError, KeyError, IndexError):
+                            continue
+                        if delta:
+                            if not started:
+                                self.ttft.record((time.perf_counter() - start) * 1000)
+                                started = True
+                            yield delta
+                    self.latency.record((time.perf_counter() - start) * 1000)
+                    return
+            except httpx.HTTPError as e:
+                error = self._transport_error(e)
+            except LLMError as e:
+                error = e
+            if started:
+                self.counters["errors"] += 1
+                raise error
+            await self._backoff(error, attempt, deadline)
+            attempt += 1
+
+    def stats(self) -> Dict:
+        return {
+            "provider": self.name,
+            **self.counters,
+            "p50_ms": self.latency.percentile(50),
+            "p95_ms": self.latency.percentile(95),
+            "ttft_p95_ms": self.ttft.percentile(95),
+        }
+
+
+async def _cancel(task: asyncio.Task, gen=None):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    if gen is not None:
+        await gen.aclose()
+
+
+class HedgedProvider:
+    """
+    Sends a backup request to a second provider when the primary is slower
+    than its own LLM_HEDGE_PERCENTILE latency (time to first delta for
+    streams), and takes whichever answers first. Also fails over to the
+    secondary when the primary errors out. No hedging happens until the
+    primary has LLM_HEDGE_MIN_SAMPLES latency samples.
+    """
+
+    def __init__(
+        self,
+        primary: OpenAICompatibleProvider,
+        secondary: OpenAICompatibleProvider,
+        percentile: float = LLM_HEDGE_PERCENTILE,
+        min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+    ):
+        self.primary = primary
+        self.secondary = secondary
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.counters = {"hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+    def _delay(self, tracker: LatencyTracker) -> Optional[float]:
+        ms = tracker.percentile(self.percentile, self.min_samples)
+        return ms / 1000 if ms is not None else None
+
+    async def complete(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        args = (model, messages, temperature, max_tokens)
+        primary = asyncio.ensure_future(self.primary.complete(*args))
+        pending = {primary}
+        secondary = None
+        timeout = self._delay(self.primary.latency)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            timeout = None
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        await _cancel(other)
+                    if task is secondary:
+                        self.counters["hedge_wins"] += 1
+                    return task.result()
+                error = error or task.exception()
+            if secondary is None and (not done or not pending):
+                # Primary is slow (hedge) or failed (failover)
+                self.counters["hedged" if not done else "failovers"] += 1
+                secondary = asyncio.ensure_future(self.secondary.complete(*args))
+                pending.add(secondary)
+        raise error
+
+    async def stream(
+        self, model: str, messages: List[Dict], temperature: float, max_tokens: int
+    ) -> AsyncIterator[str]:
+        args = (model, messages, temperature, max_tokens)
+        # Race providers for the first delta, then stick with the winner
+        primary_gen = self.primary.stream(*args)
+        racers = {asyncio.ensure_future(primary_gen.__anext__()): primary_gen}
+        secondary_gen = None
+        timeout = self._delay(self.primary.ttft)
+        winner, first, error = None, None, None
+        while racers and winner is None:
+            done, _ = await asyncio.wait(racers, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            timeout = None
+            for task in done:
+                gen = racers.pop(task)
+                try:
+                    first, winner = task.result(), gen
+                except StopAsyncIteration:
+                    winner = gen  # An empty answer is still an answer
+                except Exception as e:
+                    error = error or e
+            if winner is None and secondary_gen is None:
+                # Primary is slow to its first delta (hedge) or failed (failover)
+                self.counters["hedged" if not done else "failovers"] += 1
+                secondary_gen = self.secondary.stream(*args)
+                racers[asyncio.ensure_future(secondary_gen.__anext__())] = secondary_gen
+
+        for task, gen in racers.items():
+            await _cancel(task, gen)
+        if winner is None:
+            raise error
+        if winner is secondary_gen:
+            self.counters["hedge_wins"] += 1
+        if first is not None:
+            yield first
+            async for delta in winner:
+                yield delta
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "primary": self.primary.stats(),
+            "secondary": self.secondary.stats(),
+        }
+
+
+class SyncLLMClient:
+    """
+    Blocking adapter with the create_chat_completion / stream_chat_completion
+    interface SmartRAG and LLMGateway use. Requests run on one background
+    event loop, so every thread shares the providers' connection pools.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+
+    def create_chat_completion(self, model: str, messages: List[Dict], temperature: float, max_tokens: int):
+        future = asyncio.run_coroutine_threadsafe(
+            self.provider.complete(model, messages, temperature, max_tokens), self._loop
+        )
+        return MockResponse(future.result())
+
+    def stream_chat_completion(self, model: str, messages: List[Dict], temperature: float, max_tokens: int) -> Iterator[str]:
+        items: "queue.Queue" = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for delta in self.provider.stream(model, messages, temperature, max_tokens):
+                    items.put(delta)
+            except Exception as e:
+                items.put(e)
+            finally:
+                items.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Consumer stopped early (client disconnect): stop the upstream request too
+            future.cancel()
+
+    def stats(self) -> Dict:
+        return self.provider.stats()
+
+
+def build_provider(name: str) -> OpenAICompatibleProvider:
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {name!r}; expected one of {sorted(PROVIDERS)}")
+    config = PROVIDERS[name]
+    api_key = os.environ.get(config["api_key_env"]) if config["api_key_env"] else None
+    return OpenAICompatibleProvider(
+        name, config["base_url"], api_key=api_key, model_override=config["model"]
+    )
+
+
+def build_llm_client(provider: str = LLM_PROVIDER, hedge_provider: Optional[str] = LLM_HEDGE_PROVIDER) -> SyncLLMClient:
+    """Client for SmartRAG, configured from LLM_PROVIDER / LLM_HEDGE_PROVIDER."""
+    primary = build_provider(provider)
+    if hedge_provider:
+        return SyncLLMClient(HedgedProvider(primary, build_provider(hedge_provider)))
+    return SyncLLMClient(primary)
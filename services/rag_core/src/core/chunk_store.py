@@ -0,0 +1,201 @@
+import os
+import json
+import shutil
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from .data_models import Chunk
+
+STORE_VERSION = 1
+
+
+class _TextColumn:
+    """
+    Variable-length UTF-8 strings stored as one contiguous blob plus an
+    offsets array (len n + 1). Row i is blob[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_strings(cls, texts: List[str]) -> "_TextColumn":
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(offsets, blob)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+    def save(self, directory: str, name: str):
+        np.save(os.path.join(directory, f"{name}_offsets.npy"), self.offsets)
+        self.blob.tofile(os.path.join(directory, f"{name}_text.bin"))
+
+    @classmethod
+    def load(cls, directory: str, name: str, mmap: bool) -> "_TextColumn":
+        offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r" if mmap else None)
+        blob_path = os.path.join(directory, f"{name}_text.bin")
+        if mmap and os.path.getsize(blob_path) > 0:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            blob = np.fromfile(blob_path, dtype=np.uint8)
+        return cls(offsets, blob)
+
+
+class ChunkStore:
+    """
+    Columnar, pickle-free store for one document's parent/child chunks.
+
+    Ids are plain integers: child i is row i of the FAISS index, parent j is
+    the j-th parent chunk. `child_parent[i]` gives the parent id of child i
+    (-1 if it has none). Every column can be memory-mapped, so opening a
+    store reads only a few bytes and chunk text is paged in on access.
+
+    On-disk layout (one directory per document):
+        meta.json
+        child_offsets.npy  child_text.bin  child_parent.npy  child_page.npy
+        parent_offsets.npy parent_text.bin parent_page.npy
+    """
+
+    def __init__(
+        self,
+        source: str,
+        child_text: _TextColumn,
+        child_parent: np.ndarray,
+        child_page: np.ndarray,
+        parent_text: _TextColumn,
+        parent_page: np.ndarray,
+    ):
+        self.source = source
+        self.child_text = child_text
+        self.child_parent = child_parent
+        self.child_page = child_page
+        self.parent_text = parent_text
+        self.parent_page = parent_page
+
+    @property
+    def num_children(self) -> int:
+        return len(self.child_parent)
+
+    @property
+    def num_parents(self) -> int:
+        return len(self.parent_page)
+
+    @classmethod
+    def from_chunks(cls, child_chunks: List[Chunk], parent_map: Dict) -> "ChunkStore":
+        """
+        Builds a store from chunker output. Parent ids may be ints (current
+        chunker) or legacy UUID strings; either way they are renumbered 0..m-1
+        in document order.
+        """
+        parents = sorted(
+            parent_map.values(), key=lambda p: p.metadata.get("index", 0)
+        )
+        parent_ids = {p.chunk_id: i for i, p in enumerate(parents)}
+
+        first = child_chunks[0] if child_chunks else (parents[0] if parents else None)
+        return cls(
+            source=first.source if first else "",
+            child_text=_TextColumn.from_strings([c.text for c in child_chunks]),
+            child_parent=np.array(
+                [parent_ids.get(c.parent_id, -1) for c in child_chunks], dtype=np.int32
+            ),
+            child_page=np.array([c.page for c in child_chunks], dtype=np.int32),
+            parent_text=_TextColumn.from_strings([p.text for p in parents]),
+            parent_page=np.array([p.page for p in parents], dtype=np.int32),
+        )
+
+    def child(self, i: int) -> Chunk:
+        parent_id = int(self.child_parent[i])
+        return Chunk(
+            text=self.child_text[i],
+            source=self.source,
+            page=int(self.child_page[i]),
+            chunk_id=int(i),
+            parent_id=parent_id if parent_id >= 0 else None,
+        )
+
+    def parent(self, j: int) -> Chunk:
+        return Chunk(
+            text=self.parent_text[j],
+            source=self.source,
+            page=int(self.parent_page[j]),
+            chunk_id=int(j),
+            is_parent=True,
+            metadata={"index": int(j)},
+        )
+
+    def page_chunks(self, page: int) -> List[Tuple[int, List[int]]]:
+        """[(parent id, [child rows])] of one page, in document order."""
+        parents = np.flatnonzero(np.asarray(self.parent_page) == page)
+        rows = np.flatnonzero(np.isin(self.child_parent, parents))
+        by_parent = {int(j): [] for j in parents}
+        for row, j in zip(rows.tolist(), np.asarray(self.child_parent)[rows].tolist()):
+            by_parent[j].append(row)
+        return list(by_parent.items())
+
+    def save(self, directory: str):
+        # Write into a sibling temp dir, then swap it in with two renames: readers
+        # see the old store or the new one, never a half-written one. A directory
+        # can't be replaced in one atomic step, so an open() landing between the
+        # renames fails (FileNotFoundError); stores already open stay readable.
+        tmp_dir = directory.rstrip("/") + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        self.child_text.save(tmp_dir, "child")
+        np.save(os.path.join(tmp_dir, "child_parent.npy"), self.child_parent)
+        np.save(os.path.join(tmp_dir, "child_page.npy"), self.child_page)
+        self.parent_text.save(tmp_dir, "parent")
+        np.save(os.path.join(tmp_dir, "parent_page.npy"), self.parent_page)
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(
+                {
+                    "version": STORE_VERSION,
+                    "source": self.source,
+                    "num_children": self.num_children,
+                    "num_parents": self.num_parents,
+                },
+                f,
+            )
+
+        old_dir = directory.rstrip("/") + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        # Memory-mapped readers of the old files keep them until they close
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def open(cls, directory: str, mmap: bool = True) -> "ChunkStore":
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported chunk store version {meta.get('version')} in {directory}")
+
+        mode = "r" if mmap else None
+        return cls(
+            source=meta["source"],
+            child_text=_TextColumn.load(directory, "child", mmap),
+            child_parent=np.load(os.path.join(directory, "child_parent.npy"), mmap_mode=mode),
+            child_page=np.load(os.path.join(directory, "child_page.npy"), mmap_mode=mode),
+            parent_text=_TextColumn.load(directory, "parent", mmap),
+            parent_page=np.load(os.path.join(directory, "parent_page.npy"), mmap_mode=mode),
+        )
+
+
+def store_size(directory: Optional[str]) -> int:
+    """Total bytes on disk of a store directory (0 if missing)."""
+    if not directory or not os.path.isdir(directory):
+        return 0
+    return sum(
+        os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+    )
@@ -1,9 +1,10 @@
 import re
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 from src.core.data_models import Chunk
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from uuid import uuid4
 
+# Section headings written by the parser (document_parser.py)
+_PAGE_HEADING = re.compile(r"^## (Page|Slide) (\d+)[ \t]*$", re.MULTILINE)
 
 
 class DocumentChunker:
@@ -32,47 +33,102 @@ class DocumentChunker:
             separators=["\n\n", "\n", ". ", " ", ""],
         )
 
-    def process(self, text: str, source: str) -> Tuple[List[Chunk], Dict[str, Chunk]]:
+    def split_pages(self, text: str) -> List[Tuple[str, int, str]]:
+        """
+        (page_key, page number, section text) for each "## Page N" / "## Slide N"
+        section the parser emits; keys match the parser's page manifest. Text
+        without such headings (DOCX) is one "document" section, page 0.
+        """
+        headings = list(_PAGE_HEADING.finditer(text))
+        if not headings:
+            return [("document", 0, text)]
+        sections = []
+        for i, m in enumerate(headings):
+            start = 0 if i == 0 else m.start()  # Anything before the first heading stays with it
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+            number = int(m.group(2))
+            sections.append((f"{m.group(1).lower()}{number}", number, text[start:end]))
+        return sections
+
+    @staticmethod
+    def page_number(page_key: str) -> int:
+        """"page3" / "slide3" -> 3; "document" -> 0."""
+        m = re.search(r"\d+$", page_key)
+        return int(m.group()) if m else 0
+
+    @staticmethod
+    def _crop_prefix(page_key: str) -> re.Pattern:
+        # Crop names the parser derives from the page key ("page3_visual_1.png")
+        return re.compile(rf"(?<![\w]){re.escape(page_key)}_visual_")
+
+    def page_signature(self, section: str, page_key: str) -> str:
+        """A page section without what depends on its position (heading, crop names)."""
+        body = _PAGE_HEADING.sub("", section, count=1)
+        return self._crop_prefix(page_key).sub("visual_", body)
+
+    def renumber(self, text: str, old_key: str, page_key: str) -> str:
+        """Chunk text of a page that moved from old_key to page_key, with its heading and crop names updated."""
+        if old_key == page_key:
+            return text
+        old_page, page = self.page_number(old_key), self.page_number(page_key)
+        text = re.sub(rf"^## (Page|Slide) {old_page}([ \t]*)$", rf"## \g<1> {page}\g<2>", text, flags=re.MULTILINE)
+        return self._crop_prefix(old_key).sub(f"{page_key}_visual_", text)
+
+    def chunk_page(self, text: str) -> List[Tuple[str, List[str]]]:
+        """[(parent text, [child texts])] for one page section."""
+        return [
+            (p_doc.page_content, [c.page_content for c in self.child_splitter.create_documents([p_doc.page_content])])
+            for p_doc in self.parent_splitter.create_documents([text])
+        ]
+
+    def process(
+        self, text: str, source: str, reuse: Optional[Dict[str, List[Tuple[str, List[str]]]]] = None
+    ) -> Tuple[List[Chunk], Dict[int, Chunk]]:
         """
         Returns:
             - child_chunks: List of Chunk objects (to be embedded)
             - parent_map: Dict[parent_id, Chunk] (to be retrieved)
-        """
-        parent_docs = self.parent_splitter.create_documents([text])
 
+        Each page is chunked on its own, so parents never span two pages and
+        an edit on one page leaves every other page's chunks unchanged.
+        reuse: {page_key: chunk_page() output} for pages whose chunks are
+        already known (unchanged since the previous revision).
+
+        Ids are sequential integers: parent ids follow document order and
+        child ids match the row each child gets in the vector index.
+        """
+        reuse = reuse or {}
         parent_map = {}
         child_chunks = []
         if "/" in source:
             source = source.split("/")[-1]
 
-        for p_idx, p_doc in enumerate(parent_docs):
-            # Create Parent Chunk
-            parent_id = str(uuid4())
-            parent_chunk = Chunk(
-                text=p_doc.page_content,
-                source=source,
-                page=0,  # Page handling would require more complex parsing logic
-                chunk_id=parent_id,
-                is_parent=True,
-                metadata={"index": p_idx},
-            )
-            parent_map[parent_id] = parent_chunk
-
-            # Create Child Chunks from this Parent
-            child_docs = self.child_splitter.create_documents([p_doc.page_content])
-
-            for c_doc in child_docs:
-                child_id = str(uuid4())
-                child_chunk = Chunk(
-                    text=c_doc.page_content,
+        for page_key, page, section in self.split_pages(text):
+            groups = reuse[page_key] if page_key in reuse else self.chunk_page(section)
+            for parent_text, child_texts in groups:
+                # Create Parent Chunk
+                parent_id = len(parent_map)
+                parent_map[parent_id] = Chunk(
+                    text=parent_text,
                     source=source,
-                    page=0,
-                    chunk_id=child_id,
-                    parent_id=parent_id,
-                    is_parent=False,
+                    page=page,
+                    chunk_id=parent_id,
+                    is_parent=True,
+                    metadata={"index": parent_id, "page_key": page_key},
                 )
-                child_chunks.append(child_chunk)
-
-        return child_chunks, parent_map
 
+                # Create Child Chunks from this Parent
+                for child_text in child_texts:
+                    child_chunks.append(
+                        Chunk(
+                            text=child_text,
+                            source=source,
+                            page=page,
+                            chunk_id=len(child_chunks),
+                            parent_id=parent_id,
+                            is_parent=False,
+                            metadata={"page_key": page_key},
+                        )
+                    )
 
+        return child_chunks, parent_map
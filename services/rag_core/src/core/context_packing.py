@@ -0,0 +1,178 @@
+import os
+import re
+import math
+from dataclasses import replace
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.core.data_models import Chunk
+from src.core.lexical_index import tokenize
+
+CONTEXT_PACKING = os.environ.get("CONTEXT_PACKING", "True") == "True"
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+# Trim chunks that don't fit down to their best sentences instead of dropping them
+CONTEXT_SENTENCE_SELECTION = os.environ.get("CONTEXT_SENTENCE_SELECTION", "True") == "True"
+# HF tokenizer to count with; defaults to the one matching the generation model
+LLM_TOKENIZER = os.environ.get("LLM_TOKENIZER")
+
+# Generation model -> Hugging Face tokenizer repo
+TOKENIZER_IDS = {
+    "meta-llama/llama-4-scout-17b-16e-instruct": "meta-llama/Llama-4-Scout-17B-16E-Instruct",
+}
+
+# Parent chunks overlap by 200 chars (DocumentChunker); look a bit further to be safe
+MAX_OVERLAP_CHARS = 400
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+class TokenCounter:
+    """
+    Counts tokens with the target model's tokenizer.
+    Falls back to a ~4 chars/token estimate when the tokenizer can't be loaded
+    (e.g. gated repo, no network), so packing still bounds prompt size.
+    """
+
+    def __init__(self, tokenizer_id: Optional[str]):
+        self.tokenizer_id = tokenizer_id
+        self._tokenizer = None
+        if tokenizer_id:
+            try:
+                from transformers import AutoTokenizer
+
+                self._tokenizer = AutoTokenizer.from_pretrained(tokenizer_id)
+            except Exception as e:
+                print(f"⚠️ Tokenizer {tokenizer_id} unavailable ({e}); estimating tokens")
+
+    def count(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False))
+        return math.ceil(len(text) / 4)
+
+
+@lru_cache(maxsize=4)
+def get_token_counter(model: str) -> TokenCounter:
+    return TokenCounter(LLM_TOKENIZER or TOKENIZER_IDS.get(model))
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of a that is also a prefix of b."""
+    for size in range(min(len(a), len(b), MAX_OVERLAP_CHARS), 0, -1):
+        if a.endswith(b[:size]):
+            return size
+    return 0
+
+
+def lexical_sentence_scorer(question: str) -> Callable[[str], float]:
+    """Scores a sentence by the share of question terms it contains."""
+    terms = set(tokenize(question))
+
+    def score(sentence: str) -> float:
+        if not terms:
+            return 0.0
+        return len(terms & set(tokenize(sentence))) / len(terms)
+
+    return score
+
+
+class ContextPacker:
+    """
+    Turns retrieved parent chunks into a prompt context that fits a token budget.
+
+    1. Adjacent parents of the same document are merged and their shared
+       overlap (the splitter's chunk_overlap) is emitted only once.
+    2. Merged blocks are added best-score first until the budget is used.
+    3. A block that doesn't fit is cut down to its highest-scoring sentences
+       (kept in document order) when sentence selection is on.
+    """
+
+    def __init__(
+        self,
+        token_counter: TokenCounter,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        sentence_selection: bool = CONTEXT_SENTENCE_SELECTION,
+    ):
+        self.token_counter = token_counter
+        self.token_budget = token_budget
+        self.sentence_selection = sentence_selection
+
+    @staticmethod
+    def _doc_key(chunk: Chunk):
+        return chunk.metadata.get("doc_id", chunk.source)
+
+    def merge_neighbours(self, results: List[Tuple[Chunk, float]]) -> List[Tuple[Chunk, float]]:
+        by_doc: Dict = {}
+        for chunk, score in results:
+            by_doc.setdefault(self._doc_key(chunk), []).append((chunk, score))
+
+        merged = []
+        for doc_results in by_doc.values():
+            doc_results.sort(key=lambda x: x[0].metadata.get("index", 0))
+            run_chunk, run_score, run_ids = None, 0.0, []
+            for chunk, score in doc_results:
+                index = chunk.metadata.get("index")
+                if run_chunk is not None and index is not None and run_ids[-1] >= 0 and index == run_ids[-1] + 1:
+                    text = run_chunk.text + chunk.text[_overlap(run_chunk.text, chunk.text):]
+                    run_chunk = replace(run_chunk, text=text)
+                    run_score = max(run_score, score)
+                    run_ids.append(index)
+                    continue
+                if run_chunk is not None:
+                    merged.append(self._finish(run_chunk, run_score, run_ids))
+                run_chunk, run_score = chunk, score
+                run_ids = [index if index is not None else -1]
+            if run_chunk is not None:
+                merged.append(self._finish(run_chunk, run_score, run_ids))
+
+        merged.sort(key=lambda x: x[1], reverse=True)
+        return merged
+
+    @staticmethod
+    def _finish(chunk: Chunk, score: float, ids: List[int]) -> Tuple[Chunk, float]:
+        # Copies, so the caller's search results (shown as sources) stay untouched
+        return replace(chunk, metadata={**chunk.metadata, "merged_ids": ids}), score
+
+    def _select_sentences(self, text: str, budget: int, scorer: Callable[[str], float]) -> str:
+        sentences = [s for s in SENTENCE_SPLIT.split(text) if s and s.strip()]
+        ranked = sorted(range(len(sentences)), key=lambda i: scorer(sentences[i]), reverse=True)
+
+        chosen, used = [], 0
+        for i in ranked:
+            cost = self.token_counter.count(sentences[i])
+            if used + cost > budget:
+                continue
+            chosen.append(i)
+            used += cost
+        return " … ".join(sentences[i] for i in sorted(chosen))
+
+    def pack(
+        self,
+        question: str,
+        results: List[Tuple[Chunk, float]],
+        scorer: Optional[Callable[[str], float]] = None,
+    ) -> Tuple[List[Tuple[Chunk, float]], Dict]:
+        """
+        Returns (packed_results, stats). packed_results has the same
+        (chunk, score) shape as search results, so it drops into build_prompt.
+        """
+        scorer = scorer or lexical_sentence_scorer(question)
+        blocks = self.merge_neighbours(results)
+
+        packed, used = [], 0
+        stats = {"input_chunks": len(results), "blocks": len(blocks), "trimmed": 0, "dropped": 0}
+        for chunk, score in blocks:
+            remaining = self.token_budget - used
+            cost = self.token_counter.count(chunk.text)
+            if cost > remaining and self.sentence_selection and remaining > 0:
+                text = self._select_sentences(chunk.text, remaining, scorer)
+                if text:
+                    chunk = replace(chunk, text=text)
+                    cost = self.token_counter.count(text)
+                    stats["trimmed"] += 1
+            if cost > remaining or not chunk.text:
+                stats["dropped"] += 1
+                continue
+            packed.append((chunk, score))
+            used += cost
+
+        stats["context_tokens"] = used
+        return packed, stats
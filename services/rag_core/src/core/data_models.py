@@ -1,16 +1,17 @@
 from dataclasses import dataclass
 from dataclasses import field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 
 @dataclass
 class Chunk:
     """
     Updated Chunk model to support Parent-Child relationships.
+    Ids are integers (row numbers in the ChunkStore); str only for legacy pickles.
     """
     text: str
     source: str
     page: int
-    chunk_id: str
-    parent_id: Optional[str] = None
+    chunk_id: Union[int, str]
+    parent_id: Optional[Union[int, str]] = None
     is_parent: bool = False
     metadata: Dict[str, Any] = field(default_factory=dict)
@@ -0,0 +1,119 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+from functools import lru_cache
+from typing import Callable, Dict, List, Sequence, Tuple
+
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "True") == "True"
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "data/embeddings.db")
+
+# SQLite's default limit on bound parameters is 999
+_LOOKUP_BATCH = 500
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC + collapsed whitespace, so cosmetic re-parses still hit."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent chunk-embedding store keyed by (embedding model id, hash of
+    the normalized chunk text). Re-processing a document with another vision
+    model, or a lightly edited re-upload, only embeds the chunks whose text
+    actually changed.
+    """
+
+    def __init__(self, db_path: str = EMBEDDING_CACHE_PATH):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS embeddings (
+            model_id TEXT,
+            text_hash TEXT,
+            dim INTEGER,
+            vector BLOB,
+            created_at REAL,
+            PRIMARY KEY (model_id, text_hash)
+        ) WITHOUT ROWID""")
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, model_id: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        for b in range(0, len(hashes), _LOOKUP_BATCH):
+            batch = hashes[b : b + _LOOKUP_BATCH]
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model_id=? AND text_hash IN ({','.join('?' * len(batch))})",
+                (model_id, *batch),
+            ).fetchall()
+            for h, blob in rows:
+                found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def encode(
+        self, model_id: str, texts: Sequence[str], encode_fn: Callable[[List[str]], np.ndarray]
+    ) -> Tuple[np.ndarray, Dict]:
+        """
+        Returns (float32 embeddings, one row per text in input order, and
+        {"hits", "misses"} for this call). Only texts missing from the store
+        (deduplicated) go to encode_fn.
+        """
+        hashes = [text_hash(t) for t in texts]
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            found = self._lookup(model_id, unique)
+
+        missing = [h for h in unique if h not in found]
+        if missing:
+            first_text = dict(zip(reversed(hashes), reversed(texts)))  # hash -> first text with it
+            vectors = np.asarray(encode_fn([first_text[h] for h in missing]), dtype=np.float32)
+            now = time.time()
+            with self._lock:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model_id, text_hash, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(model_id, h, int(v.shape[0]), v.tobytes(), now) for h, v in zip(missing, vectors)],
+                )
+                self.conn.commit()
+            found.update(zip(missing, vectors))
+
+        missing_set = set(missing)
+        hits = sum(1 for h in hashes if h not in missing_set)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(texts) - hits
+        info = {"hits": hits, "misses": len(texts) - hits}
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32), info
+        return np.stack([found[h] for h in hashes]).astype(np.float32, copy=False), info
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "size_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache()
@@ -0,0 +1,98 @@
+import os
+import time
+import threading
+import requests
+import numpy as np
+from functools import lru_cache
+from typing import Callable, Optional, Sequence
+
+from src.core.embedding_engine import EMBEDDING_BACKEND, EMBEDDING_MODEL_ID, EmbeddingEngine, get_embedding_engine
+
+# Embedding service (services/embedding); unset -> embed in-process
+EMBEDDING_API_URL = os.environ.get("EMBEDDING_API_URL")
+EMBEDDING_API_TIMEOUT_S = float(os.environ.get("EMBEDDING_API_TIMEOUT_S", "30"))
+# Texts per /embed request when embedding a whole document
+EMBEDDING_API_BATCH = int(os.environ.get("EMBEDDING_API_BATCH", "256"))
+# After a failure, use the local model for this long before trying the service again
+EMBEDDING_API_RETRY_S = float(os.environ.get("EMBEDDING_API_RETRY_S", "30"))
+
+
+class RemoteEmbedder:
+    """
+    Embeds through the embedding service, which batches concurrent requests
+    from every rag_core worker into shared model calls. Falls back to an
+    in-process fp32 torch EmbeddingEngine (loaded on first use) while the
+    service is unreachable, so vectors always match cache_id.
+    """
+
+    cache_id = EMBEDDING_MODEL_ID  # The service runs the fp32 model
+
+    def __init__(self, base_url: str, timeout_s: float = EMBEDDING_API_TIMEOUT_S, batch: int = EMBEDDING_API_BATCH):
+        self.base_url = base_url.rstrip("/")
+        self.timeout_s = timeout_s
+        self.batch = batch
+        self.session = requests.Session()
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def _encode_remote(self, texts, progress):
+        parts = []
+        for b in range(0, len(texts), self.batch):
+            resp = self.session.post(
+                f"{self.base_url}/embed", json={"texts": texts[b : b + self.batch]}, timeout=self.timeout_s
+            )
+            resp.raise_for_status()
+            parts.append(np.asarray(resp.json()["embeddings"], dtype=np.float32))
+            if progress is not None:
+                progress(min(b + self.batch, len(texts)), len(texts))
+        return np.concatenate(parts)
+
+    def encode(self, texts: Sequence[str], progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if time.monotonic() >= self._down_until:
+            try:
+                return self._encode_remote(texts, progress)
+            except (requests.RequestException, ValueError, KeyError) as e:
+                print(f"⚠️ Embedding service unavailable ({e}); embedding locally")
+                with self._lock:
+                    self._down_until = time.monotonic() + EMBEDDING_API_RETRY_S
+                    self.fallbacks += 1
+        return _fp32_engine().encode(texts, progress=progress)
+
+    def encode_with_progress(
+        self, texts: Sequence[str], on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> np.ndarray:
+        start = time.perf_counter()
+
+        def report(done, total):
+            if on_progress is not None:
+                on_progress(done, total)
+            rate = done / max(time.perf_counter() - start, 1e-9)
+            print(f"  embedded {done}/{total} chunks ({rate:.0f}/s, remote)")
+
+        return self.encode(texts, progress=report)
+
+
+def _fp32_engine():
+    """The local engine if it runs the fp32 model, else a separate fp32 one (RemoteEmbedder fallback)."""
+    return get_embedding_engine() if EMBEDDING_BACKEND == "torch" else _fp32_fallback_engine()
+
+
+@lru_cache(maxsize=1)
+def _fp32_fallback_engine():
+    return EmbeddingEngine(backend="torch")
+
+
+@lru_cache(maxsize=1)
+def get_embedder():
+    """
+    The process-wide embedder: a RemoteEmbedder when EMBEDDING_API_URL is set,
+    else the in-process EmbeddingEngine. Both expose encode(texts),
+    encode_with_progress(texts) and cache_id.
+    """
+    if EMBEDDING_API_URL:
+        return RemoteEmbedder(EMBEDDING_API_URL)
+    return get_embedding_engine()
@@ -0,0 +1,142 @@
+import os
+import time
+import numpy as np
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence
+
+EMBEDDING_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+# "torch" (fp32), "torch_int8" (dynamic int8 Linear layers), "onnx", "onnx_int8"
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+# Intra-op threads for torch / ONNX Runtime; 0 keeps the library default
+EMBEDDING_THREADS = int(os.environ.get("EMBEDDING_THREADS", "0"))
+# Quantized ONNX export shipped in the model repo, used by "onnx_int8"
+EMBEDDING_ONNX_INT8_FILE = os.environ.get("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+# Print progress every N batches when embedding a document (0 disables)
+EMBEDDING_PROGRESS_EVERY = int(os.environ.get("EMBEDDING_PROGRESS_EVERY", "20"))
+
+BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+
+
+def _load_model(model_id: str, backend: str, threads: int):
+    from sentence_transformers import SentenceTransformer
+
+    if backend in ("onnx", "onnx_int8"):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError(f"EMBEDDING_BACKEND={backend} needs onnxruntime: pip install 'sentence-transformers[onnx]'")
+
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if backend == "onnx_int8":
+            model_kwargs["file_name"] = EMBEDDING_ONNX_INT8_FILE
+        if threads:
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = options
+        return SentenceTransformer(model_id, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    model = SentenceTransformer(model_id, device="cpu")
+    if backend == "torch_int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+class EmbeddingEngine:
+    """
+    Batched sentence embedding on CPU.
+
+    Inputs are sorted by token length and cut into batches of batch_size, so
+    each batch pads to roughly its own length instead of the longest chunk
+    in the document; results come back in input order. The backend can be
+    swapped for ONNX Runtime or an int8-quantized model. If it can't be
+    loaded (missing optional deps), the fp32 torch model is used instead.
+    """
+
+    def __init__(
+        self,
+        model_id: str = EMBEDDING_MODEL_ID,
+        backend: str = EMBEDDING_BACKEND,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        threads: int = EMBEDDING_THREADS,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+        self.model_id = model_id
+        self.batch_size = batch_size
+        self.threads = threads
+        try:
+            self.model = _load_model(model_id, backend, threads)
+        except Exception as e:
+            if backend == "torch":
+                raise
+            print(f"⚠️ Embedding backend {backend} unavailable ({e}); using torch")
+            backend = "torch"
+            self.model = _load_model(model_id, backend, threads)
+        self.backend = backend
+
+    @property
+    def cache_id(self) -> str:
+        """Embedding-cache key: quantized backends produce (slightly) different vectors."""
+        return self.model_id if self.backend == "torch" else f"{self.model_id}@{self.backend}"
+
+    def token_lengths(self, texts: Sequence[str]) -> np.ndarray:
+        max_len = getattr(self.model, "max_seq_length", None) or 512
+        encoded = self.model.tokenizer(
+            list(texts), add_special_tokens=True, truncation=True, max_length=max_len
+        )
+        return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        batch_size: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> np.ndarray:
+        """Returns float32 embeddings, one row per text in input order."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        batch_size = batch_size or self.batch_size
+        order = np.argsort(-self.token_lengths(texts), kind="stable")
+        out = None
+        for b in range(0, len(order), batch_size):
+            rows = order[b : b + batch_size]
+            vectors = self.model.encode(
+                [texts[i] for i in rows], batch_size=len(rows), convert_to_numpy=True
+            ).astype(np.float32, copy=False)
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[rows] = vectors
+            if progress is not None:
+                progress(min(b + batch_size, len(texts)), len(texts))
+        return out
+
+    def encode_with_progress(
+        self, texts: Sequence[str], on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> np.ndarray:
+        """encode() with periodic progress lines, for document ingestion (on_progress gets every batch)."""
+        start = time.perf_counter()
+        every = EMBEDDING_PROGRESS_EVERY * self.batch_size
+        last = [0]
+
+        def report(done, total):
+            if on_progress is not None:
+                on_progress(done, total)
+            if every and (done - last[0] >= every or done == total):
+                last[0] = done
+                rate = done / max(time.perf_counter() - start, 1e-9)
+                print(f"  embedded {done}/{total} chunks ({rate:.0f}/s, {self.backend})")
+
+        return self.encode(texts, progress=report)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_engine() -> EmbeddingEngine:
+    """One engine (and model) per process, shared by every SmartRAG pipeline."""
+    return EmbeddingEngine()
@@ -0,0 +1,103 @@
+import os
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Recent events kept for clients reconnecting with Last-Event-ID
+EVENT_BUFFER_SIZE = int(os.environ.get("EVENT_BUFFER_SIZE", "500"))
+# Events queued per subscriber before the oldest are dropped (slow client)
+EVENT_SUBSCRIBER_QUEUE = int(os.environ.get("EVENT_SUBSCRIBER_QUEUE", "1000"))
+
+
+class Subscription:
+    """One /events client: an asyncio queue fed from any thread by EventBus.publish."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, session_id: Optional[int] = None):
+        self.loop = loop
+        self.session_id = session_id
+        self.queue = asyncio.Queue(maxsize=EVENT_SUBSCRIBER_QUEUE)
+        self.dropped = 0
+
+    def wants(self, data: Dict) -> bool:
+        return self.session_id is None or data.get("session_id") == self.session_id
+
+    def _put(self, event):
+        # Runs on the event loop thread
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self, timeout: float):
+        """Next (id, type, data) event, or None after `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for server-push events (session created,
+    ingestion progress, document ready/removed). Publishing never blocks:
+    each subscriber has its own bounded queue. Event ids increase
+    monotonically so a reconnecting client can ask for what it missed.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._recent = deque(maxlen=buffer_size)
+        self._subscribers: List[Subscription] = []
+        self.published = 0
+
+    def publish(self, event_type: str, data: Dict) -> int:
+        with self._lock:
+            event = (self._next_id, event_type, data)
+            self._next_id += 1
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for sub in subscribers:
+            if sub.wants(data):
+                try:
+                    sub.deliver(event)
+                except RuntimeError:
+                    self.unsubscribe(sub)  # Its event loop is gone
+        return event[0]
+
+    def subscribe(self, session_id: Optional[int] = None, last_event_id: Optional[int] = None) -> Tuple[Subscription, List, bool]:
+        """
+        Registers a subscriber on the running event loop. Returns
+        (subscription, missed events after last_event_id, complete) where
+        complete is False if some of the missed events already left the
+        buffer (the client should refetch its state).
+        """
+        sub = Subscription(asyncio.get_running_loop(), session_id)
+        with self._lock:
+            self._subscribers.append(sub)
+            missed, complete = [], True
+            if last_event_id is not None:
+                missed = [e for e in self._recent if e[0] > last_event_id and sub.wants(e[2])]
+                oldest = self._recent[0][0] if self._recent else self._next_id
+                # An id from before a restart is ahead of the counter: everything is unknown
+                complete = oldest - 1 <= last_event_id < self._next_id
+        return sub, missed, complete
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "last_event_id": self._next_id - 1,
+                "dropped": sum(s.dropped for s in self._subscribers),
+            }
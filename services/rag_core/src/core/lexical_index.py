@@ -0,0 +1,166 @@
+import re
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+# Keeps identifiers like "AB-1234", "fig_3.2" or "v1.0/rc2" intact as one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_./:]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases and splits text into lexical tokens.
+    Compound identifiers are indexed both whole and by their parts, so
+    "Figure 3-B" matches queries for "3-B" as well as for "3".
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if TOKEN_SEPARATORS.search(token):
+            tokens.extend(p for p in TOKEN_SEPARATORS.split(token) if p)
+    return tokens
+
+
+class BM25Index:
+    """
+    Sparse lexical (Okapi BM25) index over child chunks.
+    Postings are stored CSR-style in flat numpy arrays so the index can be
+    saved next to the FAISS file as a single .npz without pickling.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.float32)
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_len)
+
+    def build(self, texts: Sequence[str]) -> "BM25Index":
+        term_ids, doc_ids, tfs = [], [], []
+        doc_len = np.zeros(len(texts), dtype=np.float32)
+
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids = np.array(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+
+        self.doc_ids = np.array(doc_ids, dtype=np.int32)[order]
+        self.tfs = np.array(tfs, dtype=np.float32)[order]
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        self.offsets = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+        self.doc_len = doc_len
+        self._compute_idf(df)
+        return self
+
+    def _compute_idf(self, df: np.ndarray):
+        n = max(self.num_docs, 1)
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (doc_ids, scores) of the top_k matching child chunks, best first.
+        Documents that share no term with the query are never returned.
+        """
+        if self.num_docs == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        avgdl = max(float(self.doc_len.mean()), 1e-6)
+
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[docs] / avgdl)
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + norm)
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return matched.astype(np.int64), scores[matched]
+
+    def save(self, path: str):
+        terms = sorted(self.vocab, key=self.vocab.get)
+        np.savez(
+            path,
+            terms=np.array(terms, dtype=str),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            tfs=self.tfs,
+            doc_len=self.doc_len,
+            params=np.array([self.k1, self.b], dtype=np.float32),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            k1, b = (float(x) for x in data["params"])
+            index = cls(k1=k1, b=b)
+            index.vocab = {term: i for i, term in enumerate(data["terms"].tolist())}
+            index.offsets = data["offsets"]
+            index.doc_ids = data["doc_ids"]
+            index.tfs = data["tfs"]
+            index.doc_len = data["doc_len"]
+        index._compute_idf(np.diff(index.offsets))
+        return index
+
+
+def _sum_by_id(ids: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sums values per id; returns (ids, totals) sorted by total, best first."""
+    if len(ids) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    unique, inverse = np.unique(ids, return_inverse=True)
+    totals = np.bincount(inverse, weights=values, minlength=len(unique))
+    order = np.argsort(-totals, kind="stable")
+    return unique[order].astype(np.int64), totals[order].astype(np.float32)
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """Fuses several ranked id lists: score(d) = sum(1 / (k + rank_i(d)))."""
+    ids = np.concatenate([np.asarray(r, dtype=np.int64) for r in rankings])
+    contributions = np.concatenate(
+        [1.0 / (k + np.arange(1, len(r) + 1)) for r in rankings]
+    )
+    return _sum_by_id(ids, contributions)
+
+
+def weighted_fusion(
+    dense: Tuple[np.ndarray, np.ndarray],
+    sparse: Tuple[np.ndarray, np.ndarray],
+    alpha: float = 0.5,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weighted sum of max-normalized scores: alpha * dense + (1 - alpha) * sparse.
+    A candidate missing from one list contributes 0 for that side.
+    """
+    ids, contributions = [], []
+    for (side_ids, side_scores), weight in ((dense, alpha), (sparse, 1.0 - alpha)):
+        if len(side_ids) == 0:
+            continue
+        top = float(np.max(side_scores))
+        scale = weight / top if top > 0 else 0.0
+        ids.append(np.asarray(side_ids, dtype=np.int64))
+        contributions.append(np.asarray(side_scores, dtype=np.float64) * scale)
+
+    if not ids:
+        return _sum_by_id(np.zeros(0, dtype=np.int64), np.zeros(0))
+    return _sum_by_id(np.concatenate(ids), np.concatenate(contributions))
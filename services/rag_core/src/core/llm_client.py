@@ -1,7 +1,7 @@
 import os
 import requests
 from groq import Groq
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 import json
 
 class GroqClient:
@@ -17,6 +17,22 @@ class GroqClient:
             max_tokens=max_tokens,
         )
 
+    def stream_chat_completion(self, model: str, messages: list, temperature: float, max_tokens: int):
+        # Yields text deltas as Groq produces them
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
 # Helper classes to make Dict responses look like Pydantic objects
 class MockMessage:
     def __init__(self, content):
@@ -27,8 +43,10 @@ class MockChoice:
         self.message = MockMessage(content)
 
 class MockResponse:
-    def __init__(self, content):
+    def __init__(self, content, error=False):
         self.choices = [MockChoice(content)]
+        # True when content is an error message rather than an answer (never cached)
+        self.error = error
 
 class SanctuaryClient:
     def __init__(
@@ -61,7 +79,7 @@ class SanctuaryClient:
             if not response.ok:
                 print(f"Sanctuary API Error: {response.text}")
                 # Fallback or raise
-                return MockResponse("Error: Could not retrieve answer from Sanctuary.")
+                return MockResponse("Error: Could not retrieve answer from Sanctuary.", error=True)
 
             data = response.json()
             
@@ -75,4 +93,49 @@ class SanctuaryClient:
 
         except requests.exceptions.RequestException as e:
             print(f"Request failed: {e}")
-            return MockResponse(f"Error calling API: {e}")
\ No newline at end of file
+            return MockResponse(f"Error calling API: {e}", error=True)
+
+    def stream_chat_completion(self, model: str, messages: List[Dict], temperature: float = 0.3, max_tokens: int = 1024) -> Iterator[str]:
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+        }
+
+        try:
+            response = self.session.post(
+                f"{self.base_url}/v1/chat/completions", json=payload, stream=True
+            )
+
+            if not response.ok:
+                print(f"Sanctuary API Error: {response.text}")
+                # Raised rather than yielded so a half-streamed error is never taken for an answer
+                raise RuntimeError("Could not retrieve answer from Sanctuary.")
+
+            # Some deployments ignore "stream" and answer with a single JSON body
+            if "text/event-stream" not in response.headers.get("Content-Type", ""):
+                data = response.json()
+                try:
+                    yield data['choices'][0]['message']['content']
+                except (KeyError, IndexError):
+                    yield str(data)
+                return
+
+            # OpenAI-style SSE: "data: {...}" lines terminated by "data: [DONE]"
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                except (ValueError, KeyError, IndexError):
+                    continue
+                if delta:
+                    yield delta
+
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed: {e}")
+            raise RuntimeError(f"Error calling API: {e}") from e
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+from src.core.llm_client import MockResponse
+
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "True") == "True"
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL_S = float(os.environ.get("LLM_CACHE_TTL_S", "3600"))
+# How long a coalesced request waits on the in-flight call before giving up
+LLM_COALESCE_TIMEOUT_S = float(os.environ.get("LLM_COALESCE_TIMEOUT_S", "180"))
+
+
+def completion_key(model: str, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """
+    One upstream call in progress. The leader appends text deltas as they
+    arrive; coalesced followers replay what is there and wait for the rest.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+
+    def append(self, delta: str):
+        with self._cond:
+            self.parts.append(delta)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def follow(self, timeout: float) -> Iterator[str]:
+        deadline = time.monotonic() + timeout
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self.parts) and not self.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for in-flight LLM request")
+                    self._cond.wait(remaining)
+                new, i = self.parts[i:], len(self.parts)
+                done, error = self.done, self.error
+            yield from new
+            if done:
+                if error is not None:
+                    raise RuntimeError(f"Shared LLM request failed: {error}")
+                return
+
+
+class LLMGateway:
+    """
+    Wraps a chat client (GroqClient / SanctuaryClient) with the same
+    create_chat_completion / stream_chat_completion interface, adding:
+
+    - an exact-prompt completion cache (LRU + TTL) keyed by model, messages,
+      temperature and max_tokens; only successful answers are stored
+    - single-flight coalescing: concurrent identical requests, streaming or
+      not, share one upstream call, and streaming followers receive the
+      deltas as the leader does
+    """
+
+    def __init__(
+        self,
+        client,
+        cache_size: int = LLM_CACHE_SIZE,
+        ttl_s: float = LLM_CACHE_TTL_S,
+        enabled: bool = LLM_CACHE_ENABLED,
+        coalesce_timeout_s: float = LLM_COALESCE_TIMEOUT_S,
+    ):
+        self.client = client
+        self.cache_size = cache_size
+        self.ttl_s = ttl_s
+        self.enabled = enabled
+        self.coalesce_timeout_s = coalesce_timeout_s
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, text)
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "upstream_calls": 0}
+
+    def _cached(self, key: str) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, text = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return text
+
+    def _store(self, key: str, text: str):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl_s, text)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _join(self, key: str):
+        """Returns (cached_text, flight, is_leader); exactly one is meaningful."""
+        with self._lock:
+            text = self._cached(key)
+            if text is not None:
+                self._stats["hits"] += 1
+                return text, None, False
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                return None, flight, False
+            flight = self._flights[key] = _Flight()
+            self._stats["misses"] += 1
+            self._stats["upstream_calls"] += 1
+            return None, flight, True
+
+    def _land(self, key: str, flight: _Flight, text: Optional[str], error: Optional[BaseException]):
+        with self._lock:
+            self._flights.pop(key, None)
+        if text is not None and error is None:
+            self._store(key, text)
+        flight.finish(error)
+
+    def create_chat_completion(self, model: str, messages: List[Dict], temperature: float, max_tokens: int):
+        if not self.enabled:
+            return self.client.create_chat_completion(
+                model=model, messages=messages, temperature=temperature, max_tokens=max_tokens
+            )
+
+        key = completion_key(model, messages, temperature, max_tokens)
+        text, flight, leader = self._join(key)
+        if text is not None:
+            return MockResponse(text)
+        if not leader:
+            try:
+                return MockResponse("".join(flight.follow(self.coalesce_timeout_s)))
+            except RuntimeError as e:
+                # The leader's call failed: an error response, like the clients return
+                return MockResponse(f"Error: {e}", error=True)
+
+        try:
+            resp = self.client.create_chat_completion(
+                model=model, messages=messages, temperature=temperature, max_tokens=max_tokens
+            )
+        except BaseException as e:
+            self._land(key, flight, None, e)
+            raise
+
+        content = resp.choices[0].message.content
+        if getattr(resp, "error", False):
+            # An error answer is never cached, and followers get it as an error, not as text
+            self._land(key, flight, None, RuntimeError(content))
+            return resp
+        flight.append(content)
+        self._land(key, flight, content, None)
+        return resp
+
+    def stream_chat_completion(
+        self, model: str, messages: List[Dict], temperature: float, max_tokens: int
+    ) -> Iterator[str]:
+        if not self.enabled:
+            yield from self.client.stream_chat_completion(
+                model=model, messages=messages, temperature=temperature, max_tokens=max_tokens
+            )
+            return
+
+        key = completion_key(model, messages, temperature, max_tokens)
+        text, flight, leader = self._join(key)
+        if text is not None:
+            yield text
+            return
+        if not leader:
+            yield from flight.follow(self.coalesce_timeout_s)
+            return
+
+        parts, landed = [], False
+        try:
+            for delta in self.client.stream_chat_completion(
+                model=model, messages=messages, temperature=temperature, max_tokens=max_tokens
+            ):
+                parts.append(delta)
+                flight.append(delta)
+                yield delta
+            landed = True
+            self._land(key, flight, "".join(parts), None)
+        except Exception as e:
+            landed = True
+            self._land(key, flight, None, e)
+            raise
+        finally:
+            if not landed:
+                # Consumer went away mid-stream (e.g. client disconnect)
+                self._land(key, flight, None, RuntimeError("leader request was cancelled"))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats, cached=len(self._cache), in_flight=len(self._flights))
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        if hasattr(self.client, "stats"):
+            stats["upstream"] = self.client.stats()
+        return stats
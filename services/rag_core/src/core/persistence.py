@@ -3,23 +3,54 @@
 import faiss
 import pickle
 import os
-from typing import List, Tuple
-from .data_models import Chunk
+import shutil
+from typing import Dict, List, Optional, Tuple
+from .chunk_store import ChunkStore, store_size
+from .lexical_index import BM25Index
+from .vector_index import save_index_info, load_index_info
 
 FAISS_DIR = "data/faiss_indexes"
 CHUNKS_DIR = "data/chunks"
 
 
+def lexical_index_path(faiss_path: str) -> str:
+    """The BM25 index lives next to its FAISS file: index_7.faiss -> index_7.bm25.npz"""
+    return os.path.splitext(faiss_path)[0] + ".bm25.npz"
+
+
+def index_info_path(faiss_path: str) -> str:
+    """Build/search parameters of the FAISS index: index_7.faiss -> index_7.params.json"""
+    return os.path.splitext(faiss_path)[0] + ".params.json"
+
+
+def chunk_store_path(doc_id: int) -> str:
+    return os.path.join(CHUNKS_DIR, f"chunks_{doc_id}")
+
+
+def legacy_chunk_paths(doc_id: int) -> Tuple[str, str]:
+    """Pickled (chunks, parents) files written before the columnar chunk store."""
+    return (
+        os.path.join(CHUNKS_DIR, f"chunks_{doc_id}.pkl"),
+        os.path.join(CHUNKS_DIR, f"{doc_id}_parents.pkl"),
+    )
+
+
 def save_rag_state(
-    doc_id: int, index: faiss.Index, chunks: List[Chunk]
+    doc_id: int,
+    index: faiss.Index,
+    store: ChunkStore,
+    lexical_index: Optional[BM25Index] = None,
+    index_info: Optional[Dict] = None,
 ) -> Tuple[str, str]:
     """
-    Saves the FAISS index and chunks list to disk.
+    Saves the FAISS index and chunk store to disk.
 
     Args:
         doc_id (int): The unique ID of the document session.
         index (faiss.Index): The FAISS vector index.
-        chunks (List[Chunk]): The list of Chunk objects.
+        store (ChunkStore): Parent/child chunks in columnar form.
+        lexical_index (BM25Index, optional): Sparse index over the same chunks.
+        index_info (dict, optional): Index type and build/search parameters.
 
     Returns:
         A tuple of (faiss_path, chunks_path).
@@ -28,32 +59,78 @@ def save_rag_state(
     os.makedirs(CHUNKS_DIR, exist_ok=True)
 
     faiss_path = os.path.join(FAISS_DIR, f"index_{doc_id}.faiss")
-    chunks_path = os.path.join(CHUNKS_DIR, f"chunks_{doc_id}.pkl")
+    chunks_path = chunk_store_path(doc_id)
 
     # Save the FAISS index
     faiss.write_index(index, faiss_path)
     print(f"✓ FAISS index saved to {faiss_path}")
 
-    # Save the chunks list using pickle
-    with open(chunks_path, "wb") as f:
-        pickle.dump(chunks, f)
-    print(f"✓ Chunks list saved to {chunks_path}")
+    # Save the chunk store (no pickle)
+    store.save(chunks_path)
+    print(f"✓ Chunk store saved to {chunks_path} ({store.num_children} children, {store.num_parents} parents)")
+
+    if index_info is not None:
+        save_index_info(index_info_path(faiss_path), index_info)
+
+    if lexical_index is not None:
+        lexical_index.save(lexical_index_path(faiss_path))
+        print(f"✓ BM25 index saved to {lexical_index_path(faiss_path)}")
 
     return faiss_path, chunks_path
 
 
+def read_faiss_index(faiss_path: str, mmap: bool = False) -> faiss.Index:
+    """
+    Reads a FAISS index, optionally memory-mapped.
+
+    With mmap the vectors/inverted lists stay on disk and are paged in by the OS
+    as searches touch them. IVF indexes map cleanly; flat-code indexes need a
+    FAISS build with IO_FLAG_MMAP_IFC. Anything else falls back to a full read.
+    """
+    if not mmap:
+        return faiss.read_index(faiss_path)
+
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        return faiss.read_index(faiss_path, flags)
+    except RuntimeError as e:
+        print(f"⚠️ Could not memory-map {faiss_path} ({e}); reading into RAM")
+        return faiss.read_index(faiss_path)
+
+
+def load_legacy_chunks(chunks_path: str) -> ChunkStore:
+    """
+    Converts a pickled chunk list (+ its sibling <id>_parents.pkl) into a ChunkStore.
+    Only used for documents not yet migrated (see src/utils/migrate_chunks.py).
+    """
+    with open(chunks_path, "rb") as f:
+        chunks = pickle.load(f)
+
+    # Infer parent path: data/chunks/chunks_7.pkl -> data/chunks/7_parents.pkl
+    base = os.path.dirname(chunks_path)
+    doc_id = os.path.basename(chunks_path).split("_")[1].split(".")[0]
+    parent_path = os.path.join(base, f"{doc_id}_parents.pkl")
+    parent_map = {}
+    if os.path.exists(parent_path):
+        with open(parent_path, "rb") as f:
+            parent_map = pickle.load(f)
+
+    return ChunkStore.from_chunks(chunks, parent_map)
+
+
 def load_rag_state(
-    faiss_path: str, chunks_path: str
-) -> Tuple[faiss.Index, List[Chunk]]:
+    faiss_path: str, chunks_path: str, mmap: bool = False
+) -> Tuple[faiss.Index, ChunkStore]:
     """
-    Loads the FAISS index and chunks list from disk.
+    Loads the FAISS index and chunk store from disk.
 
     Args:
         faiss_path (str): Path to the saved FAISS index file.
-        chunks_path (str): Path to the saved chunks pickle file.
+        chunks_path (str): Path to the chunk store directory (or a legacy .pkl).
+        mmap (bool): Memory-map the FAISS index and chunk store instead of reading them into RAM.
 
     Returns:
-        A tuple of (loaded_index, loaded_chunks).
+        A tuple of (loaded_index, chunk_store).
     """
     if not os.path.exists(faiss_path):
         raise FileNotFoundError(f"FAISS index file not found: {faiss_path}")
@@ -62,29 +139,56 @@ def load_rag_state(
         raise FileNotFoundError(f"Chunks file not found: {chunks_path}")
 
     # Load the FAISS index
-    index = faiss.read_index(faiss_path)
-    print(f"✓ FAISS index loaded from {faiss_path}")
+    index = read_faiss_index(faiss_path, mmap=mmap)
+    print(f"✓ FAISS index loaded from {faiss_path}{' (mmap)' if mmap else ''}")
 
-    # Load the chunks list
-    with open(chunks_path, "rb") as f:
-        chunks = pickle.load(f)
-    print(f"✓ Chunks list loaded from {chunks_path} ({len(chunks)} chunks)")
+    # Load the chunks
+    if chunks_path.endswith(".pkl"):
+        store = load_legacy_chunks(chunks_path)
+    else:
+        store = ChunkStore.open(chunks_path, mmap=mmap)
+    print(f"✓ Chunk store loaded from {chunks_path} ({store.num_children} chunks)")
+
+    return index, store
+
+
+def load_index_params(faiss_path: str) -> Optional[Dict]:
+    """Returns the saved build/search parameters, or None for legacy flat indexes."""
+    return load_index_info(index_info_path(faiss_path))
+
+
+def load_lexical_index(faiss_path: str) -> Optional[BM25Index]:
+    """
+    Loads the BM25 index saved alongside a FAISS file.
+    Returns None for documents indexed before hybrid retrieval existed.
+    """
+    path = lexical_index_path(faiss_path)
+    if not os.path.exists(path):
+        return None
 
-    return index, chunks
+    lexical_index = BM25Index.load(path)
+    print(f"✓ BM25 index loaded from {path} ({len(lexical_index.vocab)} terms)")
+    return lexical_index
 
 
-def delete_rag_state(doc_id: int) -> bool:
+def delete_rag_state(
+    doc_id: int, faiss_path: Optional[str] = None, chunks_path: Optional[str] = None, keep_chunks: bool = False
+) -> bool:
     """
     Deletes the saved FAISS index and chunks for a document.
 
     Args:
         doc_id (int): The unique ID of the document session.
+        faiss_path, chunks_path: The paths stored for the document, which
+            belong to another doc id when it was linked from a duplicate upload.
+        keep_chunks (bool): Leave the chunk store (query history still reads
+            its sources from it) and delete only the indexes.
 
     Returns:
         bool: True if files were deleted, False if files didn't exist.
     """
-    faiss_path = os.path.join(FAISS_DIR, f"index_{doc_id}.faiss")
-    chunks_path = os.path.join(CHUNKS_DIR, f"chunks_{doc_id}.pkl")
+    faiss_path = faiss_path or os.path.join(FAISS_DIR, f"index_{doc_id}.faiss")
+    chunks_path = chunks_path or chunk_store_path(doc_id)
 
     deleted = False
 
@@ -93,11 +197,33 @@ def delete_rag_state(doc_id: int) -> bool:
         print(f"✓ Deleted FAISS index: {faiss_path}")
         deleted = True
 
-    if os.path.exists(chunks_path):
+    if os.path.exists(lexical_index_path(faiss_path)):
+        os.remove(lexical_index_path(faiss_path))
+        print(f"✓ Deleted BM25 index: {lexical_index_path(faiss_path)}")
+        deleted = True
+
+    if os.path.exists(index_info_path(faiss_path)):
+        os.remove(index_info_path(faiss_path))
+
+    if keep_chunks:
+        print(f"✓ Kept chunk store for query history: {chunks_path}")
+        return deleted
+
+    if os.path.isdir(chunks_path):
+        shutil.rmtree(chunks_path)
+        print(f"✓ Deleted chunk store: {chunks_path}")
+        deleted = True
+    elif os.path.isfile(chunks_path):
         os.remove(chunks_path)
         print(f"✓ Deleted chunks file: {chunks_path}")
         deleted = True
 
+    for legacy_path in legacy_chunk_paths(doc_id):
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+            print(f"✓ Deleted chunks file: {legacy_path}")
+            deleted = True
+
     return deleted
 
 
@@ -109,20 +235,24 @@ def get_state_size(doc_id: int) -> dict:
         doc_id (int): The unique ID of the document session.
 
     Returns:
-        dict: Dictionary with 'faiss_size', 'chunks_size', and 'total_size' in bytes.
+        dict: Dictionary with 'faiss_size', 'chunks_size', 'bm25_size' and 'total_size' in bytes.
     """
     faiss_path = os.path.join(FAISS_DIR, f"index_{doc_id}.faiss")
-    chunks_path = os.path.join(CHUNKS_DIR, f"chunks_{doc_id}.pkl")
+    chunks_path = chunk_store_path(doc_id)
 
-    sizes = {"faiss_size": 0, "chunks_size": 0, "total_size": 0}
+    sizes = {"faiss_size": 0, "chunks_size": 0, "bm25_size": 0, "total_size": 0}
 
     if os.path.exists(faiss_path):
         sizes["faiss_size"] = os.path.getsize(faiss_path)
 
-    if os.path.exists(chunks_path):
-        sizes["chunks_size"] = os.path.getsize(chunks_path)
+    if os.path.exists(lexical_index_path(faiss_path)):
+        sizes["bm25_size"] = os.path.getsize(lexical_index_path(faiss_path))
+
+    sizes["chunks_size"] = store_size(chunks_path) + sum(
+        os.path.getsize(p) for p in legacy_chunk_paths(doc_id) if os.path.exists(p)
+    )
 
-    sizes["total_size"] = sizes["faiss_size"] + sizes["chunks_size"]
+    sizes["total_size"] = sizes["faiss_size"] + sizes["chunks_size"] + sizes["bm25_size"]
 
     return sizes
 
@@ -149,7 +279,7 @@ def list_all_saved_states() -> List[int]:
     # Check chunks directory
     if os.path.exists(CHUNKS_DIR):
         for filename in os.listdir(CHUNKS_DIR):
-            if filename.startswith("chunks_") and filename.endswith(".pkl"):
+            if filename.startswith("chunks_") and not filename.endswith((".tmp", ".old")):
                 doc_id = filename.replace("chunks_", "").replace(".pkl", "")
                 try:
                     doc_ids.add(int(doc_id))
@@ -164,7 +294,8 @@ def cleanup_orphaned_states(valid_doc_ids: List[int]) -> int:
     Removes saved state files for document IDs that are no longer in the database.
 
     Args:
-        valid_doc_ids (List[int]): List of document IDs that should be kept.
+        valid_doc_ids (List[int]): List of document IDs that should be kept,
+            including removed ones whose chunk store query history still reads.
 
     Returns:
         int: Number of orphaned states cleaned up.
@@ -0,0 +1,71 @@
+import os
+import threading
+from collections import OrderedDict
+
+from src.core.rag_pipeline import SmartRAG
+
+# How many document pipelines to keep resident (LRU)
+PIPELINE_CACHE_SIZE = int(os.environ.get("PIPELINE_CACHE_SIZE", "64"))
+# "mmap": lazy + memory-mapped FAISS index; "ram": eager full read (old behaviour)
+INDEX_LOAD_MODE = os.environ.get("INDEX_LOAD_MODE", "mmap")
+
+
+class PipelineCache:
+    """
+    LRU cache of per-document SmartRAG pipelines.
+
+    In mmap mode a cached pipeline holds only its file paths until the first
+    search, so sessions that are opened once and never queried again cost
+    next to nothing.
+    """
+
+    def __init__(self, max_size=PIPELINE_CACHE_SIZE, load_mode=INDEX_LOAD_MODE):
+        self.max_size = max_size
+        self.load_mode = load_mode
+        self._pipelines = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(doc):
+        # Paths are part of the key so a re-processed document is never served stale
+        return (doc["id"], doc["faiss_index_path"], doc["chunks_path"])
+
+    def get(self, doc):
+        """Returns the pipeline for a document row, loading it on a miss."""
+        key = self._key(doc)
+        with self._lock:
+            pipeline = self._pipelines.get(key)
+            if pipeline is not None:
+                self._pipelines.move_to_end(key)
+                return pipeline
+
+        # We don't need to load the vision model again for querying, just the vector store
+        pipeline = SmartRAG(output_dir=doc["chart_dir"], load_vision=False)
+        pipeline.doc_id = doc["id"]
+        lazy = self.load_mode == "mmap"
+        pipeline.load_state(
+            doc["faiss_index_path"], doc["chunks_path"], lazy=lazy, mmap=lazy
+        )
+
+        with self._lock:
+            pipeline = self._pipelines.setdefault(key, pipeline)
+            self._pipelines.move_to_end(key)
+            while len(self._pipelines) > self.max_size:
+                self._pipelines.popitem(last=False)
+        return pipeline
+
+    def evict(self, doc_id):
+        """Drops every cached pipeline for a document id."""
+        with self._lock:
+            for key in [k for k in self._pipelines if k[0] == doc_id]:
+                del self._pipelines[key]
+
+    def stats(self):
+        with self._lock:
+            pipelines = list(self._pipelines.values())
+        return {
+            "cached": len(pipelines),
+            "loaded": sum(1 for p in pipelines if p.is_loaded),
+            "max_size": self.max_size,
+            "load_mode": self.load_mode,
+        }
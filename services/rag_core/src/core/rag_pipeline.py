@@ -1,43 +1,128 @@
 import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 import requests
 import numpy as np
 import faiss
-import pickle
 from typing import List, Dict, Tuple
-from sentence_transformers import SentenceTransformer
 from src.core.chunking import DocumentChunker
-from src.core.persistence import save_rag_state, load_rag_state
+from src.core.chunk_store import ChunkStore
+from src.core.persistence import (
+    save_rag_state,
+    load_rag_state,
+    load_lexical_index,
+    load_index_params,
+)
+from src.core.vector_index import EXACT_INDEX_TYPES, build_vector_index, apply_search_params
+from src.core.lexical_index import BM25Index, reciprocal_rank_fusion, weighted_fusion
+from src.core.embedding_client import get_embedder
+from src.core.embedding_cache import EMBEDDING_CACHE_ENABLED, get_embedding_cache
+from src.core.context_packing import CONTEXT_PACKING, ContextPacker, get_token_counter
+from src.core.reranker import RERANK_ENABLED, RERANK_MAX_CANDIDATES, get_reranker
 from src.core.llm_client import GroqClient, SanctuaryClient
+from src.core.llm_gateway import LLMGateway
+from src.core.async_llm_client import build_llm_client
+from src.utils.metrics import metrics
 
 PARSER_API = os.environ.get("PARSER_API_URL", "http://parser:8001")
 VISION_API = os.environ.get("VISION_API_URL", "http://vision:8002")
+LLM_MODEL = os.environ.get("LLM_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
 
-client = SanctuaryClient()
-if os.environ.get("TEST") == "True":
-    client = GroqClient()
+# Retrieval: "dense" (MiniLM only), "sparse" (BM25 only) or "hybrid" (both, fused)
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid")
+# Fusion for hybrid mode: "rrf" (reciprocal rank fusion) or "weighted"
+HYBRID_FUSION = os.environ.get("HYBRID_FUSION", "rrf")
+HYBRID_ALPHA = float(os.environ.get("HYBRID_ALPHA", "0.5"))
+RRF_K = int(os.environ.get("RRF_K", "60"))
+RETRIEVAL_MODES = ("dense", "sparse", "hybrid")
+
+# Per-document search fan-out: worker threads and per-query deadline
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", str(min(8, os.cpu_count() or 4))))
+SEARCH_DEADLINE_MS = float(os.environ.get("SEARCH_DEADLINE_MS", "2000"))
+
+# Concurrent LLM calls for /query/batch
+BATCH_LLM_CONCURRENCY = int(os.environ.get("BATCH_LLM_CONCURRENCY", "4"))
+
+# Child -> parent aggregation: "max" (best child wins) or "sum" (many hits add up)
+PARENT_POOLING = os.environ.get("PARENT_POOLING", "max")
+# Initial children fetched per requested parent; doubled until top_k parents are found
+CANDIDATE_FACTOR = int(os.environ.get("CANDIDATE_FACTOR", "3"))
+
+# "async": pooled httpx providers with deadlines/retries/hedging (async_llm_client.py)
+# "legacy": the Groq SDK / requests clients in llm_client.py
+if os.environ.get("LLM_CLIENT", "async") == "legacy":
+    client = GroqClient() if os.environ.get("TEST") == "True" else SanctuaryClient()
+else:
+    client = build_llm_client()
+# Shared by every pipeline: completion cache + coalescing of identical prompts
+client = LLMGateway(client)
+
+
+_search_pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="doc-search")
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def _section_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
 class SmartRAG:
-    def __init__(self, output_dir, vision_model_name="Moondream2", load_vision=False):
+    def __init__(
+        self,
+        output_dir,
+        vision_model_name="Moondream2",
+        load_vision=False,
+        index_type=None,
+    ):
         self.output_dir = output_dir
+        self.doc_id = None  # documents.id, set once saved or loaded
         self.vision_model_name = vision_model_name
+        self.index_type = index_type  # None -> VECTOR_INDEX_TYPE ("auto" by vector count)
         self.client = client
-        self.embedding_model = SentenceTransformer(
-            "sentence-transformers/all-MiniLM-L6-v2"
-        )
+        # Embedding service client or in-process engine (see embedding_client.py)
+        self.embedder = get_embedder()
         self.chunker = DocumentChunker()
         self.index = None
-        self.child_chunks = []
-        self.parent_map = {}
+        self.index_info = None
+        self.lexical_index = None
+        self.store = None  # ChunkStore: child/parent text, child -> parent ids
         self.chart_descriptions = {}
+        self.page_manifest = {}  # {page_key: {"hash", "images", "charts", "text_hash"}}, for re-ingestion
+        self.charts = []
+        self.index_stats = {}  # Filled by index_document (chunk count, cache hits)
+        # Set by load_state(lazy=True); the state is read on first search
+        self._pending_state = None
+        self._load_lock = threading.Lock()
 
-    def index_document(self, file_path):
+    def index_document(self, file_path, previous=None, progress=None):
+        """
+        Args:
+            previous: Re-ingestion of a new revision. {"pages": page manifest,
+                "chart_descriptions": {...}, "faiss_path", "chunks_path"} of the
+                previous version; pages whose text and rendering are unchanged
+                skip chart detection and vision, and take their chunks and
+                vectors from the previous version's store and index.
+            progress: Optional callback(stage, done=None, total=None), called as
+                each stage (parsing, vision, chunking, embedding, indexing) advances.
+        """
         print(f"Indexing {file_path}...")
+        previous = previous or {}
+        report = progress or (lambda stage, done=None, total=None: None)
 
         # 1. Call Parser Service
+        report("parsing")
         resp = requests.post(
             f"{PARSER_API}/parse",
-            json={"file_path": file_path, "output_dir": self.output_dir},
+            json={
+                "file_path": file_path,
+                "output_dir": self.output_dir,
+                "previous_pages": previous.get("pages"),
+            },
         )
         if resp.status_code != 200:
             raise Exception(f"Parser failed: {resp.text}")
@@ -45,11 +130,179 @@ class SmartRAG:
         data = resp.json()
         markdown_text = data["text"]
         image_paths = data["images"]
+        pages = data.get("pages", [])
+        self.page_manifest = {
+            p["key"]: {"hash": p["hash"], "images": p["images"], "charts": p.get("charts", [])}
+            for p in pages
+        }
+        # Crop metadata (page, bbox, class, score, size), stored in the charts table
+        self.charts = data.get("charts", [])
 
-        # 2. Call Vision Service for each image
-        for img_path in image_paths:
+        # Charts on unchanged pages keep their previous description (under
+        # their previous file name when the page moved)
+        previous_descriptions = previous.get("chart_descriptions") or {}
+        reusable = {
+            os.path.basename(img): self.chunker.renumber(
+                os.path.basename(img), p["key"], p.get("previous_key") or p["key"]
+            )
+            for p in pages
+            if p.get("unchanged")
+            for img in p["images"]
+        }
+
+        # 2. Call Vision Service for each new or changed image
+        reused = 0
+        report("vision", 0, len(image_paths))
+        for i, img_path in enumerate(image_paths, 1):
             fname = os.path.basename(img_path)
-            prompt = """Analyze the image and produce a precise, factual description of its contents.
+            try:
+                if reusable.get(fname) in previous_descriptions:
+                    desc = previous_descriptions[reusable[fname]]
+                    reused += 1
+                else:
+                    desc = self._describe_image(img_path)
+                self.chart_descriptions[fname] = desc
+
+                # Inject description into markdown
+                placeholder = f"[CHART_PLACEHOLDER:{fname}]"
+                replacement = f"\n> **Visual Analysis ({fname}):**\n> {desc}\n"
+                markdown_text = markdown_text.replace(placeholder, replacement)
+            except Exception as e:
+                print(f"Vision failed for {fname}: {e}")
+            report("vision", i, len(image_paths))
+
+        self.index_stats["pages"] = {
+            "total": len(pages),
+            "unchanged": sum(1 for p in pages if p.get("unchanged")),
+        }
+        self.index_stats["vision"] = {"described": len(image_paths) - reused, "reused": reused}
+
+        # 3. Chunking, page by page. Pages whose final text (chart descriptions
+        # included) is unchanged take their chunks from the previous revision,
+        # wherever that page was
+        report("chunking")
+        sections = self.chunker.split_pages(markdown_text)
+        for key, _, section in sections:
+            self.page_manifest.setdefault(key, {})["text_hash"] = self._page_text_hash(section, key)
+        reuse, reused_rows = self._previous_chunks(previous, sections)
+        child_chunks, parent_map = self.chunker.process(markdown_text, file_path, reuse=reuse)
+        self.store = ChunkStore.from_chunks(child_chunks, parent_map)
+        texts = [c.text for c in child_chunks]
+
+        # 4. Lexical index (exact identifiers, part numbers, figure labels)
+        self.lexical_index = BM25Index().build(texts)
+
+        # 5. Embedding: reused pages take their vectors from the previous index,
+        # other unchanged chunk texts come from the persistent cache
+        report("embedding", 0, len(texts))
+        known = self._previous_vectors(previous, child_chunks, reused_rows)
+        todo = [i for i in range(len(texts)) if i not in known]
+        todo_texts = [texts[i] for i in todo]
+
+        def encode(batch):
+            # Only the missing texts are embedded; count the rest as done
+            offset = len(texts) - len(batch)
+            return self.embedder.encode_with_progress(
+                batch, on_progress=lambda done, total: report("embedding", offset + done, len(texts))
+            )
+
+        if not todo_texts:
+            fresh = []
+        elif EMBEDDING_CACHE_ENABLED:
+            fresh, info = get_embedding_cache().encode(self.embedder.cache_id, todo_texts, encode)
+            self.index_stats["embedding_cache"] = info
+            print(f"✓ Embeddings: {info['hits']}/{len(todo_texts)} from cache")
+        else:
+            fresh = encode(todo_texts)
+        known.update(zip(todo, fresh))
+        embeddings = np.stack([known[i] for i in range(len(texts))]) if texts else np.zeros((0, 0))
+        self.index_stats["chunks"] = len(texts)
+        self.index_stats["reused"] = {
+            "pages": len(reuse),
+            "chunks": sum(len(rows) for rows in reused_rows.values()),
+            "vectors": len(texts) - len(todo),
+        }
+        report("embedding", len(texts), len(texts))
+
+        # 6. Indexing (flat / HNSW / IVF / SQ8 / PQ, see vector_index.py)
+        report("indexing")
+        self.index, self.index_info = build_vector_index(
+            np.asarray(embeddings, dtype="float32"), index_type=self.index_type
+        )
+        # Vectors are only reused from an index built with the same embedding model
+        self.index_info["embedding_model"] = self.embedder.cache_id
+        print(f"✓ Built {self.index_info['factory']} index over {self.index.ntotal} vectors")
+
+    def _page_text_hash(self, section, key):
+        # Position-independent: a page that only moved keeps its hash
+        return _section_hash(self.chunker.page_signature(section, key))
+
+    def _previous_chunks(self, previous, sections):
+        """
+        Chunks of the previous revision for pages whose section text is unchanged:
+        ({page_key: [(parent text, [child texts])]}, {page_key: [child rows in the old store]}).
+        Pages are matched by text hash, so inserting or removing a page still
+        reuses the pages after it; their chunks are renumbered to the new page.
+        """
+        old_pages = previous.get("pages") or {}
+        chunks_path = previous.get("chunks_path")
+        if not old_pages or not chunks_path or not os.path.isdir(chunks_path):
+            return {}, {}
+        try:
+            store = ChunkStore.open(chunks_path, mmap=True)
+        except Exception as e:
+            print(f"⚠️ Previous chunk store unreadable ({e}); re-chunking every page")
+            return {}, {}
+
+        old_by_hash = {}
+        for old_key, entry in old_pages.items():
+            if entry.get("text_hash"):
+                old_by_hash.setdefault(entry["text_hash"], old_key)
+
+        reuse, rows = {}, {}
+        for key, _, section in sections:
+            text_hash = self._page_text_hash(section, key)
+            old_key = key if (old_pages.get(key) or {}).get("text_hash") == text_hash else old_by_hash.get(text_hash)
+            if old_key is None:
+                continue
+            groups = store.page_chunks(self.chunker.page_number(old_key))
+            if groups:
+                move = self.chunker.renumber
+                reuse[key] = [
+                    (move(store.parent_text[j], old_key, key), [move(store.child_text[r], old_key, key) for r in children])
+                    for j, children in groups
+                ]
+                rows[key] = [r for _, children in groups for r in children]
+        return reuse, rows
+
+    def _previous_vectors(self, previous, child_chunks, reused_rows):
+        """
+        {child position: vector} for the children of reused pages, read back
+        from the previous revision's index. Empty unless that index stores
+        exact vectors from this embedding model.
+        """
+        faiss_path = previous.get("faiss_path")
+        if not reused_rows or not faiss_path or not os.path.exists(faiss_path):
+            return {}
+        info = load_index_params(faiss_path) or {}
+        if info.get("embedding_model") != self.embedder.cache_id or info.get("type") not in EXACT_INDEX_TYPES:
+            return {}
+        try:
+            index = faiss.read_index(faiss_path)
+            if info["type"].startswith("ivf"):
+                faiss.extract_index_ivf(index).make_direct_map()
+            pending = {key: iter(rows) for key, rows in reused_rows.items()}
+            return {
+                i: index.reconstruct(int(next(pending[c.metadata["page_key"]])))
+                for i, c in enumerate(child_chunks)
+                if c.metadata.get("page_key") in pending
+            }
+        except Exception as e:
+            print(f"⚠️ Could not reuse vectors from {faiss_path} ({e}); embedding those pages")
+            return {}
+
+    def _describe_image(self, img_path):
+        prompt = """Analyze the image and produce a precise, factual description of its contents.
 
 If the image contains data (e.g., charts, graphs, tables, maps, diagrams):
 
@@ -67,104 +320,426 @@ Do not summarize trends unless after listing the full data.
 Do not omit numeric values.
 Do not infer information that is not visually present."""
 
-            try:
-                v_resp = requests.post(
-                    f"{VISION_API}/describe",
-                    json={
-                        "image_path": img_path,
-                        "prompt": prompt,
-                        "model_name": self.vision_model_name,
-                    },
-                )
-                desc = v_resp.json().get("description", "")
-                self.chart_descriptions[fname] = desc
-
-                # Inject description into markdown
-                placeholder = f"[CHART_PLACEHOLDER:{fname}]"
-                replacement = f"\n> **Visual Analysis ({fname}):**\n> {desc}\n"
-                markdown_text = markdown_text.replace(placeholder, replacement)
-            except Exception as e:
-                print(f"Vision failed for {fname}: {e}")
+        v_resp = requests.post(
+            f"{VISION_API}/describe",
+            json={
+                "image_path": img_path,
+                "prompt": prompt,
+                "model_name": self.vision_model_name,
+            },
+        )
+        return v_resp.json().get("description", "")
 
-        # 3. Chunking
-        self.child_chunks, self.parent_map = self.chunker.process(
-            markdown_text, file_path
+    def save_state(self, doc_id):
+        """Returns (faiss_path, chunks_path) as written to disk."""
+        self.doc_id = doc_id
+        return save_rag_state(
+            doc_id, self.index, self.store, self.lexical_index, self.index_info
         )
 
-        # 4. Embedding
-        texts = [c.text for c in self.child_chunks]
-        embeddings = self.embedding_model.encode(texts)
+    def load_state(self, faiss_path, chunks_path, lazy=False, mmap=False):
+        """
+        Loads a saved document state.
 
-        # 5. Indexing
-        self.index = faiss.IndexFlatL2(384)
-        self.index.add(np.array(embeddings).astype("float32"))
+        Args:
+            lazy: Defer all disk reads until the first search, so pipelines for
+                  cold sessions cost almost nothing to keep around.
+            mmap: Memory-map the FAISS index instead of reading it into RAM
+                  (falls back to a normal read for index types that can't be mapped).
+        """
+        self._pending_state = (faiss_path, chunks_path, mmap)
+        if not lazy:
+            self._ensure_loaded()
 
-    def save_state(self, doc_id):
-        save_rag_state(doc_id, self.index, self.child_chunks)
-        with open(f"data/chunks/{doc_id}_parents.pkl", "wb") as f:
-            pickle.dump(self.parent_map, f)
-
-    def load_state(self, faiss_path, chunks_path):
-        self.index, self.child_chunks = load_rag_state(faiss_path, chunks_path)
-        # Infer parent path
-        base = os.path.dirname(chunks_path)
-        doc_id = os.path.basename(chunks_path).split("_")[1].split(".")[0]
-        parent_path = os.path.join(base, f"{doc_id}_parents.pkl")
-        if os.path.exists(parent_path):
-            with open(parent_path, "rb") as f:
-                self.parent_map = pickle.load(f)
-
-    def search(self, query, top_k=5):
-        query_emb = self.embedding_model.encode([query])
-        D, I = self.index.search(np.array(query_emb).astype("float32"), top_k * 3)
+    @property
+    def is_loaded(self):
+        return self._pending_state is None
 
+    def _ensure_loaded(self):
+        if self._pending_state is None:
+            return
+        with self._load_lock:
+            if self._pending_state is None:
+                return  # Another thread finished loading while we waited
+            faiss_path, chunks_path, mmap = self._pending_state
+
+            self.index, self.store = load_rag_state(faiss_path, chunks_path, mmap=mmap)
+            self.lexical_index = load_lexical_index(faiss_path)
+            self.index_info = load_index_params(faiss_path)
+            apply_search_params(self.index, self.index_info)
+
+            self._pending_state = None
+
+    def _dense_candidates(self, query_embs, k):
+        """One FAISS call for all query rows; returns [(child_ids, scores)] per row."""
+        D, I = self.index.search(query_embs, k)
+        hits = []
+        for d, i in zip(D, I):
+            valid = i >= 0
+            # MiniLM embeddings are unit-normalized, so squared L2 maps onto cosine
+            hits.append((i[valid], 1.0 - d[valid] / 2.0))
+        return hits
+
+    def _child_candidates(self, query, dense, k, mode, fusion):
+        """
+        Returns child indices with their scores (higher is better), best first.
+        `dense` is this query's row from _dense_candidates (None in sparse mode).
+        """
+        if mode == "sparse":
+            return self.lexical_index.search(query, k)
+
+        if mode == "dense":
+            return dense
+
+        sparse = self.lexical_index.search(query, k)
+        if fusion == "weighted":
+            return weighted_fusion(dense, sparse, alpha=HYBRID_ALPHA)
+        return reciprocal_rank_fusion([dense[0], sparse[0]], k=RRF_K)
+
+    def _aggregate_parents(self, child_ids, child_scores, pooling):
+        """
+        Pools child scores per parent in numpy via the store's child_parent array.
+        Returns (parent_ids, parent_scores), best first.
+        """
+        in_range = (child_ids >= 0) & (child_ids < self.store.num_children)
+        child_ids, child_scores = child_ids[in_range], child_scores[in_range]
+        parents = np.asarray(self.store.child_parent)[child_ids]
+        has_parent = parents >= 0
+        parents, child_scores = parents[has_parent], child_scores[has_parent]
+
+        if len(parents) == 0:
+            return parents, child_scores
+
+        unique, inverse = np.unique(parents, return_inverse=True)
+        if pooling == "sum":
+            pooled = np.bincount(inverse, weights=child_scores, minlength=len(unique))
+        else:
+            pooled = np.full(len(unique), -np.inf)
+            np.maximum.at(pooled, inverse, child_scores)
+
+        order = np.argsort(-pooled, kind="stable")
+        return unique[order], pooled[order]
+
+    @staticmethod
+    def encode_queries(queries):
+        """Embeds all queries in one call (the embedder is shared by every pipeline)."""
+        return np.asarray(get_embedder().encode(list(queries)), dtype="float32")
+
+    def search(self, query, top_k=5, mode=None, fusion=None, pooling=None, query_emb=None):
+        """
+        Returns up to top_k (parent_chunk, score) pairs, best first.
+        Scores are similarities (higher is better) whose scale depends on mode.
+        """
+        query_embs = None if query_emb is None else np.asarray(query_emb, dtype="float32").reshape(1, -1)
+        return self.search_batch(
+            [query], top_k=top_k, mode=mode, fusion=fusion, pooling=pooling, query_embs=query_embs
+        )[0]
+
+    def search_batch(self, queries, top_k=5, mode=None, fusion=None, pooling=None, query_embs=None):
+        """
+        Searches several queries at once and returns one result list per query.
+
+        Queries are embedded in one call (unless query_embs is given) and each
+        candidate round is a single FAISS search over all pending queries.
+        Starts from top_k * CANDIDATE_FACTOR children and doubles the candidate
+        set for the queries that haven't yet found top_k distinct parents.
+        """
+        mode = mode or RETRIEVAL_MODE
+        fusion = fusion or HYBRID_FUSION
+        pooling = pooling or PARENT_POOLING
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+
+        self._ensure_loaded()
+        if self.lexical_index is None:
+            mode = "dense"  # Indexed before hybrid retrieval existed
+
+        results = [[] for _ in queries]
+        total = self.store.num_children
+        if total == 0 or not queries:
+            return results
+        if mode != "sparse" and query_embs is None:
+            query_embs = self.encode_queries(queries)
+
+        k = min(max(top_k * CANDIDATE_FACTOR, 1), total)
+        pending = list(range(len(queries)))
+        while pending:
+            dense = None
+            if mode != "sparse":
+                dense = self._dense_candidates(query_embs[pending], k)
+
+            widen = []
+            for row, qi in enumerate(pending):
+                ids, scores = self._child_candidates(
+                    queries[qi], dense[row] if dense else None, k, mode, fusion
+                )
+                parent_ids, parent_scores = self._aggregate_parents(ids, scores, pooling)
+                # Done once we have enough parents, or the candidate source ran dry
+                if len(parent_ids) >= top_k or k >= total or len(ids) < k:
+                    results[qi] = self._parent_results(parent_ids[:top_k], parent_scores[:top_k])
+                else:
+                    widen.append(qi)
+            pending = widen
+            k = min(k * 2, total)
+
+        return results
+
+    def _parent_results(self, parent_ids, parent_scores):
         results = []
-        seen_parents = set()
-
-        for dist, idx in zip(D[0], I[0]):
-            if idx < len(self.child_chunks):
-                child = self.child_chunks[idx]
-                if child.parent_id and child.parent_id in self.parent_map:
-                    if child.parent_id not in seen_parents:
-                        parent = self.parent_map[child.parent_id]
-                        results.append((parent, float(dist)))
-                        seen_parents.add(child.parent_id)
-                if len(results) >= top_k:
-                    break
+        for pid, score in zip(parent_ids, parent_scores):
+            parent = self.store.parent(int(pid))
+            parent.metadata["doc_id"] = self.doc_id
+            results.append((parent, float(score)))
         return results
 
-    def query_multiple(self, question, pipelines, top_k=5):
+    def retrieve_multiple(self, question, pipelines, top_k=5, mode=None, rerank=None):
+        """
+        Returns (top_results, timings). With reranking, a larger pool is pulled
+        from every document and rescored by the cross-encoder before cutting
+        to top_k; timings holds per-stage milliseconds.
+        """
+        return self.retrieve_batch([question], pipelines, top_k=top_k, mode=mode, rerank=rerank)[0]
+
+    def retrieve_batch(self, questions, pipelines, top_k=5, mode=None, rerank=None):
+        """
+        Batched retrieve_multiple: one encode call for all questions and one
+        search_batch per document. Returns [(top_results, timings)] per question.
+        """
+        rerank = RERANK_ENABLED if rerank is None else rerank
+        per_doc = 3
+        if rerank:
+            per_doc = max(per_doc, RERANK_MAX_CANDIDATES // max(len(pipelines), 1))
+
+        start = time.perf_counter()
+        query_embs = None
+        if (mode or RETRIEVAL_MODE) != "sparse":
+            query_embs = self.encode_queries(questions)
+        embed_ms = _elapsed_ms(start)
+
+        # Cold (lazy / mmap) documents load first: disk reads don't count against the search deadline
+        start = time.perf_counter()
+        self._load_all(pipelines)
+        load_ms = _elapsed_ms(start)
+
         # Gather results from all docs
-        all_results = []
-        for p in pipelines:
-            all_results.extend(p.search(question, top_k=3))
+        start = time.perf_counter()
+        all_results = [[] for _ in questions]
+        per_pipeline, timed_out = self._fan_out(pipelines, questions, per_doc, mode, query_embs)
+        for doc_results in per_pipeline:
+            for i, results in enumerate(doc_results):
+                all_results[i].extend(results)
+        retrieve_ms = _elapsed_ms(start)
+
+        batch = []
+        for question, results in zip(questions, all_results):
+            # Sort globally by score (similarity, higher is better)
+            results.sort(key=lambda x: x[1], reverse=True)
+            timings = {"embed_ms": embed_ms, "load_ms": load_ms, "retrieve_ms": retrieve_ms}
+            if timed_out:
+                timings["partial"] = True
+                timings["timed_out_docs"] = timed_out
+            if len(questions) > 1:
+                timings["batch_size"] = len(questions)
+
+            if not rerank:
+                batch.append((results[:top_k], timings))
+                continue
 
-        # Sort globally by score (distance)
-        all_results.sort(key=lambda x: x[1])
-        top_results = all_results[:top_k]
+            start = time.perf_counter()
+            top_results, info = get_reranker().rerank(question, results, top_k)
+            timings["rerank_ms"] = _elapsed_ms(start)
+            timings["rerank"] = info
+            batch.append((top_results, timings))
+        return batch
 
+    @staticmethod
+    def _load_all(pipelines):
+        """Loads every lazily loaded document in parallel, with no deadline."""
+        cold = [p for p in pipelines if not p.is_loaded]
+        # A failed load is raised again by that document's search
+        wait([_search_pool.submit(p._ensure_loaded) for p in cold])
+
+    @staticmethod
+    def _fan_out(pipelines, questions, per_doc, mode, query_embs):
+        """
+        Runs search_batch on every document in parallel (FAISS releases the
+        GIL) under a SEARCH_DEADLINE_MS deadline. Returns (per-document result
+        lists for the documents that finished, doc ids that timed out).
+        """
+        def search(p):
+            return p.search_batch(questions, top_k=per_doc, mode=mode, query_embs=query_embs)
+
+        # A single document goes through the pool too, so the deadline always applies
+        futures = {_search_pool.submit(search, p): p for p in pipelines}
+        # The deadline is per question, so a batch gets proportionally longer
+        done, not_done = wait(futures, timeout=SEARCH_DEADLINE_MS * len(questions) / 1000)
+        timed_out = []
+        for future in not_done:
+            # Already-running searches finish in the background
+            future.cancel()
+            timed_out.append(futures[future].doc_id)
+        if timed_out:
+            metrics.observe("query_search_timeouts", len(timed_out))
+            print(f"⚠️ Search deadline ({SEARCH_DEADLINE_MS:.0f} ms) exceeded for docs {timed_out}")
+
+        # A failing document is an error, as it was when searched sequentially
+        return [f.result() for f in futures if f in done], timed_out
+
+    @staticmethod
+    def pack_context(question, top_results, timings):
+        """Fits the retrieved parents into the LLM token budget (see context_packing.py)."""
+        if not CONTEXT_PACKING:
+            return top_results
+        start = time.perf_counter()
+        packed, stats = ContextPacker(get_token_counter(LLM_MODEL)).pack(question, top_results)
+        timings["pack_ms"] = _elapsed_ms(start)
+        timings["context"] = stats
+        metrics.observe("query_context_tokens", stats["context_tokens"])
+        return packed
+
+    @staticmethod
+    def _record_timings(timings):
+        for stage, value in timings.items():
+            if stage.endswith("_ms"):
+                metrics.observe(f"query_{stage}", value)
+
+    @staticmethod
+    def build_prompt(question, top_results):
         # Build Context
         context = ""
         for chunk, score in top_results:
             context += f"SOURCE: {chunk.source}\nCONTENT: {chunk.text}\n\n---\n\n"
 
+        return f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer using the context provided."
+
+    @staticmethod
+    def format_results(top_results):
+        # doc_id + chunk_id (parent row in that document's chunk store) are what history stores
+        return [
+            {
+                "text": c.text,
+                "source": c.source,
+                "page": c.page,
+                "doc_id": c.metadata.get("doc_id"),
+                "chunk_id": c.chunk_id,
+                "score": round(float(s), 4),
+            }
+            for c, s in top_results
+        ]
+
+    @staticmethod
+    def _deadline_error(top_results, timings):
+        """Error result when the search deadline left nothing to answer from (no LLM call)."""
+        if top_results or not timings.get("partial"):
+            return None
+        return {
+            "error": f"Search deadline ({SEARCH_DEADLINE_MS:.0f} ms) exceeded for every document",
+            "partial": True,
+            "timings": timings,
+        }
+
+    def answer(self, question, top_results, timings):
+        """Generates the answer for already-retrieved results (one LLM call)."""
+        error = self._deadline_error(top_results, timings)
+        if error:
+            return error
+
+        # Sources shown to the user stay the unpacked parents
+        prompt = self.build_prompt(
+            question, self.pack_context(question, top_results, timings)
+        )
+
         # Generate
-        prompt = f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer using the context provided."
         try:
+            start = time.perf_counter()
             resp = self.client.create_chat_completion(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",  # Update model as needed
+                model=LLM_MODEL,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.1,
                 max_tokens=1024,
             )
             answer = resp.choices[0].message.content
+            if getattr(resp, "error", False):
+                # The client's (or coalesced leader's) error message, not an answer to record
+                return {"error": answer}
+            timings["generate_ms"] = _elapsed_ms(start)
+            self._record_timings(timings)
 
             return {
                 "response": answer,
-                "results": [
-                    {"text": c.text, "source": c.source, "page": c.page}
-                    for c, s in top_results
-                ],
+                "results": self.format_results(top_results),
+                # True when some documents missed the search deadline
+                "partial": timings.get("partial", False),
+                "timings": timings,
             }
         except Exception as e:
             return {"error": str(e)}
+
+    def query_multiple(self, question, pipelines, top_k=5, mode=None, rerank=None):
+        top_results, timings = self.retrieve_multiple(
+            question, pipelines, top_k=top_k, mode=mode, rerank=rerank
+        )
+        return self.answer(question, top_results, timings)
+
+    def query_batch(self, questions, pipelines, top_k=5, mode=None, rerank=None, max_concurrency=None):
+        """
+        Answers a list of questions: batched retrieval, then LLM calls with at
+        most max_concurrency (BATCH_LLM_CONCURRENCY) in flight.
+        Yields (index, result) in completion order; result is shaped like
+        query_multiple's return value.
+        """
+        retrieved = self.retrieve_batch(questions, pipelines, top_k=top_k, mode=mode, rerank=rerank)
+        workers = max(1, min(max_concurrency or BATCH_LLM_CONCURRENCY, len(questions)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-llm") as pool:
+            futures = {
+                pool.submit(self.answer, question, top_results, timings): i
+                for i, (question, (top_results, timings)) in enumerate(zip(questions, retrieved))
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def stream_query_multiple(self, question, pipelines, top_k=5, mode=None, rerank=None):
+        """
+        Streaming variant of query_multiple.
+        Yields (event, payload) tuples:
+            ("sources", [result dicts])  - once, before generation starts
+            ("token", str)               - for every text delta from the LLM
+            ("done", {"response", "results", "timings"}) or ("error", {"error"})
+        """
+        top_results, timings = self.retrieve_multiple(
+            question, pipelines, top_k=top_k, mode=mode, rerank=rerank
+        )
+        error = self._deadline_error(top_results, timings)
+        if error:
+            yield "error", error
+            return
+
+        results = self.format_results(top_results)
+        yield "sources", results
+
+        prompt = self.build_prompt(
+            question, self.pack_context(question, top_results, timings)
+        )
+        parts = []
+        start = time.perf_counter()
+        try:
+            for delta in self.client.stream_chat_completion(
+                model=LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.1,
+                max_tokens=1024,
+            ):
+                parts.append(delta)
+                yield "token", delta
+        except Exception as e:
+            yield "error", {"error": str(e)}
+            return
+
+        timings["generate_ms"] = _elapsed_ms(start)
+        self._record_timings(timings)
+        yield "done", {
+            "response": "".join(parts),
+            "results": results,
+            "partial": timings.get("partial", False),
+            "timings": timings,
+        }
@@ -0,0 +1,145 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from src.core.data_models import Chunk
+
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "False") == "True"
+RERANK_MODEL_ID = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Upper bound on (query, chunk) pairs scored per query
+RERANK_MAX_CANDIDATES = int(os.environ.get("RERANK_MAX_CANDIDATES", "20"))
+# If scoring takes longer than this, keep the vector order instead
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", "400"))
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", "8"))
+RERANK_CACHE_SIZE = int(os.environ.get("RERANK_CACHE_SIZE", "20000"))
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """
+    Rescores retrieved parent chunks with a small CPU cross-encoder.
+
+    Raw L2/RRF scores from different documents aren't comparable; a
+    cross-encoder reads query and chunk together and gives one calibrated
+    relevance score. Scores are cached per (query, chunk text), and work is
+    done in small batches so the latency budget can be enforced mid-way.
+    """
+
+    def __init__(
+        self,
+        model_id: str = RERANK_MODEL_ID,
+        max_candidates: int = RERANK_MAX_CANDIDATES,
+        budget_ms: float = RERANK_BUDGET_MS,
+        batch_size: int = RERANK_BATCH_SIZE,
+        cache_size: int = RERANK_CACHE_SIZE,
+    ):
+        self.model_id = model_id
+        self.max_candidates = max_candidates
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Moving average of one batch's scoring time, to know whether the next one fits the budget
+        self._batch_ms: Optional[float] = None
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    print(f"Loading reranker {self.model_id}...")
+                    self._model = CrossEncoder(self.model_id, device="cpu", max_length=512)
+        return self._model
+
+    def _cache_get(self, key) -> Optional[float]:
+        with self._cache_lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _cache_put(self, key, score: float):
+        with self._cache_lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def rerank(
+        self, query: str, candidates: List[Tuple[Chunk, float]], top_k: int
+    ) -> Tuple[List[Tuple[Chunk, float]], Dict]:
+        """
+        Args:
+            candidates: (chunk, vector_score) pairs, already in vector order.
+
+        Returns:
+            (top_k (chunk, rerank_score) pairs, info) where info reports
+            cache hits, pairs scored and whether the budget forced a fallback
+            to vector order.
+        """
+        pool = candidates[: self.max_candidates]
+        # The model scores exactly what the cache is keyed on
+        query = " ".join(query.split())
+        query_key = _text_key(query)
+        keys = [(query_key, _text_key(chunk.text)) for chunk, _ in pool]
+
+        scores = [self._cache_get(key) for key in keys]
+        misses = [i for i, score in enumerate(scores) if score is None]
+        info = {"pool": len(pool), "cache_hits": len(pool) - len(misses), "scored": 0, "fallback": False}
+
+        if misses:
+            model = self._get_model()  # One-off load time doesn't count against the budget
+            start = time.perf_counter()
+            for b in range(0, len(misses), self.batch_size):
+                # Don't start a batch that is expected to end past the budget
+                if _elapsed_ms(start) + (self._batch_ms or 0.0) > self.budget_ms:
+                    info["fallback"] = True
+                    break
+                batch = misses[b : b + self.batch_size]
+                batch_start = time.perf_counter()
+                batch_scores = model.predict([(query, pool[i][0].text) for i in batch])
+                batch_ms = _elapsed_ms(batch_start)
+                self._batch_ms = batch_ms if self._batch_ms is None else 0.8 * self._batch_ms + 0.2 * batch_ms
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+                    self._cache_put(keys[i], scores[i])
+                info["scored"] += len(batch)
+                # A batch that overran anyway: its scores are cached but not used
+                if _elapsed_ms(start) > self.budget_ms:
+                    info["fallback"] = True
+                    break
+
+        if info["fallback"]:
+            # Scores computed so far stay cached, so a retry is cheaper
+            return candidates[:top_k], info
+
+        ranked = sorted(zip(pool, scores), key=lambda x: x[1], reverse=True)
+        return [(chunk, score) for (chunk, _), score in ranked[:top_k]], info
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Process-wide reranker (the model and score cache are shared)."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = CrossEncoderReranker()
+    return _reranker
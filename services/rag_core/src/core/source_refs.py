@@ -0,0 +1,129 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from src.core.chunk_store import ChunkStore
+
+# Chunk stores kept open (memory-mapped) for hydrating history sources
+SOURCE_STORE_CACHE_SIZE = int(os.environ.get("SOURCE_STORE_CACHE_SIZE", "32"))
+# Start of the text kept in each reference: shown once no chunk store has it
+SOURCE_REF_PREVIEW_CHARS = int(os.environ.get("SOURCE_REF_PREVIEW_CHARS", "200"))
+
+
+def is_reference(source: Dict) -> bool:
+    return "text" not in source and source.get("doc_id") is not None and source.get("chunk_id") is not None
+
+
+def compact_sources(sources: List[Dict], docs: Optional[Dict[int, Dict]] = None) -> List[Dict]:
+    """
+    What a query record stores: {"doc_id", "chunk_id", "score"} for results
+    that point at a parent chunk in a document's chunk store. Results
+    without those ids (nothing to hydrate them from) are kept whole.
+
+    With docs ({doc_id: document row}), a reference also records where the
+    chunk lives (chunks_path, content_hash) and a short preview, so it still
+    resolves once that document row is replaced or deleted.
+    """
+    docs = docs or {}
+    compact = []
+    for src in sources:
+        if src.get("doc_id") is not None and src.get("chunk_id") is not None:
+            ref = {"doc_id": src["doc_id"], "chunk_id": src["chunk_id"], "score": src.get("score")}
+            doc = docs.get(src["doc_id"])
+            if doc:
+                ref.update(
+                    chunks_path=doc.get("chunks_path"),
+                    content_hash=doc.get("content_hash"),
+                    source=src.get("source"),
+                    page=src.get("page"),
+                    preview=(src.get("text") or "")[:SOURCE_REF_PREVIEW_CHARS],
+                )
+            compact.append(ref)
+        else:
+            compact.append(src)
+    return compact
+
+
+def open_chunk_store(chunks_path: str) -> ChunkStore:
+    if os.path.isdir(chunks_path):
+        return ChunkStore.open(chunks_path, mmap=True)
+    from src.core.persistence import load_legacy_chunks
+
+    return load_legacy_chunks(chunks_path)
+
+
+class SourceHydrator:
+    """
+    Turns stored source references back into {"text", "source", "page", ...}
+    by reading the parent chunk from a chunk store: the document's, else the
+    one recorded in the reference (kept while history points at it, see
+    DatabaseManager.chunk_store_referenced), else that of another document
+    with the same bytes. When none has it, the source comes back with its
+    stored preview as text and "unavailable": True.
+    """
+
+    def __init__(self, db, cache_size: int = SOURCE_STORE_CACHE_SIZE):
+        self.db = db
+        self.cache_size = cache_size
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _store(self, chunks_path: str) -> ChunkStore:
+        with self._lock:
+            store = self._stores.get(chunks_path)
+            if store is not None:
+                self._stores.move_to_end(chunks_path)
+                return store
+        store = open_chunk_store(chunks_path)
+        with self._lock:
+            self._stores[chunks_path] = store
+            while len(self._stores) > self.cache_size:
+                self._stores.popitem(last=False)
+        return store
+
+    def _candidate_paths(self, src: Dict, doc: Optional[Dict]) -> List[str]:
+        paths = [doc.get("chunks_path") if doc else None, src.get("chunks_path")]
+        if not doc and src.get("content_hash"):
+            paths += [d.get("chunks_path") for d in self.db.get_documents_by_hash(src["content_hash"])]
+        return list(dict.fromkeys(p for p in paths if p))
+
+    def _read_parent(self, src: Dict, doc: Optional[Dict]):
+        preview = src.get("preview")
+        for chunks_path in self._candidate_paths(src, doc):
+            try:
+                parent = self._store(chunks_path).parent(int(src["chunk_id"]))
+            except Exception:
+                continue
+            # Another store (e.g. same bytes, other vision model) may number its chunks differently
+            if preview is None or parent.text.startswith(preview):
+                return parent
+        return None
+
+    def hydrate(self, sources: List[Dict]) -> List[Dict]:
+        docs = {}
+        hydrated = []
+        for src in sources:
+            if not is_reference(src):
+                hydrated.append(src)  # Legacy row with the full text inline
+                continue
+
+            doc_id = src["doc_id"]
+            if doc_id not in docs:
+                docs[doc_id] = self.db.get_document(doc_id)
+            doc = docs[doc_id]
+            ref = {k: src[k] for k in ("doc_id", "chunk_id", "score") if k in src}
+            parent = self._read_parent(src, doc)
+            if parent is not None:
+                hydrated.append({"text": parent.text, "source": parent.source, "page": parent.page, **ref})
+            else:
+                hydrated.append(
+                    {
+                        "text": src.get("preview", ""),
+                        "source": src.get("source") or (doc["original_filename"] if doc else "Unknown"),
+                        "page": src.get("page"),
+                        "unavailable": True,
+                        **ref,
+                    }
+                )
+        return hydrated
@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import asyncio
+import time
+import uuid
+import hashlib
+from typing import AsyncIterator, Dict, Optional
+
+# Bytes read/written per step when streaming uploads to disk
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# Unfinished resumable uploads older than this are discarded
+UPLOAD_PARTIAL_TTL_S = float(os.environ.get("UPLOAD_PARTIAL_TTL_S", "86400"))
+
+_SHA256_HEX = re.compile(r"[0-9a-f]{64}")
+
+
+class UploadError(Exception):
+    """A resumable upload request that doesn't match the upload's state."""
+
+    def __init__(self, message: str, offset: Optional[int] = None):
+        super().__init__(message)
+        self.offset = offset
+
+
+def file_sha256(path: str, chunk_bytes: int = UPLOAD_CHUNK_BYTES) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_bytes), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class UploadStore:
+    """
+    Content-addressed upload storage.
+
+    Files are streamed to disk in UPLOAD_CHUNK_BYTES blocks while hashing
+    and land at <upload_dir>/<sha256>/<filename>, so two different files
+    with the same name never overwrite each other and identical bytes are
+    stored once. Large files can instead be sent as a resumable upload:
+    start() -> append() at the returned offset (repeat / resume after a
+    dropped connection) -> complete(). Disk writes and hashing run in
+    worker threads so a large upload never blocks the event loop.
+    """
+
+    def __init__(self, upload_dir: str, chunk_bytes: int = UPLOAD_CHUNK_BYTES):
+        self.upload_dir = upload_dir
+        self.chunk_bytes = chunk_bytes
+        self.partial_dir = os.path.join(upload_dir, ".partial")
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def _store(self, tmp_path: str, sha256: str, filename: str, size: int) -> Dict:
+        """Moves a finished temp file to its content-addressed location."""
+        name = os.path.basename(filename)
+        dest_dir = os.path.join(self.upload_dir, sha256)
+        dest = os.path.join(dest_dir, name)
+        duplicate = os.path.exists(dest)
+        if duplicate:
+            os.remove(tmp_path)
+        else:
+            os.makedirs(dest_dir, exist_ok=True)
+            os.replace(tmp_path, dest)
+        return {
+            "filename": f"{sha256}/{name}",  # What /process expects
+            "original_filename": name,
+            "path": dest,
+            "sha256": sha256,
+            "size": size,
+            "duplicate": duplicate,
+        }
+
+    def content_hash(self, path: str) -> Optional[str]:
+        """The sha256 a content-addressed upload path (<upload_dir>/<sha256>/<name>) carries, else None."""
+        rel = os.path.relpath(os.path.realpath(path), os.path.realpath(self.upload_dir))
+        parts = rel.split(os.sep)
+        if len(parts) == 2 and _SHA256_HEX.fullmatch(parts[0]):
+            return parts[0]
+        return None
+
+    async def save_stream(self, filename: str, read) -> Dict:
+        """Streams an UploadFile-like object (async read(n)) to disk."""
+        tmp_path = os.path.join(self.partial_dir, f"{uuid.uuid4().hex}.tmp")
+        h, size = hashlib.sha256(), 0
+
+        def write(out, block):
+            h.update(block)
+            out.write(block)
+
+        try:
+            with open(tmp_path, "wb") as out:
+                while True:
+                    block = await read(self.chunk_bytes)
+                    if not block:
+                        break
+                    await asyncio.to_thread(write, out, block)
+                    size += len(block)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return await asyncio.to_thread(self._store, tmp_path, h.hexdigest(), filename, size)
+
+    # --- Resumable uploads ---
+
+    def _paths(self, upload_id: str):
+        if not upload_id.isalnum():
+            raise UploadError("Invalid upload id")
+        base = os.path.join(self.partial_dir, upload_id)
+        return f"{base}.json", f"{base}.part"
+
+    def _state(self, upload_id: str) -> Dict:
+        meta_path, part_path = self._paths(upload_id)
+        if not os.path.exists(meta_path):
+            raise KeyError(upload_id)
+        with open(meta_path) as f:
+            state = json.load(f)
+        state["offset"] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        return state
+
+    def start(self, filename: str, size: int, sha256: Optional[str] = None) -> Dict:
+        self.prune()
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._paths(upload_id)
+        state = {
+            "upload_id": upload_id,
+            "filename": os.path.basename(filename),
+            "size": size,
+            "sha256": sha256,
+            "created_at": time.time(),
+        }
+        with open(meta_path, "w") as f:
+            json.dump(state, f)
+        open(part_path, "wb").close()
+        return {**state, "offset": 0}
+
+    def status(self, upload_id: str) -> Dict:
+        return self._state(upload_id)
+
+    async def append(self, upload_id: str, offset: int, blocks: AsyncIterator[bytes]) -> Dict:
+        """
+        Appends a request body at offset. The offset must equal the bytes
+        already received, so a client resumes from status()["offset"].
+        """
+        state = await asyncio.to_thread(self._state, upload_id)
+        if offset != state["offset"]:
+            raise UploadError("Offset mismatch", offset=state["offset"])
+
+        _, part_path = self._paths(upload_id)
+        received = state["offset"]
+        with open(part_path, "ab") as out:
+            async for block in blocks:
+                received += len(block)
+                if received > state["size"]:
+                    out.truncate(state["offset"])
+                    raise UploadError("Upload exceeds declared size", offset=state["offset"])
+                await asyncio.to_thread(out.write, block)
+        state["offset"] = received
+        return state
+
+    def complete(self, upload_id: str) -> Dict:
+        state = self._state(upload_id)
+        if state["offset"] != state["size"]:
+            raise UploadError(
+                f"Upload incomplete: {state['offset']}/{state['size']} bytes", offset=state["offset"]
+            )
+
+        meta_path, part_path = self._paths(upload_id)
+        sha256 = file_sha256(part_path, self.chunk_bytes)
+        if state.get("sha256") and state["sha256"] != sha256:
+            os.remove(part_path)
+            os.remove(meta_path)
+            raise UploadError("Checksum mismatch, upload discarded")
+
+        result = self._store(part_path, sha256, state["filename"], state["size"])
+        os.remove(meta_path)
+        return result
+
+    def prune(self, ttl_s: float = UPLOAD_PARTIAL_TTL_S):
+        """Drops abandoned resumable uploads."""
+        cutoff = time.time() - ttl_s
+        for name in os.listdir(self.partial_dir):
+            base, ext = os.path.splitext(name)
+            if ext == ".part":
+                continue  # Removed with its .json
+            paths = [os.path.join(self.partial_dir, name)]
+            if ext == ".json":
+                paths.append(os.path.join(self.partial_dir, f"{base}.part"))
+            try:
+                # An upload is idle once its last appended byte is old
+                if max(os.path.getmtime(p) for p in paths if os.path.exists(p)) < cutoff:
+                    for p in paths:
+                        if os.path.exists(p):
+                            os.remove(p)
+            except (OSError, ValueError):
+                pass
@@ -0,0 +1,151 @@
+import os
+import json
+import math
+import faiss
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+# "auto" picks a type from the vector count; any key of INDEX_FACTORIES forces one
+VECTOR_INDEX_TYPE = os.environ.get("VECTOR_INDEX_TYPE", "auto")
+# Search-time overrides (take precedence over the values saved at build time)
+FAISS_NPROBE = os.environ.get("FAISS_NPROBE")
+FAISS_EF_SEARCH = os.environ.get("FAISS_EF_SEARCH")
+
+# Auto-selection thresholds (number of child vectors in the collection)
+FLAT_MAX_VECTORS = int(os.environ.get("FLAT_MAX_VECTORS", "20000"))
+HNSW_MAX_VECTORS = int(os.environ.get("HNSW_MAX_VECTORS", "250000"))
+
+# faiss.index_factory descriptions; {nlist}/{m}/{M} are filled by _build_params
+INDEX_FACTORIES = {
+    "flat": "Flat",
+    "sq8": "SQ8",
+    "hnsw": "HNSW{M},Flat",
+    "ivf_flat": "IVF{nlist},Flat",
+    "ivf_sq8": "IVF{nlist},SQ8",
+    "ivf_pq": "IVF{nlist},PQ{m}x8",
+}
+# Index types that store the vectors as given (reconstruct() returns them unchanged)
+EXACT_INDEX_TYPES = ("flat", "hnsw", "ivf_flat")
+
+# k-means wants ~39 training points per centroid; PQ needs 256 per sub-quantizer
+MIN_POINTS_PER_CENTROID = 39
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """Brute force is fastest for small docs; graph, then compressed IVF as they grow."""
+    if num_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if num_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def _build_params(index_type: str, num_vectors: int, dim: int) -> Dict:
+    if index_type == "hnsw":
+        return {"M": 32, "efConstruction": 200, "efSearch": 64}
+
+    if index_type.startswith("ivf"):
+        nlist = int(4 * math.sqrt(num_vectors))
+        nlist = max(1, min(nlist, num_vectors // MIN_POINTS_PER_CENTROID))
+        params = {"nlist": nlist, "nprobe": max(1, nlist // 16)}
+        if index_type == "ivf_pq":
+            # 8 dims per sub-quantizer; 384 -> 48 bytes per vector
+            params["m"] = next(m for m in (dim // 8, dim // 4, dim // 2, 1) if m and dim % m == 0)
+        return params
+
+    return {}
+
+
+def _min_training_points(index_type: str, params: Dict) -> int:
+    if index_type == "ivf_pq":
+        return max(params["nlist"] * MIN_POINTS_PER_CENTROID, 256 * MIN_POINTS_PER_CENTROID)
+    if index_type.startswith("ivf"):
+        return params["nlist"] * MIN_POINTS_PER_CENTROID
+    return 0
+
+
+def build_vector_index(
+    embeddings: np.ndarray,
+    index_type: Optional[str] = None,
+    params: Optional[Dict] = None,
+) -> Tuple[faiss.Index, Dict]:
+    """
+    Builds (and trains, if needed) a FAISS index over the given embeddings.
+
+    Args:
+        embeddings: float32 array of shape (n, dim).
+        index_type: One of INDEX_FACTORIES, "auto", or None for VECTOR_INDEX_TYPE.
+        params: Overrides for the default build/search parameters.
+
+    Returns:
+        (index, index_info) where index_info records the type, factory string,
+        build parameters and search parameters so the index can be re-tuned on load.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    num_vectors, dim = embeddings.shape
+    index_type = index_type or VECTOR_INDEX_TYPE
+    if index_type == "auto":
+        index_type = choose_index_type(num_vectors)
+    if index_type not in INDEX_FACTORIES:
+        raise ValueError(f"Unknown vector index type: {index_type}")
+
+    build_params = _build_params(index_type, num_vectors, dim)
+    build_params.update(params or {})
+
+    if num_vectors < _min_training_points(index_type, build_params):
+        print(f"⚠️ {num_vectors} vectors is too few to train {index_type}; using flat index")
+        index_type, build_params = "flat", {}
+
+    factory = INDEX_FACTORIES[index_type].format(**build_params)
+    index = faiss.index_factory(dim, factory, faiss.METRIC_L2)
+
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = build_params["efConstruction"]
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+
+    info = {
+        "type": index_type,
+        "factory": factory,
+        "dim": dim,
+        "num_vectors": num_vectors,
+        "params": build_params,
+    }
+    apply_search_params(index, info)
+    return index, info
+
+
+def apply_search_params(index: faiss.Index, info: Optional[Dict] = None):
+    """
+    Applies search-time knobs (nprobe for IVF, efSearch for HNSW).
+    Environment overrides win over the values saved with the index.
+    """
+    params = dict((info or {}).get("params", {}))
+    if FAISS_NPROBE:
+        params["nprobe"] = int(FAISS_NPROBE)
+    if FAISS_EF_SEARCH:
+        params["efSearch"] = int(FAISS_EF_SEARCH)
+
+    if "nprobe" in params:
+        try:
+            faiss.extract_index_ivf(index).nprobe = int(params["nprobe"])
+        except RuntimeError:
+            pass  # Not an IVF index
+
+    if "efSearch" in params:
+        hnsw_index = faiss.downcast_index(index)
+        if hasattr(hnsw_index, "hnsw"):
+            hnsw_index.hnsw.efSearch = int(params["efSearch"])
+
+
+def save_index_info(path: str, info: Dict):
+    with open(path, "w") as f:
+        json.dump(info, f, indent=2)
+
+
+def load_index_info(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,128 @@
+"""
+Compacts query history: rewrites sources stored as full text into chunk
+references (see source_refs.compact_sources), which the API hydrates from
+the chunk stores on read.
+
+Each inline source is matched to a parent chunk of one of its session's
+documents (same file name, identical text). Sources that match nothing
+(e.g. the document was deleted or re-chunked) are left as they are.
+References written by earlier runs with only {"doc_id", "chunk_id",
+"score"} get the remaining fields while their document is still there.
+
+Usage (from services/rag_core, i.e. /app in the container):
+    python -m src.utils.compact_history            # rewrite rows, then VACUUM
+    python -m src.utils.compact_history --dry-run
+"""
+
+import os
+import argparse
+
+from src.core.source_refs import compact_sources, is_reference, open_chunk_store
+from src.utils.db_utils import DatabaseManager
+
+
+class _SessionIndex:
+    """(file name, parent text) -> (document row, parent id) over a session's documents."""
+
+    def __init__(self, db):
+        self.db = db
+        self._by_session = {}
+        self._stores = {}  # session_id -> {doc_id: (document row, chunk store)}
+
+    def lookup(self, session_id):
+        if session_id not in self._by_session:
+            table, stores = {}, {}
+            for doc in self.db.get_session_documents(session_id):
+                if not doc.get("chunks_path"):
+                    continue
+                try:
+                    store = open_chunk_store(doc["chunks_path"])
+                except Exception as e:
+                    print(f"  ⚠️ doc {doc['id']}: chunk store unreadable ({e})")
+                    continue
+                stores[doc["id"]] = (doc, store)
+                for j in range(store.num_parents):
+                    table.setdefault((store.source, store.parent_text[j]), (doc, j))
+            self._by_session[session_id] = table
+            self._stores[session_id] = stores
+        return self._by_session[session_id]
+
+    def document(self, session_id, doc_id):
+        """(document row, chunk store) of a session's document, or None."""
+        self.lookup(session_id)
+        return self._stores[session_id].get(doc_id)
+
+
+def _complete_reference(index, session_id, ref):
+    """A bare {"doc_id", "chunk_id", "score"} reference with the fields compact_sources adds now."""
+    found = index.document(session_id, ref["doc_id"])
+    if not found:
+        return ref  # Document already gone: nothing to read the fields from
+    doc, store = found
+    try:
+        parent = store.parent(int(ref["chunk_id"]))
+    except Exception:
+        return ref
+    src = {**ref, "text": parent.text, "source": parent.source, "page": parent.page}
+    return compact_sources([src], {doc["id"]: doc})[0]
+
+
+def compact(db, dry_run=False, batch=200):
+    index = _SessionIndex(db)
+    stats = {"rows": 0, "sources": 0, "matched": 0}
+    updates = []
+
+    for query_id, session_id, sources in db.iter_query_sources():
+        todo = [s for s in sources if not is_reference(s) or "chunks_path" not in s]
+        if not todo:
+            continue
+        table = index.lookup(session_id)
+
+        compacted = []
+        for src in sources:
+            if is_reference(src) and "chunks_path" not in src:
+                src = _complete_reference(index, session_id, src)
+            elif not is_reference(src):
+                stats["sources"] += 1
+                match = table.get((os.path.basename(src.get("source") or ""), src.get("text")))
+                if match:
+                    stats["matched"] += 1
+                    doc, chunk_id = match
+                    # Same fields as live references, so it resolves after the document goes
+                    src = compact_sources([{**src, "doc_id": doc["id"], "chunk_id": chunk_id}], {doc["id"]: doc})[0]
+            compacted.append(src)
+
+        if compacted != sources:
+            stats["rows"] += 1
+            updates.append((query_id, compacted))
+        if len(updates) >= batch and not dry_run:
+            db.update_query_sources(updates)
+            updates = []
+
+    if updates and not dry_run:
+        db.update_query_sources(updates)
+
+    print(
+        f"✓ {stats['matched']}/{stats['sources']} inline sources matched to chunks "
+        f"in {stats['rows']} quer{'y' if stats['rows'] == 1 else 'ies'}" + (" (dry run)" if dry_run else "")
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/history.db")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip VACUUM (the file keeps its size)")
+    args = parser.parse_args()
+
+    db = DatabaseManager(db_path=args.db)
+    size_before = os.path.getsize(args.db)
+    compact(db, dry_run=args.dry_run)
+    if not args.dry_run and not args.no_vacuum:
+        db.vacuum()
+        print(f"✓ {args.db}: {size_before / 1e6:.1f} MB -> {os.path.getsize(args.db) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Concurrency stress test for the history database (DatabaseManager).
+
+Runs --threads worker threads in each of --processes processes against one
+SQLite file for --seconds. Workers mix the writes and reads the API does
+(create session, add document, record query, touch/prune the answer
+cache, list sessions, read history) and count every exception. Afterwards
+the row counts are checked against what the workers reported writing.
+
+Usage (from services/rag_core):
+    python -m src.utils.db_stress --threads 16 --processes 2 --seconds 10
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from collections import Counter
+
+from src.utils.db_utils import DatabaseManager
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def worker(db, seed, stop_at, stats, lock):
+    rng = random.Random(seed)
+    local = Counter()
+    latencies = {"write": [], "read": []}
+    session_id = db.create_session([f"stress_{seed}.pdf"])
+    local["sessions"] += 1
+
+    while time.perf_counter() < stop_at:
+        op = rng.random()
+        start = time.perf_counter()
+        try:
+            if op < 0.10:
+                session_id = db.create_session([f"stress_{seed}.pdf"])
+                local["sessions"] += 1
+                kind = "write"
+            elif op < 0.20:
+                db.add_document_record(
+                    "stress.pdf", "stub", "", "", "", {}, session_id, content_hash=f"{seed}"
+                )
+                local["documents"] += 1
+                kind = "write"
+            elif op < 0.45:
+                db.add_query_record(session_id, "q?", "a" * rng.randint(10, 2000), [{"chunk_id": 1}])
+                local["queries"] += 1
+                kind = "write"
+            elif op < 0.50:
+                now = time.time()
+                db.add_cached_answer(session_id, "key", "q?", b"\0" * 1536, "a", [], now)
+                db.prune_cached_answers(now - 3600, 200)
+                kind = "write"
+            elif op < 0.75:
+                db.get_queries_page(session_id, 50)
+                kind = "read"
+            elif op < 0.90:
+                db.get_sessions_page(50)
+                kind = "read"
+            else:
+                db.get_session_documents(session_id)
+                kind = "read"
+            latencies[kind].append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            local[f"error: {type(e).__name__}: {e}"] += 1
+
+    with lock:
+        stats["counts"].update(local)
+        stats["write_ms"].extend(latencies["write"])
+        stats["read_ms"].extend(latencies["read"])
+
+
+def run_process(db_path, threads, seconds, seed, results):
+    db = DatabaseManager(db_path)
+    stats = {"counts": Counter(), "write_ms": [], "read_ms": []}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+    pool = [
+        threading.Thread(target=worker, args=(db, seed * 1000 + i, stop_at, stats, lock))
+        for i in range(threads)
+    ]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    db.close()
+    results.put(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="database file (default: a fresh temp file)")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "stress.db")
+    db = DatabaseManager(db_path)  # Runs migrations once before the workers start
+    before = {t: db.conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("sessions", "documents", "queries")}
+    print(f"DB: {db_path} (schema v{db.schema_version})")
+
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=run_process, args=(db_path, args.threads, args.seconds, p, results))
+        for p in range(args.processes)
+    ]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    merged = {"counts": Counter(), "write_ms": [], "read_ms": []}
+    for _ in procs:
+        stats = results.get()
+        merged["counts"].update(stats["counts"])
+        merged["write_ms"].extend(stats["write_ms"])
+        merged["read_ms"].extend(stats["read_ms"])
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - started
+
+    for kind in ("write", "read"):
+        lat = merged[f"{kind}_ms"]
+        print(
+            f"{kind:<6} {len(lat) / wall:>8.0f} ops/s  p50 {_percentile(lat, 50):6.2f} ms  "
+            f"p99 {_percentile(lat, 99):7.2f} ms  max {max(lat, default=0):7.2f} ms"
+        )
+
+    errors = {k: v for k, v in merged["counts"].items() if k.startswith("error")}
+    ok = not errors
+    for table in ("sessions", "documents", "queries"):
+        rows = db.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] - before[table]
+        expected = merged["counts"][table]
+        ok &= rows == expected
+        print(f"{table:<10} {rows} rows written, {expected} reported {'✓' if rows == expected else '⚠️ MISMATCH'}")
+    for error, count in errors.items():
+        print(f"⚠️ {count}x {error}")
+    integrity = db.conn.execute("PRAGMA integrity_check").fetchone()[0]
+    print(f"integrity_check: {integrity}")
+    print("✓ No errors" if ok and integrity == "ok" else "⚠️ Stress test failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,342 @@
 import sqlite3
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+# Wait this long for another process's write lock before raising "database is locked"
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+
+
+def _add_column(cur, table, column, decl):
+    cols = [row[1] for row in cur.execute(f"PRAGMA table_info({table})").fetchall()]
+    if column not in cols:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _migration_1_base_schema(cur):
+    """Tables as they existed before versioning (idempotent for older databases)."""
+    cur.execute("""CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_name TEXT,
+        timestamp DATETIME
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER,
+        original_filename TEXT,
+        vision_model_used TEXT,
+        timestamp DATETIME,
+        chart_dir TEXT,
+        faiss_index_path TEXT,
+        chunks_path TEXT,
+        chart_descriptions_json TEXT
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS queries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER,
+        question TEXT,
+        response TEXT,
+        sources_json TEXT,
+        timestamp DATETIME
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS answer_cache (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER,
+        cache_key TEXT,
+        question TEXT,
+        embedding BLOB,
+        response TEXT,
+        sources_json TEXT,
+        created_at REAL,
+        last_used REAL,
+        hits INTEGER DEFAULT 0
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS uploads (
+        sha256 TEXT,
+        original_filename TEXT,
+        stored_filename TEXT,
+        size INTEGER,
+        timestamp DATETIME
+    )""")
+    cur.execute("""CREATE TABLE IF NOT EXISTS charts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        doc_id INTEGER,
+        session_id INTEGER,
+        filename TEXT,
+        rel_path TEXT,
+        page INTEGER,
+        bbox_json TEXT,
+        class TEXT,
+        score REAL,
+        width INTEGER,
+        height INTEGER,
+        description TEXT
+    )""")
+
+    # Per-page hashes + crops ({page_key: {"hash", "images", "charts"}}), used to re-ingest revisions
+    _add_column(cur, "documents", "page_manifest_json", "TEXT")
+    # sha256 of the source file, to link duplicate uploads instead of reprocessing
+    _add_column(cur, "documents", "content_hash", "TEXT")
+    # 1 once the document's crops are in the charts table (older rows get backfilled)
+    _add_column(cur, "documents", "charts_indexed", "INTEGER DEFAULT 0")
+    # Thumbnails: sha256 of the crop + [{"rel_path", "width", "height", "format", "bytes"}]
+    _add_column(cur, "charts", "content_hash", "TEXT")
+    _add_column(cur, "charts", "variants_json", "TEXT")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_key ON answer_cache (session_id, cache_key)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_uploads_name ON uploads (original_filename)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_documents_content ON documents (content_hash, vision_model_used)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_charts_session ON charts (session_id, doc_id, page)")
+
+
+def _migration_2_lookup_indexes(cur):
+    """Indexes for the per-session lookups every endpoint does."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_documents_session ON documents (session_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_documents_faiss ON documents (faiss_index_path)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_documents_chart_dir ON documents (chart_dir)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_queries_session ON queries (session_id, timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_timestamp ON sessions (timestamp)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_charts_doc ON charts (doc_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_used ON answer_cache (last_used)")
+
+
+# Schema version N = MIGRATIONS[:N] applied (PRAGMA user_version). Append only.
+MIGRATIONS = [
+    _migration_1_base_schema,
+    _migration_2_lookup_indexes,
+]
+
+
 class DatabaseManager:
+    """
+    History database (sessions, documents, queries, caches).
+
+    Every thread gets its own connection (FastAPI runs sync endpoints on a
+    threadpool), the database runs in WAL mode so readers never block on
+    the writer, and all writes in this process go through one lock
+    (_write) so they never fight over SQLite's single write slot.
+    """
+
     def __init__(self, db_path="data/history.db"):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self._init_db()
 
+    def _connect(self):
+        # Autocommit mode: transactions are explicit (BEGIN IMMEDIATE in _write)
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; safe with WAL
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    @property
+    def conn(self):
+        """This thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Serialized write transaction; commits on success, rolls back on error."""
+        with self._write_lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
     def _init_db(self):
-        cur = self.conn.cursor()
-        cur.execute("""CREATE TABLE IF NOT EXISTS sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_name TEXT,
-            timestamp DATETIME
-        )""")
-        cur.execute("""CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id INTEGER,
-            original_filename TEXT,
-            vision_model_used TEXT,
-            timestamp DATETIME,
-            chart_dir TEXT,
-            faiss_index_path TEXT,
-            chunks_path TEXT,
-            chart_descriptions_json TEXT
-        )""")
-        cur.execute("""CREATE TABLE IF NOT EXISTS queries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id INTEGER,
-            question TEXT,
-            response TEXT,
-            sources_json TEXT,
-            timestamp DATETIME
-        )""")
-        self.conn.commit()
+        with self._write() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(conn.cursor())
+                conn.execute(f"PRAGMA user_version={number}")
+                print(f"✓ History DB migrated to schema v{number} ({migration.__name__})")
+
+    @property
+    def schema_version(self):
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
 
     def create_session(self, filenames):
         name = filenames[0] if len(filenames) == 1 else f"{filenames[0]} + {len(filenames)-1}"
-        cur = self.conn.cursor()
-        cur.execute("INSERT INTO sessions (session_name, timestamp) VALUES (?, ?)", 
-                   (name, datetime.now()))
-        self.conn.commit()
-        return cur.lastrowid
-
-    def add_document_record(self, filename, vision_model, chart_dir, faiss_path, chunks_path, chart_descriptions, session_id):
-        cur = self.conn.cursor()
-        # Ensure chart_descriptions is a string before saving
-        desc_json = json.dumps(chart_descriptions) if isinstance(chart_descriptions, dict) else chart_descriptions
+        with self._write() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO sessions (session_name, timestamp) VALUES (?, ?)", 
+                       (name, datetime.now()))
+            return cur.lastrowid
+
+    def add_document_record(self, filename, vision_model, chart_dir, faiss_path, chunks_path, chart_descriptions, session_id, page_manifest=None, content_hash=None):
+        with self._write() as conn:
+            cur = conn.cursor()
+            # Ensure chart_descriptions is a string before saving
+            desc_json = json.dumps(chart_descriptions) if isinstance(chart_descriptions, dict) else chart_descriptions
         
-        cur.execute("""INSERT INTO documents 
-            (session_id, original_filename, vision_model_used, timestamp, chart_dir, faiss_index_path, chunks_path, chart_descriptions_json)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (session_id, filename, vision_model, datetime.now(), chart_dir, faiss_path, chunks_path, desc_json))
-        self.conn.commit()
-        return cur.lastrowid
+            cur.execute("""INSERT INTO documents 
+                (session_id, original_filename, vision_model_used, timestamp, chart_dir, faiss_index_path, chunks_path, chart_descriptions_json, page_manifest_json, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (session_id, filename, vision_model, datetime.now(), chart_dir, faiss_path, chunks_path, desc_json, json.dumps(page_manifest or {}), content_hash))
+            return cur.lastrowid
 
     def update_document_paths(self, doc_id, faiss_path, chunks_path):
-        self.conn.execute("UPDATE documents SET faiss_index_path=?, chunks_path=? WHERE id=?", 
+        with self._write() as conn:
+            conn.execute("UPDATE documents SET faiss_index_path=?, chunks_path=? WHERE id=?", 
                          (faiss_path, chunks_path, doc_id))
-        self.conn.commit()
 
     def add_query_record(self, session_id, question, response, sources):
-        self.conn.execute("INSERT INTO queries (session_id, question, response, sources_json, timestamp) VALUES (?, ?, ?, ?, ?)",
+        with self._write() as conn:
+            conn.execute("INSERT INTO queries (session_id, question, response, sources_json, timestamp) VALUES (?, ?, ?, ?, ?)",
                          (session_id, question, response, json.dumps(sources), datetime.now()))
-        self.conn.commit()
 
-    def get_all_sessions(self):
-        return self.conn.execute("SELECT s.id, s.session_name, s.timestamp, COUNT(d.id) FROM sessions s LEFT JOIN documents d ON s.id=d.session_id GROUP BY s.id ORDER BY s.timestamp DESC").fetchall()
+    _SESSION_ROW = """SELECT s.id, s.session_name, s.timestamp,
+                 (SELECT COUNT(*) FROM documents d WHERE d.session_id = s.id)
+                 FROM sessions s"""
+
+    def get_sessions_page(self, limit, before=None, since=None):
+        """
+        Newest-first sessions with their document counts, keyed on id:
+        before -> older than that id (next page), since -> newer than that id (new sessions).
+        """
+        where, params = [], []
+        if before is not None:
+            where.append("s.id < ?")
+            params.append(before)
+        if since is not None:
+            where.append("s.id > ?")
+            params.append(since)
+        sql = self._SESSION_ROW
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.id DESC LIMIT ?"
+        return self.conn.execute(sql, (*params, limit)).fetchall()
+
+    def get_session_summary(self, session_id):
+        """One session as a get_sessions_page row, or None."""
+        return self.conn.execute(self._SESSION_ROW + " WHERE s.id = ?", (session_id,)).fetchone()
+
+    def get_all_documents(self):
+        cur = self.conn.execute("SELECT id, session_id, original_filename, faiss_index_path, chunks_path FROM documents")
+        cols = [description[0] for description in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def get_document(self, doc_id):
+        cur = self.conn.execute("SELECT * FROM documents WHERE id=?", (doc_id,))
+        cols = [description[0] for description in cur.description]
+        row = cur.fetchone()
+        return dict(zip(cols, row)) if row else None
+
+    def delete_document(self, doc_id):
+        with self._write() as conn:
+            conn.execute("DELETE FROM charts WHERE doc_id=?", (doc_id,))
+            conn.execute("DELETE FROM documents WHERE id=?", (doc_id,))
+
+    def add_charts(self, doc_id, session_id, charts):
+        """charts: [{"filename", "rel_path", "page", "bbox", "class", "score", "width", "height",
+        "description", "sha256", "variants"}]"""
+        with self._write() as conn:
+            conn.executemany(
+                """INSERT INTO charts (doc_id, session_id, filename, rel_path, page, bbox_json, class, score, width, height,
+                   description, content_hash, variants_json)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(doc_id, session_id, c["filename"], c["rel_path"], c.get("page"), json.dumps(c.get("bbox")),
+                  c.get("class"), c.get("score"), c.get("width"), c.get("height"), c.get("description"),
+                  c.get("sha256"), json.dumps(c.get("variants") or []))
+                 for c in charts])
+            conn.execute("UPDATE documents SET charts_indexed=1 WHERE id=?", (doc_id,))
+
+    def copy_charts(self, from_doc_id, doc_id, session_id):
+        with self._write() as conn:
+            conn.execute(
+                """INSERT INTO charts (doc_id, session_id, filename, rel_path, page, bbox_json, class, score, width, height,
+                   description, content_hash, variants_json)
+                   SELECT ?, ?, filename, rel_path, page, bbox_json, class, score, width, height,
+                   description, content_hash, variants_json
+                   FROM charts WHERE doc_id=? ORDER BY id""",
+                (doc_id, session_id, from_doc_id))
+            conn.execute("UPDATE documents SET charts_indexed=1 WHERE id=?", (doc_id,))
+
+    def get_unindexed_chart_documents(self, session_id):
+        cur = self.conn.execute(
+            "SELECT id, chart_dir, chart_descriptions_json FROM documents WHERE session_id=? AND charts_indexed=0",
+            (session_id,))
+        cols = [description[0] for description in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def get_chart(self, chart_id):
+        cur = self.conn.execute("SELECT * FROM charts WHERE id=?", (chart_id,))
+        cols = [description[0] for description in cur.description]
+        row = cur.fetchone()
+        return dict(zip(cols, row)) if row else None
+
+    def get_charts_version(self, session_id):
+        """(count, max id) of a session's charts; rows are insert/delete only, so this changes with any edit."""
+        return self.conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM charts WHERE session_id=?", (session_id,)).fetchone()
+
+    def get_session_charts(self, session_id):
+        cur = self.conn.execute(
+            """SELECT c.*, d.original_filename AS doc_name FROM charts c
+               JOIN documents d ON d.id = c.doc_id
+               WHERE c.session_id=? ORDER BY d.original_filename, c.page, c.id""",
+            (session_id,))
+        cols = [description[0] for description in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def find_processed_document(self, content_hash, vision_model):
+        """Most recent fully processed document with these bytes and vision model."""
+        cur = self.conn.execute(
+            """SELECT * FROM documents WHERE content_hash=? AND vision_model_used=?
+               AND faiss_index_path != '' ORDER BY id DESC LIMIT 1""",
+            (content_hash, vision_model))
+        cols = [description[0] for description in cur.description]
+        row = cur.fetchone()
+        return dict(zip(cols, row)) if row else None
+
+    def get_documents_by_hash(self, content_hash):
+        """Documents with these bytes, newest first (any vision model)."""
+        cur = self.conn.execute(
+            "SELECT * FROM documents WHERE content_hash=? ORDER BY id DESC", (content_hash,))
+        cols = [description[0] for description in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def count_documents_sharing(self, faiss_path, chart_dir):
+        """(#documents using this index, #documents using this chart dir); linked uploads share both."""
+        index_refs = self.conn.execute(
+            "SELECT COUNT(*) FROM documents WHERE faiss_index_path=?", (faiss_path,)).fetchone()[0]
+        chart_refs = self.conn.execute(
+            "SELECT COUNT(*) FROM documents WHERE chart_dir=?", (chart_dir,)).fetchone()[0]
+        return index_refs, chart_refs
+
+    def add_upload(self, sha256, original_filename, stored_filename, size):
+        with self._write() as conn:
+            conn.execute("INSERT INTO uploads (sha256, original_filename, stored_filename, size, timestamp) VALUES (?, ?, ?, ?, ?)",
+                         (sha256, original_filename, stored_filename, size, datetime.now()))
+
+    def get_latest_upload(self, original_filename):
+        row = self.conn.execute(
+            "SELECT stored_filename FROM uploads WHERE original_filename=? ORDER BY rowid DESC LIMIT 1",
+            (original_filename,)).fetchone()
+        return row[0] if row else None
 
     def get_session_documents(self, session_id):
         cur = self.conn.execute("SELECT * FROM documents WHERE session_id=?", (session_id,))
@@ -98,6 +365,99 @@ class DatabaseManager:
             
         return results
 
-    def get_queries_for_session(self, session_id):
-        cur = self.conn.execute("SELECT question, response, sources_json FROM queries WHERE session_id=? ORDER BY timestamp ASC", (session_id,))
-        return [{"question": r[0], "response": r[1], "sources": json.loads(r[2])} for r in cur.fetchall()]
\ No newline at end of file
+    def get_queries_page(self, session_id, limit, before=None, since=None):
+        """
+        Up to limit queries of a session, oldest first. Without a cursor
+        (or with before=<id>) this is the latest page before that id; with
+        since=<id> it is the queries recorded after that id.
+        """
+        if since is not None:
+            cur = self.conn.execute(
+                """SELECT id, question, response, sources_json, timestamp FROM queries
+                   WHERE session_id=? AND id>? ORDER BY id ASC LIMIT ?""", (session_id, since, limit))
+            rows = cur.fetchall()
+        else:
+            cur = self.conn.execute(
+                """SELECT id, question, response, sources_json, timestamp FROM queries
+                   WHERE session_id=? AND id<? ORDER BY id DESC LIMIT ?""",
+                (session_id, before if before is not None else 2**63 - 1, limit))
+            rows = cur.fetchall()[::-1]
+        return [{"id": r[0], "question": r[1], "response": r[2], "sources": json.loads(r[3]), "timestamp": r[4]}
+                for r in rows]
+
+    def get_query(self, session_id, query_id):
+        row = self.conn.execute(
+            "SELECT id, question, response, sources_json, timestamp FROM queries WHERE session_id=? AND id=?",
+            (session_id, query_id)).fetchone()
+        if not row:
+            return None
+        return {"id": row[0], "question": row[1], "response": row[2], "sources": json.loads(row[3]), "timestamp": row[4]}
+
+    def iter_query_sources(self, batch=500):
+        """Yields (query_id, session_id, sources) for every query, in id order."""
+        last_id = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, session_id, sources_json FROM queries WHERE id>? ORDER BY id LIMIT ?",
+                (last_id, batch)).fetchall()
+            if not rows:
+                return
+            for query_id, session_id, sources_json in rows:
+                yield query_id, session_id, json.loads(sources_json or "[]")
+            last_id = rows[-1][0]
+
+    def update_query_sources(self, updates):
+        """updates: [(query_id, sources)]"""
+        with self._write() as conn:
+            conn.executemany("UPDATE queries SET sources_json=? WHERE id=?",
+                             [(json.dumps(sources), query_id) for query_id, sources in updates])
+
+    def chunk_store_referenced(self, chunks_path):
+        """
+        Whether a query's sources still point into this chunk store (their
+        references record chunks_path, see source_refs.compact_sources).
+        Bare {"doc_id", "chunk_id"} references can't find a store once the
+        document row is gone, so they don't count; compact_history fills
+        them in.
+        """
+        row = self.conn.execute(
+            "SELECT 1 FROM queries WHERE sources_json LIKE ? LIMIT 1",
+            (f'%"chunks_path": {json.dumps(chunks_path)}%',)).fetchone()
+        return row is not None
+
+    def vacuum(self):
+        with self._write_lock:
+            self.conn.execute("VACUUM")
+
+    # --- Answer cache (see src/core/answer_cache.py) ---
+
+    def add_cached_answer(self, session_id, cache_key, question, embedding, response, sources, now):
+        with self._write() as conn:
+            conn.execute("""INSERT INTO answer_cache
+                (session_id, cache_key, question, embedding, response, sources_json, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (session_id, cache_key, question, embedding, response, json.dumps(sources), now, now))
+
+    def get_cached_answers(self, session_id, cache_key, min_created_at):
+        cur = self.conn.execute("""SELECT id, question, embedding, response, sources_json FROM answer_cache
+            WHERE session_id=? AND cache_key=? AND created_at>=?""", (session_id, cache_key, min_created_at))
+        return [{"id": r[0], "question": r[1], "embedding": r[2], "response": r[3], "sources": json.loads(r[4])}
+                for r in cur.fetchall()]
+
+    def touch_cached_answer(self, entry_id, now):
+        with self._write() as conn:
+            conn.execute("UPDATE answer_cache SET last_used=?, hits=hits+1 WHERE id=?", (now, entry_id))
+
+    def delete_cached_answers(self, session_id):
+        with self._write() as conn:
+            conn.execute("DELETE FROM answer_cache WHERE session_id=?", (session_id,))
+
+    def prune_cached_answers(self, min_created_at, max_entries):
+        """Drops expired entries, then the least recently used beyond max_entries."""
+        with self._write() as conn:
+            conn.execute("DELETE FROM answer_cache WHERE created_at<?", (min_created_at,))
+            conn.execute("""DELETE FROM answer_cache WHERE id NOT IN
+                (SELECT id FROM answer_cache ORDER BY last_used DESC LIMIT ?)""", (max_entries,))
+
+    def count_cached_answers(self):
+        return self.conn.execute("SELECT COUNT(*) FROM answer_cache").fetchone()[0]
@@ -0,0 +1,88 @@
+"""
+Throughput and agreement report for the embedding backends in embedding_engine.py.
+
+Every backend embeds the same texts. Chunks/second is measured after a
+warm-up batch, and each backend's vectors are compared with the fp32 torch
+baseline by cosine similarity. The torch baseline is also run without
+length bucketing, to show what sorting by token length buys.
+
+Usage (from services/rag_core):
+    python -m src.utils.embedding_benchmark --chunks data/chunks/chunks_3
+    python -m src.utils.embedding_benchmark --synthetic 2000 --backends torch onnx onnx_int8 --threads 4
+"""
+
+import argparse
+import time
+import numpy as np
+
+from src.core.chunk_store import ChunkStore
+from src.core.embedding_engine import BACKENDS, EMBEDDING_BATCH_SIZE, EmbeddingEngine
+
+
+def load_texts(chunks_dir):
+    store = ChunkStore.open(chunks_dir, mmap=True)
+    return [store.child_text[i] for i in range(store.num_children)]
+
+
+def synthetic_texts(n, seed=0):
+    # Mixed lengths (a few words up to ~400 tokens), like real child chunks
+    rng = np.random.default_rng(seed)
+    words = "revenue margin quarter forecast chart table figure growth region segment cost unit".split()
+    return [" ".join(rng.choice(words, size=int(rng.integers(5, 300)))) for _ in range(n)]
+
+
+def timed_encode(encode, texts):
+    encode(texts[: min(32, len(texts))])  # Warm-up (lazy init, allocator)
+    start = time.perf_counter()
+    vectors = encode(texts)
+    return vectors, time.perf_counter() - start
+
+
+def agreement(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    cos = np.sum(a * b, axis=1)
+    return float(cos.mean()), float(cos.min())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--chunks", help="chunk store directory to take child texts from")
+    source.add_argument("--synthetic", type=int, help="number of synthetic texts")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = load_texts(args.chunks) if args.chunks else synthetic_texts(args.synthetic)
+    print(f"{len(texts)} texts, batch size {args.batch_size}, threads {args.threads or 'default'}\n")
+
+    baseline_engine = EmbeddingEngine(backend="torch", batch_size=args.batch_size, threads=args.threads)
+    baseline, seconds = timed_encode(baseline_engine.encode, texts)
+    rows = [("torch", len(texts) / seconds, 1.0, 1.0)]
+
+    # Same model, texts in input order with library-default batching (the old index_document call)
+    plain, plain_seconds = timed_encode(
+        lambda t: baseline_engine.model.encode(t, batch_size=args.batch_size, convert_to_numpy=True), texts
+    )
+    rows.append(("torch (no bucketing)", len(texts) / plain_seconds, *agreement(baseline, plain)))
+
+    for backend in args.backends:
+        if backend == "torch":
+            continue
+        engine = EmbeddingEngine(backend=backend, batch_size=args.batch_size, threads=args.threads)
+        if engine.backend != backend:
+            print(f"{backend}: unavailable, skipped")
+            continue
+        vectors, secs = timed_encode(engine.encode, texts)
+        rows.append((backend, len(texts) / secs, *agreement(baseline, vectors)))
+
+    base_rate = rows[0][1]
+    print(f"{'backend':<22}{'chunks/s':>10}{'speedup':>9}{'cos mean':>10}{'cos min':>9}")
+    for backend, rate, mean, worst in rows:
+        print(f"{backend:<22}{rate:>10.1f}{rate / base_rate:>9.2f}{mean:>10.4f}{worst:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Concurrent-load comparison: in-process embedding vs the embedding service.
+
+N client threads each send small embed requests (1..--max-texts texts,
+like query embeddings and small ingest slices) for --seconds. The
+in-process baseline is one shared EmbeddingEngine called from every
+thread, which is how rag_core embedded before the service existed. The
+remote run goes through RemoteEmbedder, so the service can micro-batch
+requests from all threads.
+
+Usage (from services/rag_core, with the embedding service running):
+    python -m src.utils.embedding_load_test --url http://localhost:8003 --concurrency 1 8 32
+"""
+
+import argparse
+import random
+import threading
+import time
+import numpy as np
+import requests
+
+from src.core.embedding_client import RemoteEmbedder
+from src.core.embedding_engine import get_embedding_engine
+
+WORDS = "what was the revenue margin in the third quarter for each region and segment".split()
+
+
+def random_texts(rng, max_texts):
+    return [" ".join(rng.choices(WORDS, k=rng.randint(4, 40))) for _ in range(rng.randint(1, max_texts))]
+
+
+def run(encode, concurrency, seconds, max_texts):
+    latencies, texts_done = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < stop_at:
+            texts = random_texts(rng, max_texts)
+            start = time.perf_counter()
+            encode(texts)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                texts_done[0] += len(texts)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    lat = np.array(latencies)
+    return {
+        "req_s": len(lat) / wall,
+        "texts_s": texts_done[0] / wall,
+        "p50_ms": float(np.percentile(lat, 50)) if len(lat) else 0.0,
+        "p95_ms": float(np.percentile(lat, 95)) if len(lat) else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8003", help="embedding service base URL")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--max-texts", type=int, default=4)
+    args = parser.parse_args()
+
+    local = get_embedding_engine()
+    remote = RemoteEmbedder(args.url)
+    local.encode(["warm up"])
+    remote.encode(["warm up"])
+
+    print(f"{'mode':<10}{'threads':>8}{'req/s':>9}{'texts/s':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for concurrency in args.concurrency:
+        for mode, encode in (("local", local.encode), ("service", remote.encode)):
+            r = run(encode, concurrency, args.seconds, args.max_texts)
+            print(f"{mode:<10}{concurrency:>8}{r['req_s']:>9.1f}{r['texts_s']:>10.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}")
+
+    if remote.fallbacks:
+        print(f"\n⚠️ The service was unreachable {remote.fallbacks} time(s); those requests ran locally")
+    try:
+        print("\nService batching:", requests.get(f"{args.url}/stats", timeout=5).json())
+    except requests.RequestException:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Recall-versus-latency report for the ANN index types in vector_index.py.
+
+Every candidate index is compared against an exact IndexFlatL2 baseline built
+over the same vectors. Vectors come from a saved flat index, or are synthetic.
+
+Usage (from services/rag_core):
+    python -m src.utils.index_benchmark --faiss data/faiss_indexes/index_3.faiss
+    python -m src.utils.index_benchmark --synthetic 200000 --types hnsw ivf_pq
+"""
+
+import argparse
+import time
+import faiss
+import numpy as np
+
+from src.core.vector_index import INDEX_FACTORIES, build_vector_index, apply_search_params
+
+# Search-time sweeps: the knob that trades recall for latency per index family
+SWEEPS = {
+    "hnsw": ("efSearch", [16, 32, 64, 128, 256]),
+    "ivf_flat": ("nprobe", [1, 4, 8, 16, 32, 64]),
+    "ivf_sq8": ("nprobe", [1, 4, 8, 16, 32, 64]),
+    "ivf_pq": ("nprobe", [1, 4, 8, 16, 32, 64]),
+}
+
+
+def load_vectors(faiss_path):
+    index = faiss.read_index(faiss_path)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def synthetic_vectors(n, dim=384, seed=0):
+    # Clustered, unit-normalized vectors behave more like sentence embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 500), dim)).astype("float32")
+    x = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.normal(size=(n, dim)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def make_queries(vectors, num_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    q = vectors[rng.integers(0, len(vectors), num_queries)]
+    q = q + 0.05 * rng.normal(size=q.shape).astype("float32")
+    return (q / np.linalg.norm(q, axis=1, keepdims=True)).astype("float32")
+
+
+def timed_search(index, queries, k):
+    # One query at a time, as in SmartRAG.search
+    latencies = []
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, I = index.search(queries[i : i + 1], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids[i] = I[0]
+    return ids, np.array(latencies)
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run_report(vectors, index_types, num_queries=200, k=10):
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = make_queries(vectors, num_queries)
+
+    flat, _ = build_vector_index(vectors, index_type="flat")
+    truth, flat_lat = timed_search(flat, queries, k)
+    rows = [("flat", "-", 1.0, float(np.mean(flat_lat)), float(np.percentile(flat_lat, 95)), 0.0,
+             len(faiss.serialize_index(flat)))]
+
+    for index_type in index_types:
+        start = time.perf_counter()
+        index, info = build_vector_index(vectors, index_type=index_type)
+        build_s = time.perf_counter() - start
+        size = len(faiss.serialize_index(index))
+
+        knob, values = SWEEPS.get(info["type"], (None, [None]))
+        for value in values:
+            if knob:
+                apply_search_params(index, {"params": {knob: value}})
+            found, lat = timed_search(index, queries, k)
+            rows.append((
+                info["factory"],
+                f"{knob}={value}" if knob else "-",
+                recall_at_k(found, truth),
+                float(np.mean(lat)),
+                float(np.percentile(lat, 95)),
+                build_s,
+                size,
+            ))
+    return rows
+
+
+def print_report(rows, k):
+    print(f"{'index':<22}{'search param':<16}{'recall@' + str(k):>10}{'mean ms':>10}{'p95 ms':>10}{'build s':>10}{'size MB':>10}")
+    for factory, param, recall, mean_ms, p95_ms, build_s, size in rows:
+        print(f"{factory:<22}{param:<16}{recall:>10.3f}{mean_ms:>10.3f}{p95_ms:>10.3f}{build_s:>10.2f}{size / 1e6:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--faiss", help="Saved index to reconstruct vectors from (flat/SQ8)")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic 384-d vectors")
+    parser.add_argument("--types", nargs="+", default=["hnsw", "ivf_flat", "ivf_sq8", "ivf_pq", "sq8"],
+                        choices=[t for t in INDEX_FACTORIES if t != "flat"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.faiss) if args.faiss else synthetic_vectors(args.synthetic)
+    print(f"Benchmarking {len(vectors)} vectors, {args.queries} queries, k={args.k}\n")
+    print_report(run_report(vectors, args.types, args.queries, args.k), args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import threading
+from collections import defaultdict, deque
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics store.
+    Keeps a rolling window of observations per metric name so we can report
+    latency percentiles without pulling in a metrics backend.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._values = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts = defaultdict(int)
+
+    def observe(self, name, value):
+        with self._lock:
+            self._values[name].append(float(value))
+            self._counts[name] += 1
+
+    def summary(self):
+        """Returns {metric: {count, mean, p50, p95, max}} over the rolling window."""
+        with self._lock:
+            snapshot = {name: list(values) for name, values in self._values.items()}
+            counts = dict(self._counts)
+
+        report = {}
+        for name, values in snapshot.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            report[name] = {
+                "count": counts.get(name, len(values)),
+                "mean": sum(ordered) / len(ordered),
+                "p50": _percentile(ordered, 50),
+                "p95": _percentile(ordered, 95),
+                "max": ordered[-1],
+            }
+        return report
+
+
+def _percentile(ordered, pct):
+    idx = min(len(ordered) - 1, int(round((pct / 100.0) * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+# Shared registry for the rag_core process
+metrics = MetricsRegistry()
@@ -0,0 +1,81 @@
+"""
+Migrates pickled chunk files to the columnar ChunkStore.
+
+Converts every data/chunks/chunks_<id>.pkl (+ <id>_parents.pkl) into a
+data/chunks/chunks_<id>/ store and repoints documents.chunks_path in the DB.
+UUID chunk ids are renumbered to integers; child order (= FAISS row) is kept.
+
+Usage (from services/rag_core, i.e. /app in the container):
+    python -m src.utils.migrate_chunks                 # migrate, keep the .pkl files
+    python -m src.utils.migrate_chunks --delete-legacy # migrate and remove them
+    python -m src.utils.migrate_chunks --dry-run
+"""
+
+import os
+import argparse
+
+from src.core.persistence import (
+    CHUNKS_DIR,
+    chunk_store_path,
+    legacy_chunk_paths,
+    load_legacy_chunks,
+)
+from src.utils.db_utils import DatabaseManager
+
+
+def find_legacy_doc_ids():
+    if not os.path.exists(CHUNKS_DIR):
+        return []
+    doc_ids = []
+    for filename in os.listdir(CHUNKS_DIR):
+        if filename.startswith("chunks_") and filename.endswith(".pkl"):
+            try:
+                doc_ids.append(int(filename[len("chunks_") : -len(".pkl")]))
+            except ValueError:
+                continue
+    return sorted(doc_ids)
+
+
+def migrate(db, dry_run=False, delete_legacy=False):
+    docs = {doc["id"]: doc for doc in db.get_all_documents()}
+    migrated = 0
+
+    for doc_id in find_legacy_doc_ids():
+        chunks_pkl, parents_pkl = legacy_chunk_paths(doc_id)
+        store_dir = chunk_store_path(doc_id)
+        print(f"→ doc {doc_id}: {chunks_pkl} -> {store_dir}")
+        if dry_run:
+            continue
+
+        store = load_legacy_chunks(chunks_pkl)
+        store.save(store_dir)
+        print(f"  ✓ {store.num_children} children, {store.num_parents} parents")
+
+        doc = docs.get(doc_id)
+        if doc:
+            db.update_document_paths(doc_id, doc["faiss_index_path"], os.path.abspath(store_dir))
+        else:
+            print(f"  ⚠️ doc {doc_id} not in the database; store written but not linked")
+
+        if delete_legacy:
+            for path in (chunks_pkl, parents_pkl):
+                if os.path.exists(path):
+                    os.remove(path)
+        migrated += 1
+
+    print(f"✓ Migrated {migrated} document(s)")
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/history.db")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--delete-legacy", action="store_true", help="Remove .pkl files after migrating")
+    args = parser.parse_args()
+
+    migrate(DatabaseManager(db_path=args.db), dry_run=args.dry_run, delete_legacy=args.delete_legacy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Local stand-in for an OpenAI-style /v1/chat/completions endpoint, for
+exercising the async LLM client (timeouts, retries, rate limits, hedging)
+without a real provider. Standard library only.
+
+Usage (from services/rag_core):
+    python -m src.utils.stub_llm_server --port 8009 --latency-ms 300 --jitter-ms 700 --error-rate 0.1
+    LLM_PROVIDER=stub STUB_LLM_URL=http://localhost:8009 uvicorn main:app
+
+Answers echo the last user message. With --jitter-ms, a random share of
+requests is slow, which is what hedging is for.
+"""
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    config = argparse.Namespace(
+        latency_ms=200, jitter_ms=0, error_rate=0.0, rate_limit_rate=0.0, token_delay_ms=20
+    )
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path != "/v1/chat/completions":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        cfg = self.config
+
+        roll = random.random()
+        if roll < cfg.rate_limit_rate:
+            self._send_json(429, {"error": "rate limited"}, {"Retry-After": "0.2"})
+            return
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            self._send_json(503, {"error": "upstream unavailable"})
+            return
+
+        time.sleep((cfg.latency_ms + random.random() * cfg.jitter_ms) / 1000)
+
+        question = next(
+            (m["content"] for m in reversed(request.get("messages", [])) if m.get("role") == "user"), ""
+        )
+        answer = f"Stub answer to: {question[-200:]}"
+
+        if not request.get("stream"):
+            self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": answer}}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in answer.split(" "):
+            chunk = {"choices": [{"delta": {"content": word + " "}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(cfg.token_delay_ms / 1000)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8009)
+    parser.add_argument("--latency-ms", type=float, default=200, help="base time before the first byte")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra random latency, 0..jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered 429")
+    parser.add_argument("--token-delay-ms", type=float, default=20, help="delay between streamed words")
+    args = parser.parse_args()
+
+    StubHandler.config = args
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), StubHandler)
+    print(f"Stub LLM listening on http://localhost:{args.port}/v1/chat/completions")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import numpy as np
+
+from src.core.answer_cache import AnswerCache, literal_terms
+
+
+class FakeDB:
+    def __init__(self):
+        self.rows = []
+
+    def get_cached_answers(self, session_id, cache_key, since):
+        return [r for r in self.rows if r["session_id"] == session_id and r["cache_key"] == cache_key]
+
+    def add_cached_answer(self, session_id, cache_key, question, embedding, response, sources, now):
+        self.rows.append(
+            {
+                "id": len(self.rows) + 1,
+                "session_id": session_id,
+                "cache_key": cache_key,
+                "question": question,
+                "embedding": embedding,
+                "response": response,
+                "sources": sources,
+            }
+        )
+
+    def prune_cached_answers(self, before, max_entries):
+        pass
+
+    def touch_cached_answer(self, entry_id, now):
+        pass
+
+
+def make_cache():
+    # Every question embeds to the same vector: similarity is always 1.0
+    return AnswerCache(FakeDB(), embed=lambda q: np.ones(4, dtype=np.float32), enabled=True)
+
+
+def test_different_year_is_not_served_from_cache():
+    cache = make_cache()
+    cache.store(1, "k", "What was the revenue in 2022?", "12M", [])
+    assert cache.lookup(1, "k", "What was the revenue in 2023?") is None
+    assert cache.lookup(1, "k", "what was the revenue in 2022")["response"] == "12M"
+
+
+def test_different_quoted_term_is_not_served_from_cache():
+    cache = make_cache()
+    cache.store(1, "k", 'Who leads "Project Alpha"?', "Ana", [])
+    assert cache.lookup(1, "k", 'Who leads "Project Beta"?') is None
+    assert cache.lookup(1, "k", 'Who is leading "project alpha"?')["response"] == "Ana"
+
+
+def test_literal_terms():
+    assert literal_terms("cost of 1,200.5 units in 2023") == (("1200.5", "2023"), ())
+    assert literal_terms("it's the 'Alpha' plan, isn't it") == ((), ("alpha",))
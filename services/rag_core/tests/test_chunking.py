@@ -0,0 +1,16 @@
+from src.core.chunking import DocumentChunker
+
+SECTION = "## Page 3\nRevenue table\n> **Visual Analysis (page3_visual_1.png):**\n> Bars\n"
+
+
+def test_moved_page_keeps_its_signature():
+    chunker = DocumentChunker()
+    moved = chunker.renumber(SECTION, "page3", "page4")
+    assert moved.startswith("## Page 4\n") and "page4_visual_1.png" in moved
+    assert chunker.page_signature(moved, "page4") == chunker.page_signature(SECTION, "page3")
+
+
+def test_renumber_leaves_other_pages_alone():
+    text = "see page13_visual_1.png\n## Page 13\n"
+    assert DocumentChunker().renumber(text, "page1", "page2") == text
+    assert DocumentChunker.page_number("slide12") == 12 and DocumentChunker.page_number("document") == 0
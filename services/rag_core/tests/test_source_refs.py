@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+from src.core import source_refs
+from src.core.source_refs import SourceHydrator, compact_sources
+
+
+class FakeStore:
+    def __init__(self, texts):
+        self.texts = texts
+
+    def parent(self, i):
+        return SimpleNamespace(text=self.texts[i], source="report.pdf", page=i + 1)
+
+
+class FakeDB:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def get_document(self, doc_id):
+        return self.docs.get(doc_id)
+
+    def get_documents_by_hash(self, content_hash):
+        return [d for d in self.docs.values() if d["content_hash"] == content_hash]
+
+
+STORES = {
+    "/chunks/1": FakeStore(["Revenue grew 12% in 2023.", "Costs were flat."]),
+    "/chunks/2": FakeStore(["Costs were flat.", "Revenue grew 12% in 2023."]),
+}
+DOC_1 = {"id": 1, "chunks_path": "/chunks/1", "content_hash": "abc", "original_filename": "report.pdf"}
+RESULT = {"doc_id": 1, "chunk_id": 0, "score": 0.9, "text": "Revenue grew 12% in 2023.", "source": "report.pdf", "page": 1}
+
+
+def hydrate(monkeypatch, docs, refs):
+    monkeypatch.setattr(source_refs, "open_chunk_store", lambda path: STORES[path])
+    return SourceHydrator(FakeDB(docs)).hydrate(refs)
+
+
+def test_reference_survives_deleted_document_row(monkeypatch):
+    refs = compact_sources([RESULT], {1: DOC_1})
+    [src] = hydrate(monkeypatch, {}, refs)
+    assert src["text"] == RESULT["text"] and "unavailable" not in src
+
+
+def test_mismatched_store_falls_back_to_preview(monkeypatch):
+    # The store of doc 1 is gone; doc 2 has the same bytes but numbers its chunks differently
+    refs = compact_sources([{**RESULT, "doc_id": 1}], {1: {**DOC_1, "chunks_path": "/gone"}})
+    linked = {"id": 2, "chunks_path": "/chunks/2", "content_hash": "abc", "original_filename": "report.pdf"}
+    [src] = hydrate(monkeypatch, {2: linked}, refs)
+    assert src["unavailable"] and src["text"] == RESULT["text"][: source_refs.SOURCE_REF_PREVIEW_CHARS]
+    assert src["source"] == "report.pdf" and src["page"] == 1